@@ -0,0 +1,72 @@
+'''Packing of the queued items into datagrams of a byte budget.
+
+A datagram starts with a header: the magic bytes, the encoding, the sequence
+number of the datagram and the number of records, little-endian. The records
+are a JSON list of the encoded items, or in the binary encoding a block of
+fixed-width records (latitude, longitude and timestamp as float64, NaN if there
+is no timestamp) followed by the newline separated ids of the records.
+'''
+
+import json
+import math
+import struct
+from typing import Iterator, List
+
+MAGIC = b'MCDG'
+HEADER = struct.Struct('<4sBIH')
+RECORD = struct.Struct('<ddd')
+
+JSON = 0
+BINARY = 1
+ENCODINGS = {'json': JSON, 'binary': BINARY}
+
+MAX_RECORDS = 0xffff
+# the payload of a UDP datagram in an Ethernet frame without fragmentation
+DEFAULT_MAX_SIZE = 1472
+
+
+class Packer:
+    def __init__(self, encoding: str = 'json', max_size: int = DEFAULT_MAX_SIZE, max_records: int = None):
+        self.encoding = ENCODINGS[encoding]
+        self.max_size = max_size
+        self.max_records = min(max_records or MAX_RECORDS, MAX_RECORDS)
+        self.sequence = 0
+
+    def pack(self, objs: List['FeederObject']) -> Iterator[bytes]:
+        if self.encoding == BINARY:
+            # a record and an id with its separator
+            parts = [(RECORD.pack(obj.latitude, obj.longitude,
+                                  math.nan if obj.timestamp is None else obj.timestamp),
+                      str(obj.identifier).encode()) for obj in objs]
+            sizes = [len(record) + len(id_) + 1 for record, id_ in parts]
+            base = HEADER.size - 1
+        else:
+            # an item with its separator
+            parts = [json.dumps(obj.encode()).encode() for obj in objs]
+            sizes = [len(part) + 1 for part in parts]
+            base = HEADER.size + 1
+
+        start = 0
+        size = base
+
+        for index, part_size in enumerate(sizes):
+            count = index - start
+
+            if count > 0 and (size + part_size > self.max_size or count == self.max_records):
+                yield self._datagram(parts[start:index])
+                start = index
+                size = base
+
+            size += part_size
+
+        if start < len(parts):
+            yield self._datagram(parts[start:])
+
+    def _datagram(self, parts: list) -> bytes:
+        header = HEADER.pack(MAGIC, self.encoding, self.sequence, len(parts))
+        self.sequence = (self.sequence + 1) & 0xffffffff
+
+        if self.encoding == BINARY:
+            return header + b''.join(record for record, _ in parts) + b'\n'.join(id_ for _, id_ in parts)
+
+        return header + b'[' + b','.join(parts) + b']'
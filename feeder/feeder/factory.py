@@ -2,9 +2,10 @@ from typing import Tuple
 
 from . import Mode
 from .feeder import Feeder
+from .datagram import DEFAULT_MAX_SIZE, ENCODINGS
 from .generator import Generator
-from .queue import Queue
-from .reader import CsvReader, SumoReader
+from .queue import DROP_POLICIES, Queue
+from .reader import BACKENDS, CsvReader, SumoReader
 
 
 class Factory:
@@ -46,14 +47,39 @@ class Factory:
                 raise ValueError(
                     'sumocfg_path must be configured for SumoFeeder')
 
-            reader = SumoReader(sumocfg_path)
+            backend = config.get('backend', 'traci')
+
+            if backend not in BACKENDS:
+                raise ValueError(f'invalid backend: {backend}, options: {list(BACKENDS)}')
+
+            reader = SumoReader(sumocfg_path, backend)
         elif source == 'json':
             pass
         else:
             raise ValueError(f'invalid source: {source}')
 
         if mode == Mode.FEED:
-            queue = Queue()
+            queue_config = config.get('queue', {})
+            drop_policy = queue_config.get('drop_policy', 'oldest')
+
+            if drop_policy not in DROP_POLICIES:
+                raise ValueError(f'invalid drop_policy: {drop_policy}, options: {list(DROP_POLICIES)}')
+
+            encoding = queue_config.get('encoding', 'json')
+
+            if encoding not in ENCODINGS:
+                raise ValueError(f'invalid encoding: {encoding}, options: {list(ENCODINGS)}')
+
+            queue = Queue(max_size=queue_config.get('max_size', 50),
+                          batch_size=queue_config.get('batch_size'),
+                          drop_policy=drop_policy,
+                          encoding=encoding,
+                          max_datagram_size=queue_config.get('max_datagram_size', DEFAULT_MAX_SIZE))
             return (queue, Feeder(reader, queue))
         elif mode == Mode.GENERATE:
-            return (None, Generator(reader, 'generated.out'))
+            trace_format = config.get('format', 'text')
+
+            if trace_format not in ('text', 'binary'):
+                raise ValueError(f'invalid format: {trace_format}')
+
+            return (None, Generator(reader, 'generated.out', trace_format == 'binary'))
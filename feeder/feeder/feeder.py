@@ -14,8 +14,7 @@ class Feeder(Runner):
         if not objs:
             return False
 
-        for obj in objs:
-            self.queue.put(obj.encode())
+        self.queue.put_many(objs)
 
         return True
 
@@ -1,10 +1,11 @@
 import os
 
 from . import Runner
+from .trace import TraceWriter
 
 
 class Generator(Runner):
-    def __init__(self, reader: 'Reader', out_file: str):
+    def __init__(self, reader: 'Reader', out_file: str, binary: bool = False):
         super().__init__()
 
         self.reader = reader
@@ -14,7 +15,17 @@ class Generator(Runner):
         if os.path.exists(self.out_file):
             os.remove(self.out_file)
 
+        # write the binary trace format instead of the text lines
+        self.writer = TraceWriter(self.out_file) if binary else None
+
     def generate(self) -> bool:
+        if self.writer:
+            if self.reader.is_finished:
+                return False
+
+            self.writer.write_step([obj for obj in self.reader.get_next() or [] if obj])
+            return True
+
         with open(self.out_file, 'a') as f:
             if self.reader.is_finished:
                 return False
@@ -31,4 +42,7 @@ class Generator(Runner):
         return self.generate()
 
     def close(self):
+        if self.writer:
+            self.writer.close()
+
         self.reader.close()
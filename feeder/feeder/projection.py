@@ -0,0 +1,102 @@
+'''Conversion of the network coordinates of SUMO to geo coordinates in bulk.
+
+SUMO projects the geo coordinates with the projParameter of the location of the
+network and then shifts them by its netOffset. The inverse of the UTM projection
+on the WGS84 ellipsoid is implemented with the series of Krueger, other
+projections are not supported.
+'''
+
+import math
+import re
+import xml.etree.ElementTree as ET
+from typing import Tuple
+
+import numpy as np
+
+# WGS84
+A = 6378137.0
+F = 1 / 298.257223563
+
+K0 = 0.9996
+FALSE_EASTING = 500000.0
+FALSE_NORTHING_SOUTH = 10000000.0
+
+_N = F / (2 - F)
+_RECTIFYING_RADIUS = A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_BETA = (_N / 2 - 2 * _N ** 2 / 3 + 37 * _N ** 3 / 96,
+         _N ** 2 / 48 + _N ** 3 / 15,
+         17 * _N ** 3 / 480)
+_DELTA = (2 * _N - 2 * _N ** 2 / 3 - 2 * _N ** 3,
+          7 * _N ** 2 / 3 - 8 * _N ** 3 / 5,
+          56 * _N ** 3 / 15)
+
+
+class UtmProjection:
+    def __init__(self, zone: int, south: bool = False, offset: Tuple[float, float] = (0.0, 0.0)):
+        self.zone = zone
+        self.south = south
+        self.offset = offset
+        self.central_meridian = math.radians(6 * zone - 183)
+
+    @classmethod
+    def from_net(cls, net_path: str) -> 'UtmProjection':
+        '''Create the projection of a network
+
+        Args:
+            net_path (str): the path of the net.xml
+
+        Returns:
+            UtmProjection: the projection, None if the network does not have a UTM projection
+        '''
+
+        for _, element in ET.iterparse(net_path):
+            if element.tag == 'location':
+                break
+        else:
+            return None
+
+        params = element.get('projParameter', '')
+        zone = re.search(r'\+zone=(\d+)', params)
+
+        if '+proj=utm' not in params or not zone or 'WGS84' not in params:
+            return None
+
+        offset = tuple(float(value) for value in element.get('netOffset', '0,0').split(','))
+
+        return cls(int(zone.group(1)), '+south' in params, offset)
+
+    def to_geo(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Convert network coordinates to geo coordinates
+
+        Args:
+            x (np.ndarray): the x coordinates in the network
+            y (np.ndarray): the y coordinates in the network
+
+        Returns:
+            (np.ndarray, np.ndarray): the longitudes and the latitudes
+        '''
+
+        easting = np.asarray(x, dtype=float) - self.offset[0]
+        northing = np.asarray(y, dtype=float) - self.offset[1]
+
+        if self.south:
+            northing = northing - FALSE_NORTHING_SOUTH
+
+        xi = northing / (K0 * _RECTIFYING_RADIUS)
+        eta = (easting - FALSE_EASTING) / (K0 * _RECTIFYING_RADIUS)
+
+        xi_ = xi.copy()
+        eta_ = eta.copy()
+        for j, beta in enumerate(_BETA, 1):
+            xi_ -= beta * np.sin(2 * j * xi) * np.cosh(2 * j * eta)
+            eta_ -= beta * np.cos(2 * j * xi) * np.sinh(2 * j * eta)
+
+        chi = np.arcsin(np.sin(xi_) / np.cosh(eta_))
+
+        lat = chi.copy()
+        for j, delta in enumerate(_DELTA, 1):
+            lat += delta * np.sin(2 * j * chi)
+
+        lon = self.central_meridian + np.arctan2(np.sinh(eta_), np.cos(xi_))
+
+        return (np.degrees(lon), np.degrees(lat))
@@ -1,102 +1,137 @@
-import json
-import time
+import selectors
 import threading
 import socket
+from collections import deque
+from typing import Iterable
 
+from .datagram import DEFAULT_MAX_SIZE, Packer
 
-def non_blocking_lock(lock):
-    def outer(function):
-        def inner(*args, **kwargs):
-            l = getattr(args[0], lock)
-            if l.acquire(False):
-                try:
-                    return function(*args, **kwargs)
-                finally:
-                    l.release()
-        return inner
-    return outer
+DROP_POLICIES = ('oldest', 'newest', 'block')
 
 
 class Queue:
-    def __init__(self, host: str = 'localhost', port: int = 51836, max_size: int = 50):
+    def __init__(self, host: str = 'localhost', port: int = 51836, max_size: int = 50,
+                 batch_size: int = None, drop_policy: str = 'oldest', encoding: str = 'json',
+                 max_datagram_size: int = DEFAULT_MAX_SIZE):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setblocking(0)
         self.sock.bind((host, port))
         self.max_data_size = 1024
-        self.max_transmit_count = 10
-        self.queue = []
+        self.packer = Packer(encoding, max_datagram_size, batch_size)
+        self.drop_policy = drop_policy
+        self.queue = deque()
         self.max_queue_size = max_size
+        # the items dropped by the drop policy and the datagrams the socket could not send
+        self.dropped_count = 0
+        self.unsent_count = 0
         self.connections = []
 
-        self.queue_lock = threading.Lock()
-        self.connections_lock = threading.Lock()
+        # the producer wakes up the server thread through the socket pair when the queue gets items
+        self.queue_condition = threading.Condition()
+        self.is_signalled = False
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(0)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
+
         self.stop_event = threading.Event()
         self.server_thread = threading.Thread(target=self.run_server_thread)
         self.server_thread.daemon = True
 
-    @non_blocking_lock('queue_lock')
-    def put(self, obj: object):
-        while len(self.queue) >= self.max_queue_size:
-            self.queue.pop(0)
-        self.queue.append(obj)
+    def put(self, obj: 'FeederObject'):
+        self.put_many((obj, ))
+
+    def put_many(self, objs: Iterable['FeederObject']):
+        with self.queue_condition:
+            for obj in objs:
+                if len(self.queue) >= self.max_queue_size:
+                    if self.drop_policy == 'block':
+                        self.queue_condition.wait_for(
+                            lambda: len(self.queue) < self.max_queue_size or self.stop_event.is_set())
+                        if self.stop_event.is_set():
+                            return
+                    elif self.drop_policy == 'newest':
+                        self.dropped_count += 1
+                        continue
+                    else:
+                        self.queue.popleft()
+                        self.dropped_count += 1
+
+                self.queue.append(obj)
+
+                if not self.is_signalled:
+                    self.is_signalled = True
+                    self.wakeup_writer.send(b'\0')
 
     def open(self):
         self.server_thread.start()
 
     def close(self):
         self.stop_event.set()
+
+        with self.queue_condition:
+            self.queue_condition.notify_all()
+
+        self.wakeup_writer.send(b'\0')
         self.server_thread.join()
+
+        self.selector.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
         self.sock.close()
 
-    @non_blocking_lock('connections_lock')
     def add_connection(self, addr):
         print('New connection:', addr)
         self.connections.append(addr)
 
-    @non_blocking_lock('connections_lock')
     def remove_connection(self, addr):
         if addr in self.connections:
             print('Disconnected:', addr)
             self.connections.remove(addr)
 
-    @non_blocking_lock('queue_lock')
-    @non_blocking_lock('connections_lock')
-    def send_data(self):
-        data = []
-        index = 0
-        queue_size = len(self.queue)
-        while index < queue_size:
-            item = self.queue[index]
-            if len(data) < self.max_transmit_count:
-                data.append(item)
-            if len(data) == self.max_transmit_count or index == (queue_size - 1):
-                for connection in self.connections:
-                    json_str = json.dumps(data)
-                    self.sock.sendto(json_str.encode(), connection)
-                data.clear()
-            index += 1
-        print('Sent data to', self.connections)
-        self.queue.clear()
-
-    def run_server_thread(self):
-        while not self.stop_event.is_set():
-            data, addr = None, None
-
+    def receive(self):
+        while True:
             try:
                 data, addr = self.sock.recvfrom(self.max_data_size)
             except BlockingIOError:
-                pass
+                return
 
-            if data and addr:
-                print(f'Received from {addr}: {data}')
-                if data == b'connect':
-                    self.add_connection(addr)
-                elif data == b'disconnect':
-                    self.remove_connection(addr)
+            print(f'Received from {addr}: {data}')
+            if data == b'connect':
+                self.add_connection(addr)
+            elif data == b'disconnect':
+                self.remove_connection(addr)
 
-            try:
-                self.send_data()
-            except BlockingIOError:
-                pass
+    def send_data(self):
+        with self.queue_condition:
+            items = list(self.queue)
+            self.queue.clear()
+            self.is_signalled = False
+            self.queue_condition.notify_all()
+
+        if not items or not self.connections:
+            return
+
+        # encoded once, the same bytes are sent to every connection
+        for data in self.packer.pack(items):
+            for connection in self.connections:
+                try:
+                    self.sock.sendto(data, connection)
+                except BlockingIOError:
+                    self.unsent_count += 1
 
-            time.sleep(0.1)
+        print('Sent data to', self.connections)
+
+    def run_server_thread(self):
+        while not self.stop_event.is_set():
+            for key, _ in self.selector.select():
+                if key.fileobj is self.sock:
+                    self.receive()
+                else:
+                    try:
+                        self.wakeup_reader.recv(4096)
+                    except BlockingIOError:
+                        pass
+
+            self.send_data()
@@ -5,7 +5,10 @@ import re
 import sys
 from typing import List, Mapping, TextIO
 
+import numpy as np
+
 from . import Closable
+from .projection import UtmProjection
 
 if 'SUMO_HOME' not in os.environ:
     raise RuntimeError('SUMO_HOME environment variable was not set')
@@ -13,23 +16,45 @@ SUMO_HOME = os.environ['SUMO_HOME']
 sys.path.append(os.path.join(SUMO_HOME, 'tools'))
 
 import traci    # noqa
+import traci.constants as tc    # noqa
+
+BACKENDS = ('traci', 'libsumo')
+
+
+def load_backend(backend: str):
+    '''Load the module of the SUMO backend, libsumo runs SUMO in the process without sockets'''
+
+    if backend == 'libsumo':
+        try:
+            import libsumo
+            return libsumo
+        except ImportError:
+            print('libsumo is not available, falling back to traci')
+
+    return traci
 
 
 class FeederObject:
-    def __init__(self, identifier: int, latitude: float, longitude: float):
+    def __init__(self, identifier: int, latitude: float, longitude: float, timestamp: float = None):
         self.identifier = identifier
         self.latitude = latitude
         self.longitude = longitude
+        self.timestamp = timestamp
 
     def encode(self):
-        return f'{self.identifier}, {self.latitude}, {self.longitude}'
+        if self.timestamp is None:
+            return f'{self.identifier}, {self.latitude}, {self.longitude}'
+
+        return f'{self.identifier}, {self.latitude}, {self.longitude}, {self.timestamp}'
 
     def __repr__(self):
-        return f'FeederObject(identifier={self.identifier}, latitude={self.latitude}, longitude={self.longitude}'
+        return f'FeederObject(identifier={self.identifier}, latitude={self.latitude}, longitude={self.longitude}, ' \
+            f'timestamp={self.timestamp}'
 
 
 class Reader(Closable):
     def __init__(self, mapping: Mapping[str, str]):
+        # a 'timestamp' (in seconds) may be mapped too
         self.mapped_keys = ['identifier', 'latitude', 'longitude']
         self.mapping = mapping
         self.is_finished = False
@@ -79,7 +104,7 @@ class CsvReader(Reader):
     def read_line(self) -> FeederObject:
         try:
             cols = next(self.reader)
-            id_, lat, lon = None, None, None
+            id_, lat, lon, timestamp = None, None, None, None
 
             for i, col in enumerate(cols):
                 try:
@@ -92,11 +117,13 @@ class CsvReader(Reader):
                         lat = float(col)
                     elif key == 'longitude':
                         lon = float(col)
+                    elif key == 'timestamp':
+                        timestamp = float(col)
                 except ValueError:
                     pass
 
             if id_ and lat and lon:
-                return FeederObject(id_, lat, lon)
+                return FeederObject(id_, lat, lon, timestamp)
         except StopIteration:
             self.is_finished = True
             return None
@@ -110,15 +137,23 @@ class CsvReader(Reader):
 
 
 class SumoReader(Reader):
-    def __init__(self, sumocfg_path):
+    def __init__(self, sumocfg_path: str, backend: str = 'traci'):
         super().__init__(None)
 
+        # traci and libsumo have the same API
+        self.sumo = load_backend(backend)
+
         self.end_time = self._get_end_time(sumocfg_path) * 1000
+        self.projection = self._get_projection(sumocfg_path)
 
         sumo_binary = os.path.join(SUMO_HOME, 'bin', 'sumo')
         sumo_cmd = [sumo_binary, '-c', sumocfg_path]
 
-        traci.start(sumo_cmd)
+        self.sumo.start(sumo_cmd)
+
+        # the results of the subscriptions arrive with the response of every simulation step
+        self.sumo.simulation.subscribe([tc.VAR_TIME_STEP, tc.VAR_DEPARTED_VEHICLES_IDS])
+        self.current_time = self.sumo.simulation.getCurrentTime()
 
     def _get_end_time(self, sumocfg_path: str) -> int:
         with open(sumocfg_path, 'r') as f:
@@ -127,26 +162,52 @@ class SumoReader(Reader):
         match = re.search(r'<end value="(\d*)"/>', content)
         return int(match.group(1))
 
+    def _get_projection(self, sumocfg_path: str) -> UtmProjection:
+        with open(sumocfg_path, 'r') as f:
+            content = f.read()
+
+        match = re.search(r'<net-file value="([^"]*)"/>', content)
+
+        if not match:
+            return None
+
+        return UtmProjection.from_net(os.path.join(os.path.dirname(sumocfg_path), match.group(1)))
+
     def _pull_vehicles(self) -> List[FeederObject]:
-        objs = []
+        results = self.sumo.simulation.getSubscriptionResults()
+        self.current_time = results[tc.VAR_TIME_STEP]
+        timestamp = self.current_time / 1000
+
+        # the position of a vehicle is in the response of its subscription, then in the steps
+        for vehicle_id in results[tc.VAR_DEPARTED_VEHICLES_IDS]:
+            self.sumo.vehicle.subscribe(vehicle_id, [tc.VAR_POSITION])
+
+        positions = self.sumo.vehicle.getAllSubscriptionResults()
+
+        if not positions:
+            return []
+
+        vehicle_ids = list(positions)
+        xy = np.array([positions[vehicle_id][tc.VAR_POSITION] for vehicle_id in vehicle_ids], dtype=float)
 
-        for vehicle_id in traci.vehicle.getIDList():
-            x, y = traci.vehicle.getPosition(vehicle_id)
-            lon, lat = traci.simulation.convertGeo(x, y)
-            objs.append(FeederObject(vehicle_id, lat, lon))
+        if self.projection is not None:
+            lons, lats = self.projection.to_geo(xy[:, 0], xy[:, 1])
+        else:
+            lons, lats = np.array([self.sumo.simulation.convertGeo(x, y) for x, y in xy.tolist()]).T
 
-        return objs
+        return [FeederObject(vehicle_id, lat, lon, timestamp)
+                for vehicle_id, lat, lon in zip(vehicle_ids, lats.tolist(), lons.tolist())]
 
     def get_next(self) -> List[FeederObject]:
-        if traci.simulation.getCurrentTime() > self.end_time:
+        if self.current_time > self.end_time:
             self.is_finished = True
             return
 
-        traci.simulationStep()
+        self.sumo.simulationStep()
         return self._pull_vehicles()
 
     def close(self):
         try:
-            traci.close()
-        except traci.exceptions.FatalTraCIError:
+            self.sumo.close()
+        except (traci.exceptions.FatalTraCIError, self.sumo.TraCIException):
             pass
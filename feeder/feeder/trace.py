@@ -0,0 +1,55 @@
+'''Binary columnar trace format.
+
+The file starts with a header: the magic bytes, the number of records and the
+offset of the trailer. The records have a fixed width: the step index, the code
+of the vehicle id (both uint32), the latitude and the longitude (both float64),
+little-endian. The trailer is JSON with the ids of the codes and the timestamps
+of the steps.
+'''
+
+import json
+import struct
+from typing import List
+
+MAGIC = b'MCTRACE1'
+HEADER = struct.Struct('<8sQQ')
+RECORD = struct.Struct('<IIdd')
+
+
+class TraceWriter:
+    def __init__(self, out_file: str):
+        self.f = open(out_file, 'wb')
+        self.f.write(HEADER.pack(MAGIC, 0, 0))
+
+        self.codes = {}
+        self.timestamps = []
+        self.count = 0
+
+    def write_step(self, objs: List['FeederObject']):
+        step = len(self.timestamps)
+        self.timestamps.append(objs[0].timestamp if objs else None)
+
+        records = []
+
+        for obj in objs:
+            identifier = str(obj.identifier)
+            code = self.codes.setdefault(identifier, len(self.codes))
+            records.append(RECORD.pack(step, code, obj.latitude, obj.longitude))
+
+        self.f.write(b''.join(records))
+        self.count += len(records)
+
+    def close(self):
+        if self.f.closed:
+            return
+
+        trailer_offset = self.f.tell()
+        trailer = {
+            'ids': list(self.codes),
+            'timestamps': self.timestamps
+        }
+        self.f.write(json.dumps(trailer).encode())
+
+        self.f.seek(0)
+        self.f.write(HEADER.pack(MAGIC, self.count, trailer_offset))
+        self.f.close()
@@ -8,6 +8,7 @@ from map_creator.algorithm import Factory as AlgorithmFactory
 from map_creator.distance import get_distance_function
 from map_creator.feeder import Factory as FeederFactory
 from map_creator.model import Coordinate
+from map_creator.parallel import Factory as ParallelFactory
 from map_creator.processor import Processor
 from map_creator.rsu import Rsu
 from map_creator.server import DebugHTTPServer
@@ -57,6 +58,9 @@ def main():
                                         ref_point,
                                         dist_func)
 
+    if 'parallel' in config:
+        algorithm.distance_service = ParallelFactory.create(config['parallel'])
+
     debug_server = None
 
     if debug:
@@ -88,6 +92,12 @@ def main():
                 rsu.time_window = config['rsu']['time_window']['value']
             else:
                 rsu.time_window = None
+        if 'online' in config['rsu']:
+            rsu.online = config['rsu']['online']
+        if 'background' in config['rsu']:
+            rsu.background = config['rsu']['background']
+        if 'event_time' in config['rsu']:
+            rsu.event_time = config['rsu']['event_time']
 
     if 'feeder' not in config:
         raise ValueError('feeder must be configured')
@@ -106,6 +116,9 @@ def main():
         feeder.close()
         rsu.close()
 
+        if algorithm.distance_service is not None:
+            algorithm.distance_service.close()
+
         with open('result.json', 'w') as f:
             f.write(json.dumps(rsu.generated_map))
 
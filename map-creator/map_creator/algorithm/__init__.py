@@ -1,6 +1,7 @@
 from typing import Callable, List
 
 from .. import utils
+from ..matrix import DistanceMatrix
 from ..model import Map, Point
 
 
@@ -8,6 +9,27 @@ class Algorithm:
     def __init__(self, ref_point: 'Coordinate', dist_func: Callable[['Path', 'Path'], float]):
         self._ref_point = Point(None, ref_point)
         self.dist_func = dist_func
+        self.distance_service = None
+
+        self._distance_matrix = None
+
+        self._online_paths = {}
+
+    def split(self, path: 'Path') -> 'Ingress':
+        '''Split the path into ingress and egress parts at the closest point to the reference point
+
+        Args:
+            path (Path): the path
+
+        Returns:
+            Ingress: the ingress part of the path with the egress part as its only egress
+        '''
+
+        split_point = utils.closest_point(self._ref_point, path.points)
+        ingress, egress = utils.split_path(split_point, path)
+        ingress.egresses.append(egress)
+
+        return ingress
 
     def process(self, paths: List['Path']) -> 'Map':
         '''Create map data from the input paths
@@ -19,14 +41,10 @@ class Algorithm:
             Map: the created map data
         '''
 
-        ingresses = []
+        # distances are only shared within the step of one update
+        self._distance_matrix = None
 
-        for path in paths:
-            # split the path into ingress and egress parts
-            split_point = utils.closest_point(self._ref_point, path.points)
-            ingress, egress = utils.split_path(split_point, path)
-            ingress.egresses.append(egress)
-            ingresses.append(ingress)
+        ingresses = [self.split(path) for path in paths]
 
         processed_ingresses = self.process_ingresses(ingresses)
 
@@ -36,6 +54,75 @@ class Algorithm:
 
         return Map(self._ref_point, processed_ingresses)
 
+    def insert(self, key, path: 'Path'):
+        '''Insert a path into the online clusters, replacing the path inserted with the same key.
+        The clusters are updated incrementally if the algorithm supports it,
+        otherwise snapshot processes all the inserted paths.
+
+        Args:
+            key (Any): the key of the path
+            path (Path): the path
+        '''
+
+        self._online_paths.pop(key, None)
+        self._online_paths[key] = path
+
+    def expire(self, key):
+        '''Remove a path from the online clusters
+
+        Args:
+            key (Any): the key of the path, unknown keys are ignored
+        '''
+
+        self._online_paths.pop(key, None)
+
+    def snapshot(self) -> 'Map':
+        '''Create map data from the online clusters
+
+        Returns:
+            Map: the created map data
+        '''
+
+        return self.process(list(self._online_paths.values()))
+
+    def distance_matrix(self, paths: List['Path'], sparse: bool = False) -> 'DistanceMatrix':
+        '''Get a distance matrix containing the paths
+
+        Args:
+            paths (List[Path]): the paths
+            sparse (bool): create a sparse matrix if there is none
+
+        Returns:
+            DistanceMatrix: the current matrix if it contains all the paths,
+                otherwise a new one replacing it
+        '''
+
+        matrix = self._distance_matrix
+        if matrix is not None and all(path in matrix for path in paths):
+            return matrix
+
+        self._distance_matrix = DistanceMatrix(paths, self.dist_func, sparse)
+
+        return self._distance_matrix
+
+    def path_distance(self, path_1: 'Path', path_2: 'Path', threshold: float = None) -> float:
+        '''Get the distance of two paths, reusing the current distance matrix
+
+        Args:
+            path_1 (Path): the first path
+            path_2 (Path): the second path
+            threshold (float): INFINITY may be returned if the distance is greater than this
+
+        Returns:
+            float: the distance of the paths
+        '''
+
+        matrix = self._distance_matrix
+        if matrix is not None and path_1 in matrix and path_2 in matrix:
+            return matrix.distance(path_1, path_2, threshold)
+
+        return self.dist_func(path_1, path_2, threshold=threshold)
+
     def process_ingresses(self, ingresses: List['Ingress']) -> List['Ingress']:
         raise NotImplementedError
 
@@ -83,8 +170,9 @@ class Factory:
 
             strategy = Strategy[strategy.upper()]
             measure = DistanceMeasure[measure.upper()]
+            split_distance = config.get('split_distance', 0)
 
-            return Hierarchical(ref_point, dist_func, strategy, measure)
+            return Hierarchical(ref_point, dist_func, strategy, measure, split_distance)
         elif type_ == 'myalgorithm':
             diff_dist = config.get('diff_dist')
             diff_head = config.get('diff_head')
@@ -93,6 +181,8 @@ class Factory:
                 raise ValueError(
                     'diff_dist, diff_head must be configured for MyAlgorithm')
 
-            return MyAlgorithm(ref_point, dist_func, diff_dist, diff_head)
+            consolidation = config.get('consolidation')
+
+            return MyAlgorithm(ref_point, dist_func, diff_dist, diff_head, consolidation)
         else:
             raise ValueError(f'invalid type: {type_}')
@@ -1,8 +1,12 @@
+from collections import deque
 from typing import Callable, List
 
+import numpy as np
+
 from . import Algorithm
-from .. import utils
-from ..model import Egress, Ingress, Map, Path, Point
+from .. import distance, utils
+from ..model import Egress, Ingress, Map, Path, Point, coordinate_arrays
+from ..spatial import GridIndex
 
 NEGLIGIBLE_DISTANCE = 0.005
 INFINITE_DISTANCE = 1000
@@ -25,51 +29,133 @@ class _DBSCAN:
 
     def reset(self):
         self.clusters = []
-        self.clustered = []
+        self.clustered = set()
+
+        self._neighbours = {}
+        self._endpoints = []
+        self._indexed = []
+        self._empty = []
+
+    def _index_dataset(self, dataset: List['Path']):
+        '''Index the dataset by the endpoints of the paths if the distance function
+        is bounded by their distance, so range queries only compare nearby paths'''
+
+        self._neighbours = {}
+        self._endpoints = []
+        self._indexed = []
+        self._empty = []
+
+        bounded = [i for i, is_bounded in [(0, distance.is_entry_bounded(self.dist_func)),
+                                           (-1, distance.is_exit_bounded(self.dist_func))]
+                   if is_bounded]
+
+        if not bounded:
+            return
+
+        coordinates = []
+
+        for i, data in enumerate(dataset):
+            if len(data.points) == 0:
+                # an empty path has no endpoints, it is always a candidate
+                self._empty.append(i)
+            else:
+                lats, lons = coordinate_arrays(data.points)
+                coordinates.append([(lats[k], lons[k]) for k in bounded])
+                self._indexed.append(i)
+
+        self._indexed = np.array(self._indexed, dtype=int)
+        coordinates = np.array(coordinates, dtype=float).reshape(len(self._indexed), len(bounded), 2)
+
+        for n, k in enumerate(bounded):
+            self._endpoints.append((k, GridIndex(coordinates[:, n, 0], coordinates[:, n, 1], self.eps)))
+
+    def _candidates(self, data: 'Path', dataset: List['Path']) -> List[int]:
+        if not self._endpoints or len(data.points) == 0:
+            return range(len(dataset))
+
+        lats, lons = coordinate_arrays(data.points)
+
+        candidates = None
+        for k, index in self._endpoints:
+            found = index.query(lats[k], lons[k])
+            candidates = found if candidates is None else np.intersect1d(candidates, found)
+
+        candidates = self._indexed[candidates].tolist()
+
+        if self._empty:
+            candidates = sorted(candidates + self._empty)
+
+        return candidates
+
+    def _prefetch(self, dataset: List['Path']):
+        '''Calculate the distances of all the candidate pairs with the distance service'''
+
+        pairs = []
+        for i, data in enumerate(dataset):
+            pairs.extend((i, k) for k in self._candidates(data, dataset) if k > i)
+
+        self.distance_matrix(dataset, sparse=True).compute_pairs(pairs, self.distance_service, self.eps)
 
     def predict(self, dataset: List['Path']):
-        for data in dataset:
-            if self._is_member(data, self.clustered):
+        self._index_dataset(dataset)
+
+        if self.distance_service is not None:
+            self._prefetch(dataset)
+
+        for i in range(len(dataset)):
+            if i in self.clustered:
                 continue
 
-            neighbours = self._range_query(data, dataset)
+            neighbours = self._range_query(i, dataset)
             if len(neighbours) < self.min_pts:
                 continue
             else:
-                cluster = self._expand_cluster(data, dataset, neighbours)
-                self.clusters.append(cluster)
+                cluster = self._expand_cluster(i, dataset, neighbours)
+                self.clusters.append([dataset[k] for k in cluster])
+
+    def _range_query(self, i: int, dataset: List['Path']) -> List[int]:
+        # every path is queried at most once
+        if i in self._neighbours:
+            return self._neighbours[i]
 
-    def _range_query(self, data: 'Path', dataset: List['Path']):
+        data = dataset[i]
         neighbours = []
-        for data2 in dataset:
-            if self.dist_func(data, data2) <= self.eps:
-                neighbours.append(data2)
+        for k in self._candidates(data, dataset):
+            if self.path_distance(data, dataset[k], threshold=self.eps) <= self.eps:
+                neighbours.append(k)
+
+        self._neighbours[i] = neighbours
+
         return neighbours
 
-    def _expand_cluster(self, data: 'Path', dataset: List['Path'], neighbours: List['Path']):
-        cluster = [data, ]
-        self.clustered.append(data)
+    def _expand_cluster(self, i: int, dataset: List['Path'], neighbours: List[int]) -> List[int]:
+        cluster = [i, ]
+        self.clustered.add(i)
 
-        for neighbour in neighbours:
-            if self._is_member(neighbour, self.clustered):
-                continue
+        # every path is queued at most once, in the order it was first found
+        seeds = deque()
+        queued = set()
+
+        def enqueue(indices: List[int]):
+            for k in indices:
+                if k not in queued and k not in self.clustered:
+                    seeds.append(k)
+                    queued.add(k)
 
-            neighbours2 = self._range_query(neighbour, dataset)
+        enqueue(neighbours)
+
+        while seeds:
+            k = seeds.popleft()
+
+            neighbours2 = self._range_query(k, dataset)
             if len(neighbours2) >= self.min_pts:
-                neighbours.extend(neighbours2)
+                enqueue(neighbours2)
 
-            if not self._is_member(neighbour, self.clustered):
-                cluster.append(neighbour)
-                self.clustered.append(neighbour)
+            cluster.append(k)
+            self.clustered.add(k)
 
         return cluster
 
-    def _is_member(self, data: 'Path', container: List['Path']):
-        for item in container:
-            if data == item:
-                return True
-        return False
-
 
 class DBSCAN(Algorithm, _DBSCAN):
     def __init__(self,
@@ -98,6 +184,7 @@ class DBSCAN(Algorithm, _DBSCAN):
 
     def process_ingresses(self, ingresses: List['Ingress']) -> List['Ingress']:
         self.reset()
+        self.distance_matrix(ingresses, sparse=True)
         self.predict(ingresses)
 
         processed_ingresses = []
@@ -117,6 +204,7 @@ class DBSCAN(Algorithm, _DBSCAN):
 
     def process_egresses(self, egresses: List['Egress']) -> List['Egress']:
         self.reset()
+        self.distance_matrix(egresses, sparse=True)
         self.predict(egresses)
 
         processed_egresses = []
@@ -1,6 +1,10 @@
+import heapq
+from collections.abc import Sequence
 from enum import Enum
 from typing import Callable, List
 
+import numpy as np
+
 from . import Algorithm
 from .. import INFINITY, utils
 from ..model import Map, Point
@@ -17,31 +21,323 @@ class DistanceMeasure(Enum):
     AVERAGE_LINKAGE = 2
 
 
+class MergeTree(Sequence):
+    '''Compact history of a hierarchical clustering.
+
+    The merges are stored in a scipy-style linkage array: the i-th row holds the
+    ids of the two merged clusters (the smaller first), their distance and the size
+    of the new cluster, which gets the id n + i. The original items are the clusters
+    with the ids 0..n-1. The score of each cut is the sum of the distances between
+    its clusters.
+
+    The i-th element of the tree is the list of clusters after i merges,
+    ordered by their ids, each cluster listing its items in merge order.
+    '''
+
+    def __init__(self, items: List['Path'], linkage: np.ndarray, scores: np.ndarray):
+        self.items = list(items)
+        self.linkage = linkage
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return max(len(self.items), 1)
+
+    def __getitem__(self, merges: int) -> List[List['Path']]:
+        if merges < 0:
+            merges += len(self)
+
+        if not 0 <= merges < len(self):
+            raise IndexError('merge tree index out of range')
+
+        n = len(self.items)
+        members = {id_: [id_, ] for id_ in range(n)}
+
+        for i in range(merges):
+            id_1, id_2 = int(self.linkage[i, 0]), int(self.linkage[i, 1])
+            members[n + i] = members.pop(id_1) + members.pop(id_2)
+
+        return [[self.items[k] for k in members[id_]] for id_ in sorted(members)]
+
+    def best_cut(self) -> int:
+        '''Get the number of merges of the first cut with the lowest score
+
+        Returns:
+            int: the number of merges
+        '''
+
+        return int(np.argmin(self.scores)) if len(self.scores) else 0
+
+
+KMEDOIDS_MAX_ITERATIONS = 10
+
+
+def _lance_williams(distances: np.ndarray, sizes: np.ndarray, a: int, b: int,
+                    measure: DistanceMeasure) -> np.ndarray:
+    '''Get the distances of the union of the clusters a and b from the other clusters'''
+
+    if measure == DistanceMeasure.SINGLE_LINKAGE:
+        return np.minimum(distances[a], distances[b])
+    elif measure == DistanceMeasure.COMPLETE_LINKAGE:
+        return np.maximum(distances[a], distances[b])
+    elif measure == DistanceMeasure.AVERAGE_LINKAGE:
+        return (sizes[a] * distances[a] + sizes[b] * distances[b]) / (sizes[a] + sizes[b])
+    else:
+        raise RuntimeError(f'Invalid distance measure: {measure}')
+
+
+def agglomerate(distances: np.ndarray, measure: DistanceMeasure) -> (np.ndarray, np.ndarray):
+    '''Merge the closest clusters until one remains
+
+    The closest pair is taken from a heap, the distances of the merged cluster
+    are derived from the distances of its parts with the Lance-Williams formula.
+    Equally close pairs are merged in the order of their cluster ids.
+
+    Args:
+        distances (np.ndarray): the square distance matrix of the items
+        measure (DistanceMeasure): the distance measure of the clusters
+
+    Returns:
+        (np.ndarray, np.ndarray): the linkage array and the score of every cut
+    '''
+
+    n = len(distances)
+
+    if n == 0:
+        return (np.empty((0, 4)), np.zeros(1))
+
+    distances = np.array(distances, dtype=float)
+    sizes = np.ones(n)
+    ids = np.arange(n)
+    slots = np.full(2 * n - 1, -1)
+    slots[:n] = np.arange(n)
+    active = np.ones(n, dtype=bool)
+
+    # entries of (distance, id_1, id_2), outdated when any of the clusters is merged
+    i, j = np.triu_indices(n, 1)
+    heap = sorted(zip(distances[i, j].tolist(), i.tolist(), j.tolist()))
+
+    linkage = np.empty((n - 1, 4))
+    scores = np.zeros(n)
+    total = distances[i, j].sum()
+    scores[0] = 2 * total
+
+    for step in range(n - 1):
+        while True:
+            distance, id_1, id_2 = heapq.heappop(heap)
+
+            if slots[id_1] >= 0 and slots[id_2] >= 0:
+                break
+
+        a, b = slots[id_1], slots[id_2]
+
+        row = _lance_williams(distances, sizes, a, b, measure)
+
+        active[a] = active[b] = False
+        others = np.flatnonzero(active)
+
+        total += row[others].sum() - distances[a, others].sum() - distances[b, others].sum() - distance
+
+        new_id = n + step
+        linkage[step] = (id_1, id_2, distance, sizes[a] + sizes[b])
+
+        distances[a, :] = distances[:, a] = row
+        distances[a, a] = 0
+        sizes[a] += sizes[b]
+        ids[a] = new_id
+        slots[id_1] = slots[id_2] = -1
+        slots[new_id] = a
+        active[a] = True
+
+        for k in others.tolist():
+            heapq.heappush(heap, (row[k], int(ids[k]), new_id))
+
+        scores[step + 1] = 2 * total if len(others) else 0
+
+    return (linkage, scores)
+
+
+def _bisect(distances: np.ndarray) -> np.ndarray:
+    '''Split items into two groups with k-medoids
+
+    Args:
+        distances (np.ndarray): the square distance matrix of the items
+
+    Returns:
+        np.ndarray: the group (0 or 1) of each item
+    '''
+
+    # start from the farthest item from the medoid and the farthest one from that
+    medoid = np.argmin(distances.sum(axis=1))
+    first = np.argmax(distances[medoid])
+    medoids = [first, np.argmax(distances[first])]
+
+    if medoids[0] == medoids[1]:
+        medoids[1] = (first + 1) % len(distances)
+
+    for _ in range(KMEDOIDS_MAX_ITERATIONS):
+        groups = np.argmin(distances[medoids], axis=0)
+        groups[medoids] = [0, 1]
+
+        new_medoids = []
+        for group in (0, 1):
+            members = np.flatnonzero(groups == group)
+            within = distances[np.ix_(members, members)].sum(axis=1)
+            new_medoids.append(members[np.argmin(within)])
+
+        if new_medoids == medoids:
+            break
+
+        medoids = new_medoids
+
+    return groups
+
+
+def divide(distances: np.ndarray, measure: DistanceMeasure, split_distance: float = 0) -> (np.ndarray, np.ndarray):
+    '''Split the items top-down by bisecting the widest cluster until every cluster is tight
+
+    A cluster is tight if its diameter is at most split_distance, those clusters
+    are not split any further. The result has the same form as the result of
+    agglomerate(): the items of the tight clusters are merged first (these cuts
+    are not scored), then the splits follow as merges in reverse order.
+
+    Args:
+        distances (np.ndarray): the square distance matrix of the items
+        measure (DistanceMeasure): the distance measure of the clusters
+        split_distance (float): the maximum diameter of a tight cluster
+
+    Returns:
+        (np.ndarray, np.ndarray): the linkage array and the score of every cut
+    '''
+
+    n = len(distances)
+
+    if n == 0:
+        return (np.empty((0, 4)), np.zeros(1))
+
+    distances = np.asarray(distances, dtype=float)
+
+    def diameter(members: np.ndarray) -> float:
+        return distances[np.ix_(members, members)].max()
+
+    # clusters are nodes identified by their position, splits refer to them
+    nodes = [np.arange(n), ]
+    splits = []
+    leaves = []
+    heap = [(-diameter(nodes[0]), 0)]
+
+    while heap:
+        width, node = heapq.heappop(heap)
+
+        if -width <= split_distance:
+            leaves.append(node)
+            continue
+
+        members = nodes[node]
+        groups = _bisect(distances[np.ix_(members, members)])
+
+        children = []
+        for group in (0, 1):
+            children.append(len(nodes))
+            nodes.append(members[groups == group])
+            heapq.heappush(heap, (-diameter(nodes[-1]), children[-1]))
+
+        splits.append((node, *children))
+
+    # the leaves are ordered by their smallest item and merged item by item
+    leaves.sort(key=lambda node: nodes[node].min())
+
+    linkage = np.empty((n - 1, 4))
+    scores = np.full(n, np.inf)
+    ids = {}
+    step = 0
+
+    for leaf in leaves:
+        members = np.sort(nodes[leaf])
+        ids[leaf] = int(members[0])
+        row = distances[members[0]]
+
+        for size, item in enumerate(members[1:].tolist(), 1):
+            sizes = np.array([size, 1.0])
+            rows = np.array([row, distances[item]])
+            linkage[step] = (*sorted([ids[leaf], item]), row[item], size + 1)
+            row = _lance_williams(rows, sizes, 0, 1, measure)
+            ids[leaf] = n + step
+            step += 1
+
+    # the distances of the leaves from each other
+    order = np.concatenate([nodes[leaf] for leaf in leaves])
+    starts = np.cumsum([0] + [len(nodes[leaf]) for leaf in leaves[:-1]])
+    sizes = np.array([len(nodes[leaf]) for leaf in leaves], dtype=float)
+    blocks = distances[np.ix_(order, order)]
+
+    if measure == DistanceMeasure.SINGLE_LINKAGE:
+        blocks = np.minimum.reduceat(np.minimum.reduceat(blocks, starts, axis=0), starts, axis=1)
+    elif measure == DistanceMeasure.COMPLETE_LINKAGE:
+        blocks = np.maximum.reduceat(np.maximum.reduceat(blocks, starts, axis=0), starts, axis=1)
+    elif measure == DistanceMeasure.AVERAGE_LINKAGE:
+        blocks = np.add.reduceat(np.add.reduceat(blocks, starts, axis=0), starts, axis=1)
+        blocks /= np.outer(sizes, sizes)
+    else:
+        raise RuntimeError(f'Invalid distance measure: {measure}')
+
+    np.fill_diagonal(blocks, 0)
+
+    slots = {leaf: slot for slot, leaf in enumerate(leaves)}
+    active = np.ones(len(leaves), dtype=bool)
+    total = np.triu(blocks, 1).sum()
+    scores[step] = 2 * total
+
+    for node, child_1, child_2 in reversed(splits):
+        a, b = sorted([slots.pop(child_1), slots.pop(child_2)])
+        distance = blocks[a, b]
+        row = _lance_williams(blocks, sizes, a, b, measure)
+
+        active[a] = active[b] = False
+        others = np.flatnonzero(active)
+        total += row[others].sum() - blocks[a, others].sum() - blocks[b, others].sum() - distance
+
+        id_1, id_2 = sorted([ids.pop(child_1), ids.pop(child_2)])
+        linkage[step] = (id_1, id_2, distance, sizes[a] + sizes[b])
+
+        blocks[a, :] = blocks[:, a] = row
+        blocks[a, a] = 0
+        sizes[a] += sizes[b]
+        active[a] = True
+        slots[node] = a
+        ids[node] = n + step
+        step += 1
+
+        scores[step] = 2 * total if len(others) else 0
+
+    return (linkage, scores)
+
+
 class Hierarchical(Algorithm):
     def __init__(self,
                  ref_point: 'Coordinate',
                  dist_func: Callable[['Path', 'Path'], float],
                  strategy: Strategy,
-                 distance_measure: DistanceMeasure):
+                 distance_measure: DistanceMeasure,
+                 split_distance: float = 0):
+        '''Create a Hierarchical instance
+
+        Args:
+            ref_point (Coordinate): the reference point
+            strategy (Strategy): merge the paths bottom-up or split them top-down
+            distance_measure (DistanceMeasure): the distance measure of the clusters
+            split_distance (float): top-down clusters whose paths are not further
+                from each other than this are not split
+        '''
 
         Algorithm.__init__(self, ref_point, dist_func)
         self._strategy = strategy
         self._distance_measure = distance_measure
+        self._split_distance = split_distance
 
     def _process(self, paths: List['Path']) -> List['Path']:
-        history = self.create_clusters(paths)
-
-        min_distance = 100000
-        best_clusters = None
-
-        for clusters in history:
-            distance = self.clusters_distance(clusters)
+        tree = self.create_clusters(paths)
 
-            if distance < min_distance:
-                min_distance = distance
-                best_clusters = clusters
-
-        return [cluster[0] for cluster in best_clusters]
+        return [cluster[0] for cluster in tree[tree.best_cut()]]
 
     def process_ingresses(self, ingresses: List['Ingress']) -> List['Ingress']:
         return self._process(ingresses)
@@ -62,7 +358,7 @@ class Hierarchical(Algorithm):
 
         return sum(distances)
 
-    def create_clusters(self, paths: List['Path']) -> List[List['Path']]:
+    def create_clusters(self, paths: List['Path']) -> 'MergeTree':
         if self._strategy == Strategy.TOP_DOWN:
             return self.cluster_top_down(paths)
         elif self._strategy == Strategy.BOTTOM_UP:
@@ -81,55 +377,26 @@ class Hierarchical(Algorithm):
             raise RuntimeError(
                 f'Invalid distance measure: {self._distance_measure}')
 
-    def cluster_top_down(self, paths: List['Path']) -> List[List['Path']]:
-        clusters = [paths, ]
-        # TODO
-        return NotImplemented
-
-    def cluster_bottom_up(self, paths: List['Path']) -> List[List['Path']]:
-        clusters = [[path, ] for path in paths]
-        history = [clusters[:], ]
-
-        while len(clusters) > 1:
-            min_dist = INFINITY
-            min_i = None
-            min_j = None
-
-            for i in range(len(clusters)):
-                for j in range(len(clusters)):
-                    if i == j:
-                        continue
-
-                    dist = self.calculate_distance(clusters[i], clusters[j])
-
-                    if min_dist > dist:
-                        min_dist = dist
-                        min_i = i
-                        min_j = j
-
-            new_cluster = []
-
-            for i in [min_i, min_j]:
-                for point in clusters[i]:
-                    new_cluster.append(point)
+    def cluster_top_down(self, paths: List['Path']) -> 'MergeTree':
+        matrix = self.distance_matrix(paths)
+        distances = matrix.to_square([matrix.index(path) for path in paths], self.distance_service)
+        linkage, scores = divide(distances, self._distance_measure, self._split_distance)
 
-            if min_j > min_i:
-                clusters.pop(min_j)
-                clusters.pop(min_i)
-            else:
-                clusters.pop(min_i)
-                clusters.pop(min_j)
+        return MergeTree(paths, linkage, scores)
 
-            clusters.append(new_cluster)
-            history.append(clusters[:])
+    def cluster_bottom_up(self, paths: List['Path']) -> 'MergeTree':
+        matrix = self.distance_matrix(paths)
+        distances = matrix.to_square([matrix.index(path) for path in paths], self.distance_service)
+        linkage, scores = agglomerate(distances, self._distance_measure)
 
-        return history
+        return MergeTree(paths, linkage, scores)
 
     def single_linkage(self, cluster_1: List['Path'], cluster_2: List['Path']) -> float:
         min_dist = INFINITY
         for path_1 in cluster_1:
             for path_2 in cluster_2:
-                dist = self.dist_func(path_1, path_2)
+                # only a distance below the current minimum matters
+                dist = self.path_distance(path_1, path_2, threshold=min_dist)
                 if dist < min_dist:
                     min_dist = dist
         return min_dist
@@ -138,7 +405,7 @@ class Hierarchical(Algorithm):
         max_dist = 0
         for path_1 in cluster_1:
             for path_2 in cluster_2:
-                dist = self.dist_func(path_1, path_2)
+                dist = self.path_distance(path_1, path_2)
                 if dist > max_dist:
                     max_dist = dist
         return max_dist
@@ -147,7 +414,7 @@ class Hierarchical(Algorithm):
         distances = []
         for path_1 in cluster_1:
             for path_2 in cluster_2:
-                dist = self.dist_func(path_1, path_2)
+                dist = self.path_distance(path_1, path_2)
                 distances.append(dist)
         if distances:
             return sum(distances) / len(distances)
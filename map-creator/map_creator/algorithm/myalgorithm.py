@@ -1,31 +1,65 @@
 import logging
-from typing import Callable, List
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import numpy as np
 
 from . import Algorithm
-from .. import utils
-from ..model import Ingress, Map, Point
+from .. import distance, haversine, utils
+from ..model import Ingress, Map, Point, coordinate_arrays
 
 LOGGER = logging.getLogger(__name__)
 
 
+class _Summary(NamedTuple):
+    '''The condensed points of a path and the values the mergeability checks need'''
+
+    type_: type
+    lats: np.ndarray
+    lons: np.ndarray
+    heading: float
+    centroid: np.ndarray
+
+
+class _Entry(NamedTuple):
+    '''The parts of an online path and their summaries'''
+
+    ingress: 'Ingress'
+    egress: 'Egress'
+    ingress_summary: _Summary
+    egress_summary: _Summary
+
+
 class MyAlgorithm(Algorithm):
     def __init__(self,
                  ref_point: 'Coordinate',
                  dist_func: Callable[['Path', 'Path'], float],
                  diff_distance: float,
-                 diff_heading: float):
+                 diff_heading: float,
+                 consolidation: int = None):
         '''Create a MyAlgorithm instance
 
         Args:
             ref_point (Coordinate): the reference point
             diff_distance (float): maximum average distance difference between two mergeable paths (in kilometers)
             diff_heading (float): maximum average heading difference between two mergeable paths (in degrees)
+            consolidation (int): cluster the online paths again at every consolidation-th snapshot,
+                never if None
         '''
 
         super().__init__(ref_point, dist_func)
 
         self._diff_distance = diff_distance
         self._diff_heading = diff_heading
+        self._consolidation = consolidation
+
+        # the online paths in insertion order
+        self._entries = {}
+        # the online clusters by their leaders, the leader is the first member
+        self._ingresses = {}
+        self._egresses = {}
+        # the ingress and the egress leader of every online path
+        self._leaders = {}
+        self._snapshots = 0
 
     def _average_distance(self, path1: 'Path', path2: 'Path') -> float:
         '''Calculates the average distance between the points of the two input paths.
@@ -40,20 +74,15 @@ class MyAlgorithm(Algorithm):
             float: the average distance between the points of the two paths
         '''
 
-        avg_distances = []
-
-        for point1 in path1.points:
-            avg_distance = 0
+        if not path1.points or not path2.points:
+            return 0
 
-            for point2 in path2.points:
-                avg_distance += point1.position.distance(point2.position)
+        distances = haversine.many_to_many(*coordinate_arrays(path1.points),
+                                           *coordinate_arrays(path2.points))
 
-            if path2.points:
-                avg_distance /= len(path2.points)
-
-            avg_distances.append(avg_distance)
-
-        return 0 if not avg_distances else sum(avg_distances) / len(avg_distances)
+        # every row has the same length, so the average of the row averages
+        # is the average of the whole matrix
+        return float(distances.mean())
 
     def _average_heading(self, path: 'Path') -> float:
         '''Calculates the average heading of the path
@@ -69,6 +98,41 @@ class MyAlgorithm(Algorithm):
 
         return 0 if not headings else sum(headings) / len(headings)
 
+    def _summarize(self, path: 'Path') -> _Summary:
+        '''Condense the path once and summarize it for the mergeability checks
+
+        Args:
+            path (Path): the path
+
+        Returns:
+            _Summary: the summary of the path
+        '''
+
+        lats, lons, headings = utils.condense_arrays(path)
+
+        heading = 0 if len(headings) == 0 else sum(headings.tolist()) / len(headings)
+
+        return _Summary(type(path), lats, lons, heading, haversine.centroid(lats, lons))
+
+    def _is_mergeable_summary(self, summary1: _Summary, summary2: _Summary) -> bool:
+        if summary1.type_ != summary2.type_:
+            return False
+
+        if abs(summary1.heading - summary2.heading) > self._diff_heading:
+            return False
+
+        if len(summary1.lats) == 0 or len(summary2.lats) == 0:
+            return True
+
+        # the average distance is at least R times the distance of the centroids
+        bound = haversine.R * float(np.linalg.norm(summary1.centroid - summary2.centroid))
+        if bound * distance.LOWER_BOUND_SLACK > self._diff_distance:
+            return False
+
+        distances = haversine.many_to_many(summary1.lats, summary1.lons, summary2.lats, summary2.lons)
+
+        return float(distances.mean()) <= self._diff_distance
+
     def _is_mergeable(self, path1: 'Path', path2: 'Path') -> bool:
         '''Determines if two the input paths are mergeable based
         on the average distance between their points, their average
@@ -85,16 +149,7 @@ class MyAlgorithm(Algorithm):
         if type(path1) != type(path2):
             return False
 
-        path1 = utils.condense(path1)
-        path2 = utils.condense(path2)
-
-        avg_distance = self._average_distance(path1, path2)
-
-        avg_heading1 = self._average_heading(path1)
-        avg_heading2 = self._average_heading(path2)
-
-        return avg_distance <= self._diff_distance and \
-            abs(avg_heading1 - avg_heading2) <= self._diff_heading
+        return self._is_mergeable_summary(self._summarize(path1), self._summarize(path2))
 
     def _merge(self, path1: 'Path', path2: 'Path') -> ('Path', 'Path'):
         '''Merge the two input paths if they are the same type.
@@ -118,20 +173,56 @@ class MyAlgorithm(Algorithm):
         return (path1, None)
 
     def _process(self, paths: List['Path']) -> List['Path']:
+        '''Merge the paths into the first path they are mergeable with.
+        Every path that is not merged yet takes all of the later mergeable paths
+        that are not merged yet.
+
+        Args:
+            paths (List[Path]): the paths, they are replaced by the merged ones
+
+        Returns:
+            List[Path]: the merged paths
+        '''
+
+        summaries = [self._summarize(path) for path in paths]
+
+        types = np.array([id(summary.type_) for summary in summaries], dtype=np.int64)
+        headings = np.array([summary.heading for summary in summaries], dtype=float).reshape(-1)
+        centroids = np.array([summary.centroid for summary in summaries], dtype=float).reshape(-1, 3)
+
+        # the index of the path each path is merged into
+        parents = np.arange(len(paths))
+
+        for i in range(len(paths)):
+            if parents[i] != i:
+                continue
+
+            candidates = np.arange(i + 1, len(paths))
+            candidates = candidates[(parents[i + 1:] == candidates) &
+                                    (types[i + 1:] == types[i]) &
+                                    (np.abs(headings[i + 1:] - headings[i]) <= self._diff_heading)]
+
+            # the average distance is at least R times the distance of the centroids,
+            # the comparison is False for the NaN centroid of an empty path
+            bounds = haversine.R * np.linalg.norm(centroids[candidates] - centroids[i], axis=1)
+            candidates = candidates[~(bounds * distance.LOWER_BOUND_SLACK > self._diff_distance)]
+
+            for j in candidates.tolist():
+                if self._is_mergeable_summary(summaries[i], summaries[j]):
+                    parents[j] = i
+
+        merged = []
+
         for i in range(len(paths)):
-            if i >= len(paths):
-                break
+            if parents[i] != i:
+                continue
 
-            for j in range(len(paths) - 1, -1, -1):
-                if i >= len(paths):
-                    break
+            for j in np.flatnonzero(parents == i)[:0:-1].tolist():
+                self._merge(paths[i], paths[j])
 
-                if i == j:
-                    continue
+            merged.append(paths[i])
 
-                if self._is_mergeable(paths[i], paths[j]):
-                    paths[i], _ = self._merge(paths[i], paths[j])
-                    del paths[j]
+        paths[:] = merged
 
         return paths
 
@@ -140,3 +231,121 @@ class MyAlgorithm(Algorithm):
 
     def process_egresses(self, egresses: List['Egress']) -> List['Egress']:
         return self._process(egresses)
+
+    def _join(self, clusters: Dict[Any, List], key, summary: Callable[[Any], _Summary]) -> Any:
+        '''Add an online path to the first cluster whose leader it is mergeable with,
+        or create a new cluster led by it
+
+        Args:
+            clusters (Dict[Any, List]): the members of the clusters by their leaders
+            key (Any): the key of the path
+            summary (Callable[[Any], _Summary]): the summary of a path by its key
+
+        Returns:
+            Any: the leader of the cluster of the path
+        '''
+
+        for leader, members in clusters.items():
+            if self._is_mergeable_summary(summary(leader), summary(key)):
+                members.append(key)
+                return leader
+
+        clusters[key] = [key]
+
+        return key
+
+    def _place(self, key):
+        ingress_leader = self._join(self._ingresses, key, lambda k: self._entries[k].ingress_summary)
+        egresses = self._egresses.setdefault(ingress_leader, {})
+        egress_leader = self._join(egresses, key, lambda k: self._entries[k].egress_summary)
+
+        self._leaders[key] = (ingress_leader, egress_leader)
+
+    def _displace(self, key):
+        ingress_leader, egress_leader = self._leaders.pop(key)
+
+        if ingress_leader == key:
+            # the other members may belong to other clusters without their leader
+            del self._egresses[key]
+            for member in self._ingresses.pop(key)[1:]:
+                self._place(member)
+            return
+
+        self._ingresses[ingress_leader].remove(key)
+
+        egresses = self._egresses[ingress_leader]
+        egresses[egress_leader].remove(key)
+
+        if egress_leader == key:
+            for member in egresses.pop(key):
+                self._leaders[member] = (ingress_leader,
+                                         self._join(egresses, member, lambda k: self._entries[k].egress_summary))
+
+    def insert(self, key, path: 'Path'):
+        '''Insert a path into the online clusters, replacing the path inserted with the same key.
+        The path joins the first cluster whose leader it is mergeable with, so only
+        the clusters of the changed paths are updated.
+
+        Args:
+            key (Any): the key of the path
+            path (Path): the path
+        '''
+
+        self.expire(key)
+
+        ingress = self.split(path)
+        egress = ingress.egresses[0]
+
+        self._entries[key] = _Entry(ingress, egress, self._summarize(ingress), self._summarize(egress))
+        self._place(key)
+
+    def expire(self, key):
+        '''Remove a path from the online clusters.
+        If the path leads a cluster, the other members of the cluster are placed again.
+
+        Args:
+            key (Any): the key of the path, unknown keys are ignored
+        '''
+
+        if key not in self._entries:
+            return
+
+        self._displace(key)
+        del self._entries[key]
+
+    def consolidate(self):
+        '''Cluster all the online paths again in insertion order'''
+
+        self._ingresses = {}
+        self._egresses = {}
+        self._leaders = {}
+
+        for key in self._entries:
+            self._place(key)
+
+    def snapshot(self) -> 'Map':
+        '''Create map data from the online clusters
+
+        Returns:
+            Map: the created map data, the leaders of the clusters represent them
+        '''
+
+        self._snapshots += 1
+
+        if self._consolidation and self._snapshots % self._consolidation == 0:
+            LOGGER.debug('Consolidate')
+            self.consolidate()
+
+        ingresses = []
+
+        for leader, egresses in self._egresses.items():
+            entry = self._entries[leader]
+
+            ingress = Ingress(columnar=entry.ingress.columnar)
+            ingress.id_ = entry.ingress.id_
+            ingress.points = entry.ingress.points
+            ingress.egresses = [self._entries[egress_leader].egress for egress_leader in egresses]
+
+            ingresses.append(ingress)
+
+        return Map(self._ref_point, ingresses)
@@ -0,0 +1,72 @@
+'''Decoding of the datagrams packed by the queue of the feeder.
+
+A datagram starts with a header: the magic bytes, the encoding, the sequence
+number of the datagram and the number of records, little-endian. The records
+are a JSON list of the encoded items, or in the binary encoding a block of
+fixed-width records (latitude, longitude and timestamp as float64, NaN if there
+is no timestamp) followed by the newline separated ids of the records.
+'''
+
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+MAGIC = b'MCDG'
+HEADER = struct.Struct('<4sBIH')
+RECORD = np.dtype([('latitude', '<f8'), ('longitude', '<f8'), ('timestamp', '<f8')])
+
+JSON = 0
+BINARY = 1
+
+
+def is_packed(data: bytes) -> bool:
+    '''Check if the datagram has a header
+
+    Args:
+        data (bytes): the datagram
+
+    Returns:
+        bool: whether the datagram starts with the magic bytes
+    '''
+
+    return data[:len(MAGIC)] == MAGIC
+
+
+def unpack(data: bytes) -> Tuple[int, int, int, bytes]:
+    '''Split the header of a datagram from its records
+
+    Args:
+        data (bytes): the datagram
+
+    Returns:
+        (int, int, int, bytes): the encoding, the sequence number and the number of the records,
+            and the records
+    '''
+
+    _, encoding, sequence, count = HEADER.unpack_from(data)
+
+    return (encoding, sequence, count, data[HEADER.size:])
+
+
+def decode_records(records: bytes, count: int) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    '''Decode the binary records of a datagram
+
+    Args:
+        records (bytes): the records
+        count (int): the number of the records
+
+    Returns:
+        (List[str], np.ndarray, np.ndarray, np.ndarray): the ids, latitudes, longitudes
+            and timestamps of the records, the timestamps are NaN for the records without one
+            and None if no record has one
+    '''
+
+    values = np.frombuffer(records, dtype=RECORD, count=count)
+    ids = records[count * RECORD.itemsize:].decode().split('\n') if count else []
+
+    timestamps = values['timestamp'].copy()
+    if np.isnan(timestamps).all():
+        timestamps = None
+
+    return (ids, values['latitude'].copy(), values['longitude'].copy(), timestamps)
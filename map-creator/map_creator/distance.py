@@ -1,47 +1,417 @@
-import itertools
+from enum import Enum
+import functools
 import math
-from typing import Callable, List
+from typing import Callable, Tuple, Union
 
-from . import INFINITY
-from .model import Coordinate, Point
+import numpy as np
 
+from . import INFINITY, haversine
+from .model import coordinate_arrays
+
+
+DTW_BLOCK_ROWS = 64
+
+# The bounds based on bounding boxes measure the distance to the closest
+# corner or edge in latitude/longitude space, which can overestimate the
+# great-circle distance by a relative error in the order of (distance / R)^2.
+LOWER_BOUND_SLACK = 1 - 1e-6
+
+
+class Band(Enum):
+    SAKOE_CHIBA = 0
+    ITAKURA = 1
+
+
+def get_distance_function(dist_func: Union[str, dict]) -> Callable[['Path', 'Path'], float]:
+    '''Create the configured distance function.
+
+    Every distance function accepts an optional threshold keyword argument.
+    When it is given, the function may stop as soon as it is sure that the
+    distance is greater than the threshold, and return INFINITY instead.
+
+    Args:
+        dist_func (str | dict): the name of the distance function or a dict
+            with its type and parameters, e.g.
+            {"type": "dtw", "band": "sakoe_chiba", "window": 5}
+
+    Returns:
+        Callable[[Path, Path], float]: the distance function
+    '''
+
+    params = {}
+
+    if isinstance(dist_func, dict):
+        params = dict(dist_func)
+        dist_func = params.pop('type', None)
 
-def get_distance_function(dist_func: str) -> Callable[['Path', 'Path'], float]:
     if dist_func == 'euclidean':
         return euclidean
     elif dist_func == 'dtw':
-        return dtw
+        band = params.get('band')
+
+        if not band:
+            return dtw
+
+        band = Band[band.upper()]
+
+        if band == Band.SAKOE_CHIBA:
+            window = params.get('window')
+
+            if window is None:
+                raise ValueError('window must be configured for the Sakoe-Chiba band')
+
+            return functools.partial(dtw, band=band, window=int(window))
+        else:
+            return functools.partial(dtw, band=band, slope=float(params.get('slope', 2)))
     else:
         raise RuntimeError(f'Unknown distance function: {dist_func}')
 
 
-def euclidean(path_1: 'Path', path_2: 'Path') -> float:
+def is_entry_bounded(dist_func: Callable[['Path', 'Path'], float]) -> bool:
+    '''Check whether the distance of two paths is never less than the distance of their first points
+
+    Args:
+        dist_func (Callable[[Path, Path], float]): the distance function
+
+    Returns:
+        bool: True for the DTW (also banded) and the euclidean distance
+    '''
+
+    return getattr(dist_func, 'func', dist_func) in (dtw, euclidean)
+
+
+def is_exit_bounded(dist_func: Callable[['Path', 'Path'], float]) -> bool:
+    '''Check whether the distance of two paths is never less than the distance of their last points
+
+    Args:
+        dist_func (Callable[[Path, Path], float]): the distance function
+
+    Returns:
+        bool: True for the DTW distance (also banded)
+    '''
+
+    return getattr(dist_func, 'func', dist_func) is dtw
+
+
+def euclidean(path_1: 'Path', path_2: 'Path', threshold: float = None) -> float:
     if len(path_1.points) == 0 or len(path_2.points) == 0:
         return INFINITY
 
-    distance = 0
+    if threshold is not None and lb_euclidean(path_1, path_2) > threshold:
+        return INFINITY
+
+    lats_1, lons_1 = _padded(*coordinate_arrays(path_1.points), len(path_2.points))
+    lats_2, lons_2 = _padded(*coordinate_arrays(path_2.points), len(path_1.points))
+
+    distances = haversine.pairwise(lats_1, lons_1, lats_2, lons_2)
+
+    return math.sqrt(float(np.dot(distances, distances)))
+
+
+def _padded(lats: np.ndarray, lons: np.ndarray, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Pad the coordinates with Coordinate(0, 0) up to the given length'''
+
+    if len(lats) >= length:
+        return (lats, lons)
+
+    padding = np.zeros(length - len(lats))
+
+    return (np.concatenate((lats, padding)), np.concatenate((lons, padding)))
+
+
+def _endpoint_distance(path_1: 'Path', path_2: 'Path', i: int, j: int) -> float:
+    lats_1, lons_1 = coordinate_arrays(path_1.points)
+    lats_2, lons_2 = coordinate_arrays(path_2.points)
+
+    return haversine.distance(lats_1[i], lons_1[i], lats_2[j], lons_2[j])
+
+
+def _box_distances(lats: np.ndarray, lons: np.ndarray,
+                   min_lats: np.ndarray, max_lats: np.ndarray,
+                   min_lons: np.ndarray, max_lons: np.ndarray) -> np.ndarray:
+    '''Calculate the distances between coordinates and bounding boxes'''
+
+    distances = haversine.pairwise(lats, lons,
+                                   np.clip(lats, min_lats, max_lats),
+                                   np.clip(lons, min_lons, max_lons))
+
+    return distances * LOWER_BOUND_SLACK
+
+
+def _bounding_box(path: 'Path') -> Tuple[float, float, float, float]:
+    lats, lons = coordinate_arrays(path.points)
+
+    return (lats.min(), lats.max(), lons.min(), lons.max())
+
+
+def lb_kim(path_1: 'Path', path_2: 'Path') -> float:
+    '''Calculate a lower bound of the DTW distance from the endpoints of the paths.
+    The first and the last points of the paths are always matched.
+
+    Args:
+        path_1 (Path): the first path
+        path_2 (Path): the second path
+
+    Returns:
+        float: the lower bound
+    '''
+
+    n = len(path_1.points)
+    m = len(path_2.points)
+
+    if n == 0 or m == 0:
+        return 0
+
+    bound = _endpoint_distance(path_1, path_2, 0, 0)
+
+    if n > 1 or m > 1:
+        bound += _endpoint_distance(path_1, path_2, -1, -1)
+
+    return bound
+
+
+def lb_keogh(path_1: 'Path', path_2: 'Path', band: Band = None,
+             window: int = 0, slope: float = 2) -> float:
+    '''Calculate a lower bound of the DTW distance from the envelope of path_2.
+    Every point of path_1 is matched at least once with a point of path_2
+    inside its band, so it is at least as far as the bounding box of those points.
+
+    Args:
+        path_1 (Path): the first path
+        path_2 (Path): the second path
+        band (Band): the global constraint of the warping path
+        window (int): the radius of the Sakoe-Chiba band (in cells)
+        slope (float): the maximum slope of the Itakura parallelogram
+
+    Returns:
+        float: the lower bound
+    '''
+
+    n = len(path_1.points)
+    m = len(path_2.points)
+
+    if n == 0 or m == 0:
+        return 0
+
+    lats_1, lons_1 = coordinate_arrays(path_1.points)
+
+    if band is None:
+        distances = _box_distances(lats_1, lons_1, *_bounding_box(path_2))
+    else:
+        lats_2, lons_2 = coordinate_arrays(path_2.points)
+        lower, upper = band_limits(n, m, band, window, slope)
+
+        # reduceat reduces the [lower[i], upper[i]) ranges at the even indices,
+        # the array is padded because upper[i] can be m
+        indices = np.empty(2 * n, dtype=int)
+        indices[0::2] = lower
+        indices[1::2] = upper
+
+        envelope = []
+        for values in (lats_2, lons_2):
+            padded = np.append(values, values[-1])
+            envelope.append(np.minimum.reduceat(padded, indices)[0::2])
+            envelope.append(np.maximum.reduceat(padded, indices)[0::2])
+
+        distances = _box_distances(lats_1, lons_1, *envelope)
+
+    return float(distances.sum())
+
+
+def lb_dtw(path_1: 'Path', path_2: 'Path', band: Band = None,
+           window: int = 0, slope: float = 2, threshold: float = None) -> float:
+    '''Calculate the tightest of the LB_Kim and LB_Keogh lower bounds of the DTW distance.
+    The cheaper bounds are calculated first, and if a threshold is given,
+    the bounds after the first one that exceeds it are skipped.
+
+    Args:
+        path_1 (Path): the first path
+        path_2 (Path): the second path
+        band (Band): the global constraint of the warping path
+        window (int): the radius of the Sakoe-Chiba band (in cells)
+        slope (float): the maximum slope of the Itakura parallelogram
+        threshold (float): stop when the bound is greater than this
+
+    Returns:
+        float: the lower bound
+    '''
+
+    # the banded distance is not less than the unbanded one,
+    # so the envelope of path_1 can be the whole path
+    bounds = (lambda: lb_kim(path_1, path_2),
+              lambda: lb_keogh(path_1, path_2, band, window, slope),
+              lambda: lb_keogh(path_2, path_1))
+
+    bound = 0
+    for lower_bound in bounds:
+        bound = max(bound, lower_bound())
+
+        if threshold is not None and bound > threshold:
+            break
+
+    return bound
+
+
+def lb_euclidean(path_1: 'Path', path_2: 'Path') -> float:
+    '''Calculate a lower bound of the euclidean distance from the first points
+    and the gap between the bounding boxes of the paths.
+
+    Args:
+        path_1 (Path): the first path
+        path_2 (Path): the second path
+
+    Returns:
+        float: the lower bound
+    '''
+
+    n = len(path_1.points)
+    m = len(path_2.points)
+
+    if n == 0 or m == 0:
+        return 0
+
+    min_lat_1, max_lat_1, min_lon_1, max_lon_1 = _bounding_box(path_1)
+    min_lat_2, max_lat_2, min_lon_2, max_lon_2 = _bounding_box(path_2)
+
+    if max_lat_1 < min_lat_2:
+        lat_1, lat_2 = max_lat_1, min_lat_2
+    elif max_lat_2 < min_lat_1:
+        lat_1, lat_2 = min_lat_1, max_lat_2
+    else:
+        # the same longitude gap is the shortest closest to the poles
+        low, high = max(min_lat_1, min_lat_2), min(max_lat_1, max_lat_2)
+        lat_1 = lat_2 = high if abs(high) > abs(low) else low
+
+    # the closest longitudes of the boxes, equal if they overlap
+    lon_1 = min(max(min_lon_2, min_lon_1), max_lon_1)
+    lon_2 = min(max(lon_1, min_lon_2), max_lon_2)
+
+    # every point of the shorter path is paired with a point of the other path
+    gap = haversine.distance(lat_1, lon_1, lat_2, lon_2) * LOWER_BOUND_SLACK
 
-    for p1, p2 in itertools.zip_longest(path_1.points, path_2.points, fillvalue=Point(None, Coordinate(0, 0))):
-        distance += p1.position.distance(p2.position) ** 2
+    return max(_endpoint_distance(path_1, path_2, 0, 0), math.sqrt(min(n, m)) * gap)
 
-    return math.sqrt(distance)
 
+@functools.lru_cache(maxsize=1024)
+def band_limits(n: int, m: int, band: Band = None, window: int = 0,
+                slope: float = 2) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    '''Calculate the columns of the DTW table that are allowed in each row.
 
-def dtw(path_1: 'Path', path_2: 'Path') -> float:
-    def _create_table(n: int, m: int) -> List[List[int]]:
-        table = []
-        for _ in range(n+1):
-            table.append([INFINITY for _ in range(m+1)])
-        table[0][0] = 0
-        return table
+    The limits are adjusted so that the allowed cells of consecutive rows
+    stay connected and the (0, 0), (n - 1, m - 1) cells are always allowed.
+
+    Args:
+        n (int): the number of rows
+        m (int): the number of columns
+        band (Band): the shape of the band, all cells are allowed if it is None
+        window (int): the radius of the Sakoe-Chiba band (in cells)
+        slope (float): the maximum slope of the Itakura parallelogram
+
+    Returns:
+        (Tuple[int], Tuple[int]): the first allowed and the first not allowed column of each row
+    '''
+
+    if band is None:
+        return ((0, ) * n, (m, ) * n)
+
+    x = np.arange(n) / (n - 1) if n > 1 else np.zeros(n)
+
+    if band == Band.SAKOE_CHIBA:
+        center = x * (m - 1)
+        lower = np.ceil(center - window)
+        upper = np.floor(center + window) + 1
+    elif band == Band.ITAKURA:
+        if slope <= 1:
+            raise ValueError('slope of the Itakura parallelogram must be greater than 1')
+
+        lower = np.ceil(np.maximum(x / slope, 1 - slope * (1 - x)) * (m - 1) - 1e-9)
+        upper = np.floor(np.minimum(x * slope, 1 - (1 - x) / slope) * (m - 1) + 1e-9) + 1
+    else:
+        raise RuntimeError(f'Invalid band: {band}')
+
+    lower = np.clip(lower, 0, m - 1).astype(int).tolist()
+    upper = np.clip(upper, 1, m).astype(int).tolist()
+
+    lower[0] = 0
+    upper[-1] = m
+
+    for i in range(1, n):
+        lower[i] = min(lower[i], upper[i - 1])
+        upper[i] = max(upper[i], lower[i - 1] + 1, lower[i] + 1)
+
+    return (tuple(lower), tuple(upper))
+
+
+def dtw(path_1: 'Path', path_2: 'Path', threshold: float = None,
+        band: Band = None, window: int = 0, slope: float = 2) -> float:
+    '''Calculate the dynamic time warping distance of two paths.
+
+    Only two rows of the DTW table are stored, the costs are calculated for
+    DTW_BLOCK_ROWS rows at once. If a band is given, only the cells inside
+    the band are evaluated. If a threshold is given, INFINITY is returned
+    without filling the table when a lower bound already exceeds it, and the
+    calculation is abandoned as soon as every cell of a row exceeds it.
+
+    Args:
+        path_1 (Path): the first path
+        path_2 (Path): the second path
+        threshold (float): INFINITY is returned if the distance is greater than this
+        band (Band): the global constraint of the warping path
+        window (int): the radius of the Sakoe-Chiba band (in cells)
+        slope (float): the maximum slope of the Itakura parallelogram
+
+    Returns:
+        float: the DTW distance of the paths
+    '''
 
     n = len(path_1.points)
     m = len(path_2.points)
-    table = _create_table(n, m)
-    for i in range(1, n+1):
-        for j in range(1, m+1):
-            coord_1 = path_1.points[i-1].position
-            coord_2 = path_2.points[j-1].position
-            table[i][j] = coord_1.distance(
-                coord_2) + min(table[i-1][j-1], table[i][j-1], table[i-1][j])
-    return table[n][m]
+
+    if n == 0 or m == 0:
+        return 0 if n == m else INFINITY
+
+    if threshold is not None and threshold < INFINITY:
+        if lb_dtw(path_1, path_2, band, window, slope, threshold=threshold) > threshold:
+            return INFINITY
+
+    lats_1, lons_1 = coordinate_arrays(path_1.points)
+    lats_2, lons_2 = coordinate_arrays(path_2.points)
+    lower, upper = band_limits(n, m, band, window, slope)
+
+    previous = np.full(m + 1, np.inf)
+    previous[0] = 0
+    current = np.full(m + 1, np.inf)
+
+    for start in range(0, n, DTW_BLOCK_ROWS):
+        end = min(start + DTW_BLOCK_ROWS, n)
+
+        # the costs are calculated for a block of rows at once, only for the
+        # columns that are inside the band in at least one of the rows
+        block_lo, block_hi = min(lower[start:end]), max(upper[start:end])
+        block = haversine.many_to_many(lats_1[start:end], lons_1[start:end],
+                                       lats_2[block_lo:block_hi], lons_2[block_lo:block_hi])
+
+        for i in range(start, end):
+            lo, hi = lower[i], upper[i]
+
+            costs = block[i - start, lo - block_lo:hi - block_lo]
+
+            # cells reached with a diagonal or a vertical step from the previous row
+            reached = costs + np.minimum(previous[lo:hi], previous[lo + 1:hi + 1])
+
+            # horizontal steps: D[j] = min(reached[j], costs[j] + D[j - 1]),
+            # which is C[j] + min(reached[k] - C[k] for k <= j) where C = cumsum(costs)
+            cumulative = costs.cumsum()
+
+            current.fill(np.inf)
+            current[lo + 1:hi + 1] = cumulative + \
+                np.minimum.accumulate(reached - cumulative)
+
+            if threshold is not None and current[lo + 1:hi + 1].min() > threshold:
+                return INFINITY
+
+            previous, current = current, previous
+
+    distance = float(previous[m])
+
+    return distance if math.isfinite(distance) else INFINITY
@@ -1,13 +1,23 @@
+from datetime import datetime, timedelta
+import json
 import logging
+import selectors
 import socket
 import time
 import threading
-from typing import Tuple
+from typing import List, Tuple
 
-from .model import Coordinate, Path, Point
+import numpy as np
+
+from . import datagram, haversine
+from .trace import BinaryTrace, is_binary
+from .model import EPOCH, Coordinate, Point
 
 LOGGER = logging.getLogger(__name__)
 
+# the datagrams at most this much behind the expected sequence number are reordered, not lost
+REORDER_WINDOW = 64
+
 
 def timeit(f):
     def wrapper(*args, **kwargs):
@@ -32,14 +42,19 @@ class Factory:
             if not path:
                 raise ValueError('path must be configured for FileFeeder')
 
-            return FileFeeder(rsu, path)
+            replay = config.get('replay', False)
+            speed = config.get('speed')
+
+            return FileFeeder(rsu, path, replay, speed)
         elif type_ == 'udp':
             host = config.get('host')
             port = config.get('port')
             server_host = config.get('server_host')
             server_port = config.get('server_port')
+            max_datagrams = config.get('max_datagrams', 256)
+            receive_buffer = config.get('receive_buffer')
 
-            return UdpFeeder(rsu, host, port, server_host, server_port)
+            return UdpFeeder(rsu, host, port, server_host, server_port, max_datagrams, receive_buffer)
         else:
             raise ValueError(f'invalid type: {type_}')
 
@@ -57,71 +72,184 @@ class Feeder:
     def is_open(self) -> bool:
         raise NotImplementedError
 
-    def decode(self, item: str) -> Tuple[str, float, float]:
-        id_, lat, lon = item.split(',')
+    def decode(self, item: str) -> Tuple[str, float, float, float]:
+        id_, lat, lon, *timestamp = item.split(',')
         id_ = str(id_)
         lat = float(lat)
         lon = float(lon)
-        return (id_, lat, lon)
+        timestamp = float(timestamp[0]) if timestamp else None
+        return (id_, lat, lon, timestamp)
+
+    def decode_lines(self, lines: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        '''Decode the items of the given lines in bulk
+
+        Args:
+            lines (List[str]): the lines, empty lines are skipped
+
+        Returns:
+            (List[str], np.ndarray, np.ndarray, np.ndarray): the ids, latitudes, longitudes
+                and timestamps of the items, the timestamps are NaN for the items without one
+                and None if no item has one
+        '''
+
+        lines = [line for line in lines if line.strip()]
+
+        if not lines:
+            return ([], np.empty(0), np.empty(0), None)
+
+        has_timestamp = lines[0].count(',') >= 3
+
+        try:
+            values = np.loadtxt(lines, delimiter=',', comments=None, ndmin=2,
+                                usecols=(1, 2, 3) if has_timestamp else (1, 2))
+        except ValueError:
+            # the items do not have the same fields
+            return self._decode_lines(lines)
+
+        ids = [line.split(',', 1)[0] for line in lines]
+        timestamps = values[:, 2].copy() if has_timestamp else None
+
+        return (ids, values[:, 0].copy(), values[:, 1].copy(), timestamps)
+
+    def _decode_lines(self, lines: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        items = [self.decode(line) for line in lines]
+
+        ids = [item[0] for item in items]
+        lats = np.array([item[1] for item in items], dtype=float)
+        lons = np.array([item[2] for item in items], dtype=float)
+
+        timestamps = None
+        if any(item[3] is not None for item in items):
+            timestamps = np.array([np.nan if item[3] is None else item[3] for item in items], dtype=float)
+
+        return (ids, lats, lons, timestamps)
+
+    def feed_batch(self, ids: List[str], lats: np.ndarray, lons: np.ndarray, timestamps: np.ndarray = None):
+        '''Add the points in range to the RSU with one write per vehicle, then update it
+
+        Args:
+            ids (List[str]): the ids of the vehicles
+            lats (np.ndarray): the latitudes
+            lons (np.ndarray): the longitudes
+            timestamps (np.ndarray): the timestamps (in seconds), NaN for the items without one
+        '''
+
+        if timestamps is not None and np.isnan(timestamps).any():
+            timestamps = self._fill_timestamps(timestamps)
+
+        distances = haversine.one_to_many(self.rsu.ref_point.latitude, self.rsu.ref_point.longitude, lats, lons)
+        in_range = np.flatnonzero(distances <= self.rsu.range_)
+
+        if len(in_range) > 0:
+            # map the ids to codes, then group the points by the codes in the order of the first points
+            names, first, codes = np.unique(np.asarray(ids)[in_range], return_index=True, return_inverse=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(names)))))
+
+            for code in np.argsort(first).tolist():
+                indices = in_range[order[bounds[code]:bounds[code + 1]]]
+                self.rsu.add_points(names[code].item(), lats[indices], lons[indices],
+                                    None if timestamps is None else timestamps[indices])
+
+        self.rsu.update()
+
+    def _fill_timestamps(self, timestamps: np.ndarray) -> np.ndarray:
+        '''Give the items without timestamp the time they would get when fed one by one:
+        the event time of the RSU with event time, the current time otherwise'''
+
+        missing = np.isnan(timestamps)
+
+        if missing.all():
+            return None
+
+        if self.rsu.event_time:
+            now = max(self.rsu.clock(), float(np.nanmax(timestamps)))
+        else:
+            now = (datetime.utcnow() - EPOCH).total_seconds()
+
+        return np.where(missing, now, timestamps)
 
     def feed_one(self, data: str):
-        id_, lat, lon = self.decode(data)
+        id_, lat, lon, timestamp = self.decode(data)
 
         coordinate = Coordinate(lat, lon)
         point = Point(id_, coordinate)
+
+        if timestamp is not None:
+            point.timestamp = EPOCH + timedelta(seconds=timestamp)
         distance = coordinate.distance(self.rsu.ref_point)
 
         if distance > self.rsu.range_:
             LOGGER.debug(f'Out of range: {distance} > {self.rsu.range_}')
             return
 
-        is_found = False
-
-        for index, path in enumerate(self.rsu.paths):
-            if id_ == path.id_:
-                LOGGER.debug(f'Add point to path: {id_}')
-                self.rsu.add_point(index, point)
-                self.rsu.update()
-                is_found = True
-                break
-
-        if not is_found:
-            LOGGER.debug(f'New path with id: {id_}')
-            path = Path()
-            path.add_point(point)
-            self.rsu.add_path(path)
-            self.rsu.update()
+        LOGGER.debug(f'Add point to path: {id_}')
+        self.rsu.add_point(id_, point, timestamp)
+        self.rsu.update()
 
 
 class FileFeeder(Feeder):
-    def __init__(self, rsu: 'Rsu', in_file: str):
+    def __init__(self, rsu: 'Rsu', in_file: str, replay: bool = False, speed: float = None,
+                 chunk_size: int = 1 << 20):
+        '''Create a FileFeeder instance
+
+        Args:
+            rsu (Rsu): the RSU
+            in_file (str): the path of the trace, a text or a binary trace
+            replay (bool): feed the trace in batches, a batch is a simulation step
+                if the items have timestamps, otherwise a chunk of the file
+                (a binary trace is always fed by steps)
+            speed (float): replay the steps this many times faster than their timestamps,
+                as fast as possible if None
+            chunk_size (int): the approximate size of the chunks read from the file (in bytes)
+        '''
+
         super().__init__(rsu)
         self.in_file = in_file
         self.f = None
+        self.trace = None
         self.eof = False
+        self.replay = replay
+        self.speed = speed
+        self.chunk_size = chunk_size
 
         LOGGER.info(f'File feeder initialized with filepath [{self.in_file}]')
 
     def open(self):
         LOGGER.info('Started File feeder')
 
+        if is_binary(self.in_file):
+            self.trace = BinaryTrace(self.in_file)
+            self.feed_steps()
+            return
+
         self.f = open(self.in_file, 'r')
-        self.feed()
+
+        if self.replay:
+            self.feed_batches()
+        else:
+            self.feed()
 
     def close(self):
         if self.f:
             self.f.close()
             self.f = None
 
+        self.trace = None
+
         LOGGER.info('Stopped File feeder')
 
     def is_open(self) -> bool:
-        return self.f is not None
+        return self.f is not None or self.trace is not None
 
     def feed(self):
         for line in self.f:
             self.feed_one(line)
 
+            # the windows of event time do not depend on the speed of the replay
+            if self.rsu.event_time:
+                continue
+
             if self.rsu._debug_server is not None:
                 time.sleep(0.1)
             else:
@@ -129,10 +257,96 @@ class FileFeeder(Feeder):
 
         self.close()
 
+    def _pace(self, timestamp: float):
+        if self._first_timestamp is None:
+            self._started = time.monotonic()
+            self._first_timestamp = timestamp
+
+        if self.speed:
+            delay = (timestamp - self._first_timestamp) / self.speed - (time.monotonic() - self._started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def feed_batches(self):
+        self._first_timestamp = None
+
+        # the last step of a chunk may continue in the next chunk, so it is fed with that one
+        pending = None
+
+        while True:
+            lines = self.f.readlines(self.chunk_size)
+
+            if lines:
+                ids, lats, lons, timestamps = self.decode_lines(lines)
+            else:
+                ids, lats, lons, timestamps = ([], np.empty(0), np.empty(0), None)
+
+            if pending is not None:
+                if timestamps is not None:
+                    ids = pending[0] + ids
+                    lats = np.concatenate((pending[1], lats))
+                    lons = np.concatenate((pending[2], lons))
+                    timestamps = np.concatenate((pending[3], timestamps))
+                else:
+                    self._feed_step(*pending)
+
+                pending = None
+
+            if not lines:
+                break
+
+            if not ids:
+                continue
+
+            if timestamps is None:
+                self.feed_batch(ids, lats, lons)
+                continue
+
+            bounds = [0] + (np.flatnonzero(np.diff(timestamps)) + 1).tolist() + [len(ids)]
+
+            for start, end in zip(bounds[:-2], bounds[1:-1]):
+                self._feed_step(ids[start:end], lats[start:end], lons[start:end], timestamps[start:end])
+
+            start = bounds[-2]
+            pending = (ids[start:], lats[start:], lons[start:], timestamps[start:])
+
+        self.close()
+
+    def _feed_step(self, ids: List[str], lats: np.ndarray, lons: np.ndarray, timestamps: np.ndarray):
+        self._pace(timestamps[0])
+        self.feed_batch(ids, lats, lons, timestamps)
+
+    def feed_steps(self):
+        self._first_timestamp = None
+
+        for ids, lats, lons, timestamp in self.trace.steps():
+            if timestamp is None:
+                self.feed_batch(ids, lats, lons)
+                continue
+
+            self._pace(timestamp)
+            self.feed_batch(ids, lats, lons, np.full(len(ids), timestamp, dtype=float))
+
+        self.close()
+
 
 class UdpFeeder(Feeder):
     def __init__(self, rsu: 'Rsu', host: str = 'localhost', port: int = 43256,
-                 server_host: str = 'localhost', server_port: int = 51836):
+                 server_host: str = 'localhost', server_port: int = 51836,
+                 max_datagrams: int = 256, receive_buffer: int = None):
+        '''Create a UdpFeeder instance
+
+        Args:
+            rsu (Rsu): the RSU
+            host (str): the host to bind to
+            port (int): the port to bind to
+            server_host (str): the host of the server
+            server_port (int): the port of the server
+            max_datagrams (int): the most datagrams drained and fed as one batch per wakeup
+            receive_buffer (int): the size of the receive buffer of the socket (in bytes),
+                the default of the system if None
+        '''
+
         super().__init__(rsu)
 
         if not host:
@@ -148,9 +362,25 @@ class UdpFeeder(Feeder):
             server_port = 51836
 
         self.server_addr = (server_host, server_port)
+        self.max_datagrams = max_datagrams
+        # the datagrams missing from the sequence, and the ones of them that may still arrive late
+        self.sequence = None
+        self.lost_datagrams = 0
+        self._missing = set()
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setblocking(0)
+
+        if receive_buffer:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+
         self.sock.bind((host, port))
+
+        # the receiver sleeps in the selector until a datagram arrives or close wakes it up
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(self._wakeup_reader, selectors.EVENT_READ)
+
         self.client_thread = threading.Thread(target=self.run_client_thread)
         self.client_thread.daemon = True
         self.stop_event = threading.Event()
@@ -160,31 +390,21 @@ class UdpFeeder(Feeder):
     def run_client_thread(self):
         is_connected = False
 
-        while not is_connected:
+        while not is_connected and not self.stop_event.is_set():
             try:
                 self.sock.sendto(b'connect', self.server_addr)
                 is_connected = True
             except BlockingIOError:
                 LOGGER.error(
                     f'Could not connect to {self.server_addr}. Retry in 10 seconds.')
-                time.sleep(10)
+                self.stop_event.wait(10)
 
         LOGGER.info(f'Connected to {self.server_addr}')
 
         while not self.stop_event.is_set():
-            try:
-                data, _ = self.sock.recvfrom(1024)
-
-                if not data:
-                    LOGGER.info('Nothing was received, exiting...')
-                    self.stop_event.set()
-                else:
-                    LOGGER.info(f'Received message: {data}')
-                    self.feed(data)
-            except BlockingIOError:
-                pass
-
-            time.sleep(0.1)
+            for key, _ in self.selector.select():
+                if key.fileobj is self.sock:
+                    self.receive()
 
         try:
             self.sock.sendto(b'disconnect', self.server_addr)
@@ -197,21 +417,120 @@ class UdpFeeder(Feeder):
         else:
             LOGGER.warning(f'Could not disconnect from {self.server_addr}')
 
+    def receive(self):
+        '''Drain the pending datagrams of the socket and feed them as one batch'''
+
+        datagrams = []
+
+        while len(datagrams) < self.max_datagrams:
+            try:
+                data, _ = self.sock.recvfrom(65535)
+            except BlockingIOError:
+                break
+
+            if not data:
+                LOGGER.info('Nothing was received, exiting...')
+                self.stop_event.set()
+                break
+
+            datagrams.append(data)
+
+        LOGGER.debug(f'Received {len(datagrams)} datagrams')
+
+        if datagrams:
+            self.feed(*datagrams)
+
     def open(self):
         self.client_thread.start()
         LOGGER.info('Started UDP feeder')
 
     def close(self):
         self.stop_event.set()
+        self._wakeup_writer.send(b'\0')
         self.client_thread.join()
+
+        self.selector.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+        self.sock.close()
+
         LOGGER.info('Stopped UDP feeder')
 
     def is_open(self) -> bool:
-        return self.stop_event.is_set()
+        return not self.stop_event.is_set()
+
+    def feed(self, *datagrams: bytes):
+        lines = []
+        columns = []
+
+        for data in datagrams:
+            if datagram.is_packed(data):
+                encoding, sequence, count, data = datagram.unpack(data)
+                self.check_sequence(sequence)
+
+                if encoding == datagram.BINARY:
+                    columns.append(datagram.decode_records(data, count))
+                    continue
+
+            lines.extend(self.decode_datagram(data))
 
-    def feed(self, data: bytes):
-        for item in self.split_list(data):
-            self.feed_one(self.decode_item(item))
+        if lines:
+            columns.append(self.decode_lines(lines))
+
+        if len(columns) == 1:
+            self.feed_batch(*columns[0])
+        elif columns:
+            ids = [id_ for c in columns for id_ in c[0]]
+            lats = np.concatenate([c[1] for c in columns])
+            lons = np.concatenate([c[2] for c in columns])
+
+            timestamps = None
+            if any(c[3] is not None for c in columns):
+                timestamps = np.concatenate([np.full(len(c[1]), np.nan) if c[3] is None else c[3]
+                                             for c in columns])
+
+            self.feed_batch(ids, lats, lons, timestamps)
+
+    def check_sequence(self, sequence: int):
+        '''Count the datagrams lost before the given one by its sequence number.
+        A lost datagram arriving late within the reorder window is not lost anymore.
+
+        Args:
+            sequence (int): the sequence number of the datagram
+        '''
+
+        if self.sequence is not None and sequence != self.sequence:
+            lost = (sequence - self.sequence) & 0xffffffff
+            behind = (self.sequence - sequence) & 0xffffffff
+
+            if behind <= REORDER_WINDOW:
+                if sequence in self._missing:
+                    self._missing.remove(sequence)
+                    self.lost_datagrams -= 1
+                    LOGGER.debug(f'Reordered datagram: {sequence}')
+                else:
+                    LOGGER.debug(f'Duplicate datagram: {sequence}')
+                return
+            elif lost < 0x80000000:
+                self.lost_datagrams += lost
+                self._missing.update((sequence - k) & 0xffffffff for k in range(1, min(lost, REORDER_WINDOW) + 1))
+                LOGGER.warning(f'Lost {lost} datagrams before {sequence}')
+            else:
+                self._missing.clear()
+                LOGGER.info(f'The sequence of the datagrams restarted at {sequence}')
+
+        self.sequence = (sequence + 1) & 0xffffffff
+
+        if self._missing:
+            # the datagrams behind the reorder window are lost for good
+            self._missing = {missing for missing in self._missing
+                             if (self.sequence - missing) & 0xffffffff <= REORDER_WINDOW}
+
+    def decode_datagram(self, data: bytes) -> List[str]:
+        try:
+            return json.loads(data)
+        except ValueError:
+            return [self.decode_item(item) for item in self.split_list(data)]
 
     def split_list(self, data: bytes) -> str:
         return data.decode().split('",')
@@ -0,0 +1,140 @@
+'''Haversine distance kernels for single coordinates and numpy arrays of coordinates.
+
+Latitudes and longitudes are given in degrees, distances are returned in kilometers.
+'''
+
+from math import atan2, cos, radians, sin, sqrt
+
+import numpy as np
+
+R = 6373.0
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    '''Calculate the distance between two coordinates
+
+    Args:
+        lat1 (float): latitude of the first coordinate
+        lon1 (float): longitude of the first coordinate
+        lat2 (float): latitude of the second coordinate
+        lon2 (float): longitude of the second coordinate
+
+    Returns:
+        float: the distance between the two coordinates
+    '''
+
+    lat1 = radians(lat1)
+    lon1 = radians(lon1)
+    lat2 = radians(lat2)
+    lon2 = radians(lon2)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+
+    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    return R * c
+
+
+def pairwise(lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    '''Calculate the element-wise distances between two arrays of coordinates.
+    The arrays are broadcast against each other.
+
+    Args:
+        lats1 (np.ndarray): latitudes of the first coordinates
+        lons1 (np.ndarray): longitudes of the first coordinates
+        lats2 (np.ndarray): latitudes of the second coordinates
+        lons2 (np.ndarray): longitudes of the second coordinates
+
+    Returns:
+        np.ndarray: the distances between the coordinates
+    '''
+
+    lats1 = np.radians(lats1)
+    lons1 = np.radians(lons1)
+    lats2 = np.radians(lats2)
+    lons2 = np.radians(lons2)
+
+    dlon = lons2 - lons1
+    dlat = lats2 - lats1
+
+    a = np.sin(dlat / 2)**2 + np.cos(lats1) * np.cos(lats2) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+
+def one_to_many(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    '''Calculate the distances between a coordinate and an array of coordinates
+
+    Args:
+        lat (float): latitude of the coordinate
+        lon (float): longitude of the coordinate
+        lats (np.ndarray): latitudes of the coordinates
+        lons (np.ndarray): longitudes of the coordinates
+
+    Returns:
+        np.ndarray: the distances, one for each coordinate in the array
+    '''
+
+    return pairwise(lat, lon, lats, lons)
+
+
+def many_to_many(lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    '''Calculate the distances between all coordinates of two arrays
+
+    Args:
+        lats1 (np.ndarray): latitudes of the first coordinates
+        lons1 (np.ndarray): longitudes of the first coordinates
+        lats2 (np.ndarray): latitudes of the second coordinates
+        lons2 (np.ndarray): longitudes of the second coordinates
+
+    Returns:
+        np.ndarray: the distance matrix, the element [i, j] is the distance
+            between the i-th first and the j-th second coordinate
+    '''
+
+    return pairwise(np.asarray(lats1)[:, np.newaxis], np.asarray(lons1)[:, np.newaxis],
+                    np.asarray(lats2)[np.newaxis, :], np.asarray(lons2)[np.newaxis, :])
+
+
+def consecutive(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    '''Calculate the distances between the consecutive coordinates of an array
+
+    Args:
+        lats (np.ndarray): latitudes of the coordinates
+        lons (np.ndarray): longitudes of the coordinates
+
+    Returns:
+        np.ndarray: the distances, the i-th element is the distance
+            between the i-th and the (i + 1)-th coordinate
+    '''
+
+    return pairwise(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+
+def centroid(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    '''Calculate the mean of the coordinates as unit vectors.
+
+    The great-circle distance is not less than the chord between the unit vectors,
+    so the average distance between the coordinates of two arrays is at least
+    R times the distance of their centroids.
+
+    Args:
+        lats (np.ndarray): latitudes of the coordinates
+        lons (np.ndarray): longitudes of the coordinates
+
+    Returns:
+        np.ndarray: the centroid (x, y, z), NaN if there are no coordinates
+    '''
+
+    if len(lats) == 0:
+        return np.full(3, np.nan)
+
+    lats = np.radians(lats)
+    lons = np.radians(lons)
+
+    return np.array([(np.cos(lats) * np.cos(lons)).mean(),
+                     (np.cos(lats) * np.sin(lons)).mean(),
+                     np.sin(lats).mean()])
@@ -0,0 +1,225 @@
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from . import INFINITY
+
+
+class _SparseValues(dict):
+    '''Distances stored by their offset, the missing ones are unknown (NaN)'''
+
+    def __missing__(self, key: int) -> float:
+        return np.nan
+
+    def take(self, keys: np.ndarray) -> np.ndarray:
+        return np.array([self[key] for key in keys.tolist()], dtype=float)
+
+
+class DistanceMatrix:
+    '''Symmetric matrix of the pairwise distances of paths in condensed form.
+
+    The distance of every unordered pair of paths is calculated at most once,
+    either when it is first requested or for all missing pairs with compute().
+    A pair that was compared with a threshold and turned out to be further
+    than it is remembered as a lower bound (stored as a negative value) until
+    a larger threshold requires the exact distance.
+
+    A sparse matrix only stores the distances that were calculated, which
+    suits many paths of which only the nearby ones are compared.
+
+    The distance of a path to itself is 0, it is never calculated.
+    '''
+
+    def __init__(self, paths: List['Path'], dist_func: Callable[['Path', 'Path'], float],
+                 sparse: bool = False):
+        self.paths = list(paths)
+        self.dist_func = dist_func
+        self.sparse = sparse
+
+        n = len(self.paths)
+
+        self._index = {id(path): i for i, path in enumerate(self.paths)}
+
+        if sparse:
+            self._condensed = _SparseValues()
+        else:
+            self._condensed = np.full(n * (n - 1) // 2, np.nan)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, path: 'Path') -> bool:
+        return id(path) in self._index
+
+    def index(self, path: 'Path') -> int:
+        '''Get the index of the path in the matrix
+
+        Args:
+            path (Path): the path
+
+        Returns:
+            int: the index of the path
+
+        Raises:
+            KeyError: if the path is not in the matrix
+        '''
+
+        return self._index[id(path)]
+
+    def _locate(self, i: int, j: int) -> (np.ndarray, int):
+        if i > j:
+            i, j = j, i
+
+        n = len(self.paths)
+
+        return (self._condensed, n * i - i * (i + 1) // 2 + j - i - 1)
+
+    def _calculate(self, values: np.ndarray, k: int, i: int, j: int, threshold: float = None) -> float:
+        distance = self.dist_func(self.paths[i], self.paths[j], threshold=threshold)
+        self._store(values, k, distance, threshold)
+
+        return distance
+
+    def _store(self, values: np.ndarray, k: int, distance: float, threshold: float = None):
+        if threshold is not None and distance >= INFINITY > threshold:
+            # the calculation might have been abandoned above the threshold
+            if threshold > 0:
+                values[k] = -threshold
+        else:
+            values[k] = distance
+
+    def _is_known(self, value: float, threshold: float = None) -> bool:
+        return value >= 0 or (value < 0 and threshold is not None and -value >= threshold)
+
+    def get(self, i: int, j: int, threshold: float = None) -> float:
+        '''Get the distance of the i-th and the j-th path
+
+        Args:
+            i (int): index of the first path
+            j (int): index of the second path
+            threshold (float): INFINITY may be returned if the distance is greater than this
+
+        Returns:
+            float: the distance of the paths
+        '''
+
+        if i == j:
+            return 0.0
+
+        values, k = self._locate(i, j)
+        value = values[k]
+
+        if value >= 0:
+            return float(value)
+
+        if self._is_known(value, threshold):
+            return INFINITY
+
+        return self._calculate(values, k, i, j, threshold)
+
+    def distance(self, path_1: 'Path', path_2: 'Path', threshold: float = None) -> float:
+        '''Get the distance of two paths of the matrix
+
+        Args:
+            path_1 (Path): the first path
+            path_2 (Path): the second path
+            threshold (float): INFINITY may be returned if the distance is greater than this
+
+        Returns:
+            float: the distance of the paths
+        '''
+
+        return self.get(self.index(path_1), self.index(path_2), threshold)
+
+    def _offsets(self, indices: Sequence[int]) -> (np.ndarray, np.ndarray, np.ndarray):
+        '''Get the unordered pairs of the given (distinct) indices
+        and their offsets in the condensed array'''
+
+        indices = np.asarray(indices, dtype=int)
+        a, b = np.triu_indices(len(indices), 1)
+        i = np.minimum(indices[a], indices[b])
+        j = np.maximum(indices[a], indices[b])
+
+        n = len(self.paths)
+
+        return (i, j, n * i - i * (i + 1) // 2 + j - i - 1)
+
+    def compute(self, indices: Sequence[int] = None, service: 'DistanceService' = None) -> 'DistanceMatrix':
+        '''Calculate the missing distances between the given paths
+
+        Args:
+            indices (Sequence[int]): distinct indices of the paths, all paths if None
+            service (DistanceService): calculate the distances with this service
+
+        Returns:
+            DistanceMatrix: the matrix itself
+        '''
+
+        if indices is None:
+            indices = range(len(self.paths))
+
+        indices = np.asarray(indices, dtype=int)
+        i, j, offsets = self._offsets(indices)
+
+        # NaN (unknown) and negative (lower bound) values are both calculated
+        missing = ~(self._condensed.take(offsets) >= 0)
+        pairs = list(zip(i[missing].tolist(), j[missing].tolist()))
+
+        return self.compute_pairs(pairs, service)
+
+    def compute_pairs(self, pairs: Sequence[Tuple[int, int]], service: 'DistanceService' = None,
+                      threshold: float = None) -> 'DistanceMatrix':
+        '''Calculate the missing distances of the given pairs of paths
+
+        Args:
+            pairs (Sequence[Tuple[int, int]]): the index pairs of the paths
+            service (DistanceService): calculate the distances with this service
+            threshold (float): the distances greater than this are only bounded
+
+        Returns:
+            DistanceMatrix: the matrix itself
+        '''
+
+        pairs = [(i, j) for i, j in pairs if i != j and not self._is_known(self._value(i, j), threshold)]
+
+        if service is None:
+            distances = [self.dist_func(self.paths[i], self.paths[j], threshold=threshold) for i, j in pairs]
+        else:
+            distances = service.distances(self.dist_func, self.paths, pairs, threshold).tolist()
+
+        for (i, j), distance in zip(pairs, distances):
+            values, k = self._locate(i, j)
+            self._store(values, k, distance, threshold)
+
+        return self
+
+    def _value(self, i: int, j: int) -> float:
+        values, k = self._locate(i, j)
+        return values[k]
+
+    def to_square(self, indices: Sequence[int] = None, service: 'DistanceService' = None) -> np.ndarray:
+        '''Get the square distance matrix of the given paths
+
+        Args:
+            indices (Sequence[int]): distinct indices of the paths, all paths if None
+            service (DistanceService): calculate the missing distances with this service
+
+        Returns:
+            np.ndarray: the distance matrix, the element [a, b] is the
+                distance of the paths indices[a] and indices[b]
+        '''
+
+        if indices is None:
+            indices = range(len(self.paths))
+
+        indices = np.asarray(indices, dtype=int)
+        self.compute(indices, service)
+
+        square = np.empty((len(indices), len(indices)))
+        a, b = np.triu_indices(len(indices), 1)
+        _, _, offsets = self._offsets(indices)
+
+        square[a, b] = square[b, a] = self._condensed.take(offsets)
+        np.fill_diagonal(square, 0)
+
+        return square
@@ -1,10 +1,16 @@
-from datetime import datetime
+from collections.abc import MutableSequence
+from datetime import datetime, timedelta
 import json
 from math import asin, atan2, cos, degrees, pi, radians, sin, sqrt
-from typing import Any, List
+from typing import Any, Iterable, List, Sequence, Tuple, Union
 
+import numpy as np
+
+from . import haversine
 from .uuid import generate_uuid
 
+EPOCH = datetime(1970, 1, 1)
+
 
 class JsonSerializable:
     def __init__(self):
@@ -35,6 +41,21 @@ class JsonSerializable:
         raise NotImplementedError
 
 
+def bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1 = radians(lat1)
+    lon1 = radians(lon1)
+    lat2 = radians(lat2)
+    lon2 = radians(lon2)
+
+    y = sin(lon2 - lon1) * cos(lat2)
+    x = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(lon2 - lon1)
+
+    initial_bearing = degrees(atan2(y, x))
+    compass_bearing = (initial_bearing + 360) % 360
+
+    return compass_bearing
+
+
 def vector_pairs(x: 'Vector', y: 'Vector', permissive: bool):
     x_idx, y_idx = 0, 0
     x_max, y_max = len(x.data), len(y.data)
@@ -195,34 +216,12 @@ class Coordinate(JsonSerializable, Vector):
         return f'Coordinate(latitude={self.latitude}, longitude={self.longitude})'
 
     def distance(self, other: 'Coordinate') -> float:
-        R = 6373.0
-
-        lat1 = radians(self.latitude)
-        lon1 = radians(self.longitude)
-        lat2 = radians(other.latitude)
-        lon2 = radians(other.longitude)
-
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-
-        return R * c
+        return haversine.distance(self.latitude, self.longitude,
+                                  other.latitude, other.longitude)
 
     def heading(self, other: 'Coordinate') -> float:
-        lat1 = radians(self.latitude)
-        lon1 = radians(self.longitude)
-        lat2 = radians(other.latitude)
-        lon2 = radians(other.longitude)
-
-        y = sin(lon2 - lon1) * cos(lat2)
-        x = cos(lat1) * sin(lat2) - sin(lat1) * cos(lat2) * cos(lon2 - lon1)
-
-        initial_bearing = degrees(atan2(y, x))
-        compass_bearing = (initial_bearing + 360) % 360
-
-        return compass_bearing
+        return bearing(self.latitude, self.longitude,
+                       other.latitude, other.longitude)
 
     def create_at(self, distance: float, heading: float):
         R = 6373.0
@@ -323,14 +322,259 @@ class Point(JsonSerializable, Vector):
         return point
 
 
+class PointArray(MutableSequence):
+    '''Columnar storage for the points of a path.
+
+    The latitude, longitude, heading and timestamp of the points are kept in
+    contiguous float64 arrays which grow geometrically, so appending a point is
+    amortized O(1). Removing the first points only advances the start of the
+    points, and the arrays are compacted when they run out of space.
+
+    Point objects are only created when an item is accessed, they are views of
+    the stored values and modifying them does not change the array.
+    '''
+
+    LATITUDE = 0
+    LONGITUDE = 1
+    HEADING = 2
+    TIMESTAMP = 3
+
+    def __init__(self, points: Iterable['Point'] = None, capacity: int = 16):
+        self.id_ = None
+        self._data = np.empty((4, max(capacity, 1)))
+        self._start = 0
+        self._size = 0
+
+        if points is not None:
+            self.extend(points)
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        return self._data[self.LATITUDE, self._start:self._start + self._size]
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        return self._data[self.LONGITUDE, self._start:self._start + self._size]
+
+    @property
+    def headings(self) -> np.ndarray:
+        return self._data[self.HEADING, self._start:self._start + self._size]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._data[self.TIMESTAMP, self._start:self._start + self._size]
+
+    @property
+    def columns(self) -> np.ndarray:
+        '''The stored values with one row for each of LATITUDE, LONGITUDE, HEADING and TIMESTAMP'''
+        return self._data[:, self._start:self._start + self._size]
+
+    @classmethod
+    def from_columns(cls, columns: np.ndarray, id_=None) -> 'PointArray':
+        '''Create a PointArray from the columns of another one
+
+        Args:
+            columns (np.ndarray): array of shape (4, n), see PointArray.columns
+            id_: the id of the points
+
+        Returns:
+            PointArray: the points, the columns are copied
+        '''
+
+        points = cls(capacity=columns.shape[1])
+        points.id_ = id_
+        points._data[:, :columns.shape[1]] = columns
+        points._size = columns.shape[1]
+
+        return points
+
+    def append_columns(self, columns: np.ndarray):
+        '''Append points given by their columns
+
+        Args:
+            columns (np.ndarray): array of shape (4, n), see PointArray.columns
+        '''
+
+        size = self._size + columns.shape[1]
+
+        self._reserve(size)
+        self._data[:, self._start + self._size:self._start + size] = columns
+        self._size = size
+
+    def _reserve(self, size: int):
+        capacity = self._data.shape[1]
+
+        if self._start + size <= capacity:
+            return
+
+        if size <= capacity // 2:
+            # the removed points at the start make enough room, at least as many
+            # points were removed since the last compaction as are copied now
+            self._data[:, :self._size] = self._data[:, self._start:self._start + self._size]
+            self._start = 0
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        data = np.empty((4, capacity))
+        data[:, :self._size] = self._data[:, self._start:self._start + self._size]
+        self._data = data
+        self._start = 0
+
+    def _index(self, idx: int) -> int:
+        '''The position of the item in the arrays'''
+
+        if idx < 0:
+            idx += self._size
+        if idx < 0 or idx >= self._size:
+            raise IndexError('PointArray index out of range')
+        return self._start + idx
+
+    def _point(self, idx: int) -> 'Point':
+        lat, lon, heading, timestamp = self._data[:, idx].tolist()
+
+        point = Point(self.id_, Coordinate(lat, lon))
+        point.heading = heading
+        point.timestamp = EPOCH + timedelta(seconds=timestamp)
+
+        return point
+
+    def _store(self, idx: int, point: 'Point'):
+        if self.id_ is None:
+            self.id_ = point.id_
+
+        self._data[:, idx] = (point.position.latitude,
+                              point.position.longitude,
+                              point.heading,
+                              (point.timestamp - EPOCH).total_seconds())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union['Point', List['Point']]:
+        if isinstance(idx, slice):
+            return [self._point(self._start + i) for i in range(*idx.indices(self._size))]
+        return self._point(self._index(idx))
+
+    def __setitem__(self, idx: int, point: 'Point'):
+        if isinstance(idx, slice):
+            raise TypeError('PointArray does not support slice assignment')
+        self._store(self._index(idx), point)
+
+    def __delitem__(self, idx: Union[int, slice]):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._size)
+
+            if start == 0 and step == 1:
+                self.remove_first(max(stop, 0))
+                return
+
+            keep = np.ones(self._size, dtype=bool)
+            keep[idx] = False
+            size = int(keep.sum())
+            self._data[:, self._start:self._start + size] = self.columns[:, keep]
+            self._size = size
+        else:
+            idx = self._index(idx)
+            end = self._start + self._size
+            self._data[:, idx:end - 1] = self._data[:, idx + 1:end]
+            self._size -= 1
+
+    def __iter__(self):
+        for idx in range(self._start, self._start + self._size):
+            yield self._point(idx)
+
+    def __repr__(self) -> str:
+        return f'PointArray(points=[{", ".join(repr(point) for point in self)}])'
+
+    def heading_to(self, position: 'Coordinate') -> float:
+        '''Calculate the heading from the last point to the given position
+
+        Args:
+            position (Coordinate): the target position
+
+        Returns:
+            float: the heading (in degrees)
+        '''
+        lat, lon = self._data[:2, self._index(-1)].tolist()
+        return bearing(lat, lon, position.latitude, position.longitude)
+
+    def set_heading(self, idx: int, heading: float):
+        self._data[self.HEADING, self._index(idx)] = heading
+
+    def insert(self, idx: int, point: 'Point'):
+        idx = min(max(idx + self._size if idx < 0 else idx, 0), self._size)
+
+        self._reserve(self._size + 1)
+        idx += self._start
+        end = self._start + self._size
+        self._data[:, idx + 1:end + 1] = self._data[:, idx:end]
+        self._size += 1
+        self._store(idx, point)
+
+    def append(self, point: 'Point'):
+        self._reserve(self._size + 1)
+        self._size += 1
+        self._store(self._start + self._size - 1, point)
+
+    def remove_first(self, number_of_points: int):
+        '''Remove the first points in O(1) by advancing the start of the points
+
+        Args:
+            number_of_points (int): the number of the points to remove
+        '''
+
+        number_of_points = min(number_of_points, self._size)
+
+        self._start += number_of_points
+        self._size -= number_of_points
+
+        if self._size == 0:
+            self._start = 0
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+
+def coordinate_arrays(points: List['Point']) -> Tuple[np.ndarray, np.ndarray]:
+    '''Get the latitudes and longitudes of the points as arrays.
+    The arrays of a PointArray are returned without copying.
+
+    Args:
+        points (List[Point]): the points
+
+    Returns:
+        (np.ndarray, np.ndarray): the latitudes and the longitudes
+    '''
+
+    if isinstance(points, PointArray):
+        return (points.latitudes, points.longitudes)
+
+    lats = np.fromiter((point.position.latitude for point in points), float, len(points))
+    lons = np.fromiter((point.position.longitude for point in points), float, len(points))
+
+    return (lats, lons)
+
+
 class Path(JsonSerializable):
-    def __init__(self):
+    def __init__(self, columnar: bool = False):
+        '''Create a Path instance
+
+        Args:
+            columnar (bool): store the points in a PointArray instead of a list
+        '''
         super().__init__()
 
         self.id_ = None
-        self.points = []
+        self.points = PointArray() if columnar else []
         self.iterator = 0
 
+    @property
+    def columnar(self) -> bool:
+        return isinstance(self.points, PointArray)
+
     def add_point(self, point: Point):
         if self.id_ is None:
             self.id_ = point.id_
@@ -338,17 +582,94 @@ class Path(JsonSerializable):
             heading = 0
 
             if self.points:
-                last_point = self.points[-1]
-                heading = last_point.position.heading(point.position)
-                last_point.heading = heading
+                if self.columnar:
+                    heading = self.points.heading_to(point.position)
+                    self.points.set_heading(-1, heading)
+                else:
+                    last_point = self.points[-1]
+                    heading = last_point.position.heading(point.position)
+                    last_point.heading = heading
 
             if heading is not None:
                 point.heading = heading
 
             self.points.append(point)
 
+    def add_coordinates(self, id_: str, latitudes: Sequence[float], longitudes: Sequence[float],
+                        timestamps: Sequence[float] = None):
+        '''Add points by their coordinates, the same way as add_point does one by one.
+        The points of a columnar path are stored without creating Point objects.
+
+        Args:
+            id_ (str): the id of the points
+            latitudes (Sequence[float]): the latitudes of the points
+            longitudes (Sequence[float]): the longitudes of the points
+            timestamps (Sequence[float]): the timestamps of the points (seconds since EPOCH),
+                the current time if None
+        '''
+
+        if self.id_ is None:
+            self.id_ = id_
+        if self.id_ != id_ or len(latitudes) == 0:
+            return
+
+        latitudes = np.asarray(latitudes, dtype=float).tolist()
+        longitudes = np.asarray(longitudes, dtype=float).tolist()
+
+        if timestamps is None:
+            timestamps = [(datetime.utcnow() - EPOCH).total_seconds()] * len(latitudes)
+        else:
+            timestamps = np.asarray(timestamps, dtype=float).tolist()
+
+        if not self.columnar:
+            for lat, lon, timestamp in zip(latitudes, longitudes, timestamps):
+                point = Point(id_, Coordinate(lat, lon))
+                point.timestamp = EPOCH + timedelta(seconds=timestamp)
+                self.add_point(point)
+            return
+
+        # every point heads to the next one, the last one keeps the heading from the previous one
+        lats = latitudes
+        lons = longitudes
+        if self.points:
+            lats = [float(self.points.latitudes[-1])] + lats
+            lons = [float(self.points.longitudes[-1])] + lons
+
+        headings = [bearing(lats[i], lons[i], lats[i + 1], lons[i + 1]) for i in range(len(lats) - 1)]
+        headings.append(headings[-1] if headings else 0)
+
+        if self.points:
+            self.points.set_heading(-1, headings.pop(0))
+        if self.points.id_ is None:
+            self.points.id_ = id_
+
+        self.points.append_columns(np.array([latitudes, longitudes, headings, timestamps]))
+
     def length(self) -> float:
-        return sum([self.points[i].position.distance(self.points[i + 1].position) for i in range(len(self.points) - 1)])
+        if len(self.points) < 2:
+            return 0
+
+        lats, lons = coordinate_arrays(self.points)
+        return float(haversine.consecutive(lats, lons).sum())
+
+    def copy(self) -> 'Path':
+        '''Copy the path with the same uuid and id. The copy has its own point container,
+        so adding or removing points does not change the original one.
+
+        Returns:
+            Path: the copy of the path
+        '''
+
+        path = Path(columnar=self.columnar)
+        path.uuid = self.uuid
+        path.id_ = self.id_
+
+        if self.columnar:
+            path.points = PointArray.from_columns(self.points.columns, self.points.id_)
+        else:
+            path.points = list(self.points)
+
+        return path
 
     def __iter__(self):
         self.iterator = 0
@@ -396,8 +717,8 @@ class Path(JsonSerializable):
 
 
 class Egress(Path):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, columnar: bool = False):
+        super().__init__(columnar)
 
     def __eq__(self, other: 'Egress') -> bool:
         if not isinstance(other, Egress):
@@ -431,8 +752,8 @@ class Egress(Path):
 
 
 class Ingress(Path):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, columnar: bool = False):
+        super().__init__(columnar)
         self.egresses = []
 
     def add_egress(self, egress: Egress):
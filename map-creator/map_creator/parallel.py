@@ -0,0 +1,178 @@
+'''Parallel calculation of path distances with a process or thread pool.'''
+
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from .model import Path, PointArray
+
+TASKS_PER_WORKER = 4
+
+
+def pack(paths: Sequence['Path']) -> Tuple[np.ndarray, np.ndarray]:
+    '''Pack the points of the paths into one array
+
+    Args:
+        paths (Sequence[Path]): the paths
+
+    Returns:
+        (np.ndarray, np.ndarray): the columns of the points (see PointArray.columns)
+            and the offsets of the paths in them
+    '''
+
+    columns = [(path.points if path.columnar else PointArray(path.points)).columns for path in paths]
+
+    offsets = np.zeros(len(columns) + 1, dtype=int)
+    offsets[1:] = np.cumsum([c.shape[1] for c in columns])
+
+    if not columns:
+        return (np.empty((4, 0)), offsets)
+
+    return (np.concatenate(columns, axis=1), offsets)
+
+
+def unpack(columns: np.ndarray, offsets: np.ndarray, ids: Sequence = None) -> List['Path']:
+    '''Create columnar paths from packed points
+
+    Args:
+        columns (np.ndarray): the columns of the points
+        offsets (np.ndarray): the offsets of the paths in the columns
+        ids (Sequence): the ids of the paths
+
+    Returns:
+        List[Path]: the paths
+    '''
+
+    if ids is None:
+        ids = [None] * (len(offsets) - 1)
+
+    paths = []
+
+    for id_, start, end in zip(ids, offsets[:-1].tolist(), offsets[1:].tolist()):
+        path = Path(columnar=True)
+        path.id_ = id_
+        path.points = PointArray.from_columns(columns[:, start:end], id_)
+        paths.append(path)
+
+    return paths
+
+
+def _subset(columns: np.ndarray, offsets: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = offsets[indices + 1] - offsets[indices]
+
+    sub_offsets = np.zeros(len(indices) + 1, dtype=int)
+    sub_offsets[1:] = np.cumsum(lengths)
+
+    # the positions of the points of the selected paths
+    positions = np.repeat(offsets[indices] - sub_offsets[:-1], lengths) + np.arange(sub_offsets[-1])
+
+    return (columns[:, positions], sub_offsets)
+
+
+def _calculate(dist_func: Callable[['Path', 'Path'], float], paths: List['Path'],
+               pairs: np.ndarray, threshold: float = None) -> np.ndarray:
+    return np.array([dist_func(paths[i], paths[j], threshold=threshold) for i, j in pairs.tolist()],
+                    dtype=float)
+
+
+def _calculate_packed(dist_func: Callable[['Path', 'Path'], float], columns: np.ndarray,
+                      offsets: np.ndarray, ids: List, pairs: np.ndarray, threshold: float = None) -> np.ndarray:
+    return _calculate(dist_func, unpack(columns, offsets, ids), pairs, threshold)
+
+
+class DistanceService:
+    '''Calculates the distances of path pairs with an executor.
+
+    The paths are split into tiles and a task calculates the pairs of two tiles.
+    If the paths are packed, a task only gets the point arrays of the paths it
+    needs instead of the pickled paths, and the workers rebuild them as
+    columnar paths.
+    '''
+
+    def __init__(self, executor: Executor, workers: int, pack_paths: bool = True):
+        '''Create a DistanceService instance
+
+        Args:
+            executor (Executor): the executor running the tasks
+            workers (int): the number of workers of the executor
+            pack_paths (bool): send packed point arrays instead of the paths to the tasks
+        '''
+
+        self.executor = executor
+        self.workers = workers
+        self.pack_paths = pack_paths
+
+    def distances(self, dist_func: Callable[['Path', 'Path'], float], paths: Sequence['Path'],
+                  pairs: Sequence[Tuple[int, int]], threshold: float = None) -> np.ndarray:
+        '''Calculate the distances of the given pairs of paths
+
+        Args:
+            dist_func (Callable[[Path, Path], float]): the distance function, picklable for a process pool
+            paths (Sequence[Path]): the paths
+            pairs (Sequence[Tuple[int, int]]): the index pairs of the paths
+            threshold (float): passed to the distance function
+
+        Returns:
+            np.ndarray: the distances of the pairs
+        '''
+
+        pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+        distances = np.empty(len(pairs))
+
+        if len(pairs) == 0:
+            return distances
+
+        # tiles * (tiles + 1) / 2 tile pairs for a few tasks per worker
+        tiles = max(1, math.ceil(math.sqrt(2 * TASKS_PER_WORKER * self.workers)))
+        size = max(1, math.ceil(len(paths) / tiles))
+
+        tile_1 = np.minimum(pairs[:, 0], pairs[:, 1]) // size
+        tile_2 = np.maximum(pairs[:, 0], pairs[:, 1]) // size
+        keys = tile_1 * tiles + tile_2
+
+        order = np.argsort(keys, kind='stable')
+        tasks = np.split(order, np.flatnonzero(np.diff(keys[order])) + 1)
+
+        if self.pack_paths:
+            columns, offsets = pack(paths)
+
+        futures = []
+
+        for task in tasks:
+            if self.pack_paths:
+                indices, local_pairs = np.unique(pairs[task], return_inverse=True)
+                sub_columns, sub_offsets = _subset(columns, offsets, indices)
+                ids = [paths[k].id_ for k in indices.tolist()]
+                futures.append(self.executor.submit(_calculate_packed, dist_func, sub_columns, sub_offsets,
+                                                    ids, local_pairs.reshape(-1, 2), threshold))
+            else:
+                futures.append(self.executor.submit(_calculate, dist_func, paths, pairs[task], threshold))
+
+        for task, future in zip(tasks, futures):
+            distances[task] = future.result()
+
+        return distances
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class Factory:
+    @staticmethod
+    def create(config: dict) -> DistanceService:
+        type_ = config.get('type')
+
+        if not type_:
+            raise ValueError('type must be configured')
+
+        workers = config.get('workers') or os.cpu_count() or 1
+
+        if type_ == 'process':
+            return DistanceService(ProcessPoolExecutor(workers), workers)
+        elif type_ == 'thread':
+            return DistanceService(ThreadPoolExecutor(workers), workers, pack_paths=False)
+        else:
+            raise ValueError(f'invalid type: {type_}')
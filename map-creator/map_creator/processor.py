@@ -1,8 +1,10 @@
 from typing import List
 
-from . import utils
+import numpy as np
 
-from .model import Path
+from . import haversine, utils
+
+from .model import Path, PointArray, coordinate_arrays
 
 
 class Processor:
@@ -27,9 +29,23 @@ class Processor:
 
         Returns:
             List[Point]: the filtered input points that are not
-                greater than self._range away from the ref_point
+                greater than self._range away from the ref_point,
+                a PointArray of the columns of the points for a PointArray
         '''
-        return [p for p in points if self._ref_point.distance(p.position) <= self._range]
+        if not points:
+            return []
+
+        lats, lons = coordinate_arrays(points)
+        distances = haversine.one_to_many(self._ref_point.latitude,
+                                          self._ref_point.longitude,
+                                          lats, lons)
+
+        indices = np.flatnonzero(distances <= self._range)
+
+        if isinstance(points, PointArray):
+            return PointArray.from_columns(points.columns[:, indices], points.id_)
+
+        return [points[i] for i in indices]
 
     def preprocess(self, paths: List['Path']) -> List['Path']:
         out_paths = []
@@ -42,8 +58,14 @@ class Processor:
                 continue
 
             path.points.clear()
-            for point in filtered_points:
-                path.add_point(point)
+            if path.columnar:
+                path.add_coordinates(filtered_points.id_,
+                                     filtered_points.latitudes,
+                                     filtered_points.longitudes,
+                                     filtered_points.timestamps)
+            else:
+                for point in filtered_points:
+                    path.add_point(point)
 
             # find the key points on path
             path = utils.find_key_points(path)
@@ -65,6 +87,30 @@ class Processor:
         map_data = self._algorithm.process(preprocessed_paths)
         return map_data
 
+    def update(self, paths: List['Path'], expired_paths: List['Path']) -> 'Map':
+        '''Update the online clusters of the algorithm with the changed paths
+
+        Args:
+            paths (List[Path]): the new and the changed paths
+            expired_paths (List[Path]): the removed paths
+
+        Returns:
+            Map: the map data of the online clusters
+        '''
+
+        for path in expired_paths:
+            self._algorithm.expire(path.uuid)
+
+        for path in paths:
+            preprocessed_paths = self.preprocess([path])
+
+            if preprocessed_paths:
+                self._algorithm.insert(path.uuid, preprocessed_paths[0])
+            else:
+                self._algorithm.expire(path.uuid)
+
+        return self._algorithm.snapshot()
+
     def postprocess(self, aggregated_map: 'Map', latest_map: 'Map') -> 'Map':
         '''Create the new aggregated map based on the
         current aggregated map and the latest map.
@@ -86,7 +132,7 @@ class Processor:
             matched = False
 
             for ingress2 in aggregated_map.ingresses:
-                if utils.compare_paths(ingress, ingress2, self._algorithm.dist_func) < max_diff:
+                if utils.compare_paths(ingress, ingress2, self._algorithm.dist_func, max_diff) < max_diff:
                     matched = True
                     break
 
@@ -97,7 +143,7 @@ class Processor:
                     matched = False
 
                     for egress2 in ingress2.egresses:
-                        if utils.compare_paths(egress, egress2, self._algorithm.dist_func) < max_diff:
+                        if utils.compare_paths(egress, egress2, self._algorithm.dist_func, max_diff) < max_diff:
                             matched = True
                             break
 
@@ -1,7 +1,14 @@
-from datetime import datetime
+from collections import deque
+import heapq
+from itertools import count
 import logging
-from threading import Lock
+from threading import Event, Lock, Thread
+import time
+from typing import List, Tuple
 
+import numpy as np
+
+from .model import Path, PointArray
 from .uuid import generate_uuid
 from .wrapper import WrappedMap
 
@@ -9,19 +16,18 @@ from .wrapper import WrappedMap
 LOGGER = logging.getLogger(__name__)
 
 
-def non_blocking_lock(lock):
-    def outer(function):
-        def inner(*args, **kwargs):
-            l = getattr(args[0], lock)
-            if l.acquire(False):
-                try:
-                    return function(*args, **kwargs)
-                finally:
-                    l.release()
-            else:
-                LOGGER.error(f'Could not acquire lock: {lock}')
-        return inner
-    return outer
+class EventClock:
+    '''Clock of the event timestamps, its time is the latest timestamp'''
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+    def advance(self, timestamp: float):
+        if timestamp > self.time:
+            self.time = timestamp
 
 
 class Rsu:
@@ -29,17 +35,50 @@ class Rsu:
                  processor: 'Processor',
                  update_time: int = 60,
                  time_window: int = 120,
-                 debug_server: 'DebugHTTPServer' = None):
+                 debug_server: 'DebugHTTPServer' = None,
+                 online: bool = False,
+                 background: bool = False,
+                 event_time: bool = False):
         self.ref_point = processor._ref_point
         self.range_ = processor._range
 
+        # the timestamps of the points and the updates are seconds of this clock
+        self.clock = time.monotonic
+
         self.update_time = update_time
         self.time_window = time_window
-        self.last_update = datetime.utcnow()
+        self.last_update = self.clock()
+        self.event_time = event_time
 
-        self.paths = []
+        self._paths = {}
+        self.paths_by_id = {}
         self.paths_lock = Lock()
 
+        # a heap of the oldest timestamps of the paths. With event time the points expire by
+        # the timestamps of their columns, otherwise by the clock at their writes, which are
+        # kept as [timestamp, number of points] runs for every path
+        self._expiry = []
+        self._expiry_order = count()
+        self._writes = {}
+
+        # the writes while the paths are locked, applied in order by the next lock holder,
+        # and the number of points written to the buffer and added to the paths
+        self._buffer = []
+        self._buffer_lock = Lock()
+        self.buffered_points = 0
+        self.applied_points = 0
+
+        # update the online clusters of the algorithm with the changes only
+        self.online = online
+        self._changed_paths = {}
+        self._expired_paths = {}
+
+        # compute the map on a worker thread, update only requests it
+        self.background = background
+        self._worker = None
+        self._update_requested = Event()
+        self._stop_event = Event()
+
         self._processor = processor
         self._debug_server = debug_server
 
@@ -55,69 +94,335 @@ class Rsu:
                 'range': self.range_
             }
 
+    @property
+    def event_time(self) -> bool:
+        '''Whether the windows and the updates follow the timestamps of the points instead of the wall clock'''
+        return isinstance(self.clock, EventClock)
+
+    @event_time.setter
+    def event_time(self, event_time: bool):
+        if event_time != self.event_time:
+            self.clock = EventClock() if event_time else time.monotonic
+            self.last_update = self.clock()
+
+    @property
+    def paths(self) -> List['Path']:
+        return list(self._paths.values())
+
     def _update_paths(self):
-        now = datetime.utcnow()
+        '''Apply the buffered writes, then remove the points older than the time window
+        and the paths without points.
+
+        Only the paths with the oldest points are visited, and removing the first
+        points of a path only advances the start of its points.
+        '''
+
+        self._apply_buffer()
+
+        limit = self.clock() - self.time_window
+
+        while self._expiry and self._expiry[0][0] < limit:
+            _, _, path = heapq.heappop(self._expiry)
+
+            number_of_points = self._count_expired(path, limit)
+            LOGGER.debug(f'Removed {number_of_points} points from path {path.uuid}')
+            path.points.remove_first(number_of_points)
+
+            if path.points:
+                self._changed_paths[path.uuid] = path
+                self._push_expiry(path)
+            else:
+                LOGGER.debug(f'Removed path {path.uuid}')
+                self._changed_paths.pop(path.uuid, None)
+                self._expired_paths[path.uuid] = path
+                if self.paths_by_id.get(path.id_) is path:
+                    del self.paths_by_id[path.id_]
+                del self._paths[path.uuid]
+                self._writes.pop(path.uuid, None)
+
+    def _count_expired(self, path: 'Path', limit: float) -> int:
+        if self.event_time:
+            # the event times of a path do not decrease
+            return int(np.searchsorted(path.points.timestamps, limit))
+
+        writes = self._writes[path.uuid]
+        number_of_points = 0
+
+        while writes and writes[0][0] < limit:
+            number_of_points += writes.popleft()[1]
+
+        return number_of_points
+
+    def _push_expiry(self, path: 'Path'):
+        if self.event_time:
+            oldest = float(path.points.timestamps[0])
+        else:
+            oldest = self._writes[path.uuid][0][0]
+
+        heapq.heappush(self._expiry, (oldest, next(self._expiry_order), path))
+
+    def _record_write(self, path: 'Path', timestamp: float, number_of_points: int):
+        '''Record the timestamp of the points appended to the path, which had the given number of points'''
+
+        if not self.event_time:
+            writes = self._writes.setdefault(path.uuid, deque())
+            if writes and writes[-1][0] == timestamp:
+                writes[-1][1] += len(path.points) - number_of_points
+            else:
+                writes.append([timestamp, len(path.points) - number_of_points])
+
+        if number_of_points == 0 and path.points:
+            self._push_expiry(path)
+
+    def _store_path(self, path: 'Path', timestamp: float):
+        if not path.columnar:
+            path.points = PointArray(path.points)
+
+        if self.event_time:
+            path.points.timestamps[:] = timestamp
+
+        self._paths[path.uuid] = path
+        self.paths_by_id[path.id_] = path
+        self._changed_paths[path.uuid] = path
+
+        if path.points:
+            self._record_write(path, timestamp, 0)
+
+    def _add_path(self, path: 'Path', timestamp: float):
+        self._store_path(path, timestamp)
+        self.applied_points += len(path.points)
+
+    def _add_point(self, id_: str, point: 'Point', timestamp: float):
+        path = self.paths_by_id.get(id_)
+
+        if path is None:
+            LOGGER.debug(f'New path with id: {id_}')
+            path = Path(columnar=True)
+            path.add_point(point)
+            self._store_path(path, timestamp)
+        else:
+            number_of_points = len(path.points)
+            path.add_point(point)
+
+            if self.event_time and len(path.points) > number_of_points:
+                path.points.timestamps[-1] = timestamp
+
+            self._record_write(path, timestamp, number_of_points)
+            self._changed_paths[path.uuid] = path
 
-        for i in range(len(self.paths) - 1, -1, -1):
-            path = self.paths[i]
+        self.applied_points += 1
 
-            for j in range(len(path.points) - 1, -1, -1):
-                point = path.points[j]
+    def _add_points(self, id_: str, latitudes: np.ndarray, longitudes: np.ndarray,
+                    point_timestamps: np.ndarray, timestamp: float):
+        path = self.paths_by_id.get(id_)
 
-                if (now - point.timestamp).total_seconds() > self.time_window:
-                    LOGGER.debug(
-                        f'Removed point {point.uuid} from path {path.uuid}')
-                    del path.points[j]
+        if path is None:
+            LOGGER.debug(f'New path with id: {id_}')
+            path = Path(columnar=True)
+            path.add_coordinates(id_, latitudes, longitudes, point_timestamps)
+            self._paths[path.uuid] = path
+            self.paths_by_id[id_] = path
+            self._record_write(path, timestamp, 0)
+        else:
+            number_of_points = len(path.points)
+            path.add_coordinates(id_, latitudes, longitudes, point_timestamps)
+            self._record_write(path, timestamp, number_of_points)
 
-            if len(path.points) == 0:
-                LOGGER.debug(f'Removed path {self.paths[i].uuid}')
-                del self.paths[i]
+        self._changed_paths[path.uuid] = path
+        self.applied_points += len(latitudes)
 
-    @non_blocking_lock('paths_lock')
-    def add_path(self, path: 'Path'):
-        self.paths.append(path)
+    def _write(self, number_of_points: int, function, *args):
+        if self.paths_lock.acquire(False):
+            try:
+                self._apply_buffer()
+                function(*args)
+            finally:
+                self.paths_lock.release()
+        else:
+            with self._buffer_lock:
+                self._buffer.append((function, args))
+                self.buffered_points += number_of_points
 
-    @non_blocking_lock('paths_lock')
-    def add_point(self, index: int, point: 'Point'):
-        if index >= len(self.paths):
+    def _apply_buffer(self):
+        '''Apply the buffered writes, the paths lock must be held'''
+
+        with self._buffer_lock:
+            buffer, self._buffer = self._buffer, []
+
+        for function, args in buffer:
+            function(*args)
+
+    def _timestamp(self, timestamp: float = None) -> float:
+        '''The timestamp of the expiry of points with the given event time. Without event time
+        the points expire by the clock, and their event time is only data of the points.
+        '''
+
+        if timestamp is None or not self.event_time:
+            return self.clock()
+
+        self.clock.advance(timestamp)
+
+        return timestamp
+
+    def add_path(self, path: 'Path', timestamp: float = None):
+        '''Add a path. If the paths are locked, the path is buffered until the next write or update.
+
+        Args:
+            path (Path): the path
+            timestamp (float): the event time of the points (in seconds), their expiry only in event time mode
+        '''
+
+        self._write(len(path.points), self._add_path, path, self._timestamp(timestamp))
+
+    def add_point(self, id_: str, point: 'Point', timestamp: float = None):
+        '''Add a point to the path with the given id, a new path is created for an unknown id.
+        If the paths are locked, the point is buffered until the next write or update.
+
+        Args:
+            id_ (str): the id of the path
+            point (Point): the point
+            timestamp (float): the event time of the point (in seconds), its expiry only in event time mode
+        '''
+
+        self._write(1, self._add_point, id_, point, self._timestamp(timestamp))
+
+    def add_points(self, id_: str, latitudes: np.ndarray, longitudes: np.ndarray,
+                   timestamps: np.ndarray = None):
+        '''Add points to the path with the given id in one write, a new path is created for an unknown id.
+        If the paths are locked, the points are buffered until the next write or update.
+
+        Args:
+            id_ (str): the id of the path
+            latitudes (np.ndarray): the latitudes of the points
+            longitudes (np.ndarray): the longitudes of the points
+            timestamps (np.ndarray): the event times of the points (in seconds), their expiry only in event time mode
+        '''
+
+        if len(latitudes) == 0:
             return
 
-        self.paths[index].add_point(point)
+        if self.event_time:
+            if timestamps is None:
+                timestamps = np.full(len(latitudes), self.clock())
+            else:
+                self._timestamp(float(np.max(timestamps)))
+
+        # the points of one write expire together without event time
+        self._write(len(latitudes), self._add_points, id_, latitudes, longitudes, timestamps, self.clock())
 
-    @non_blocking_lock('paths_lock')
     def update(self):
-        if not self.update_time or (self.elapsed_time() >= self.update_time):
-            LOGGER.debug('Update')
+        if self._worker is not None:
+            self._update_requested.set()
+            return
+
+        # an update is running or a write is applied
+        if not self.paths_lock.acquire(False):
+            return
 
-            self.last_update = datetime.utcnow()
+        try:
+            self._apply_buffer()
 
-            if self.time_window is not None:
-                LOGGER.debug('Update paths')
-                self._update_paths()
+            if self.is_update_due():
+                self._process(*self._collect_paths())
+        finally:
+            self.paths_lock.release()
 
-            LOGGER.debug(f'len(paths)={len(self.paths)}')
+    def is_update_due(self) -> bool:
+        return not self.update_time or (self.elapsed_time() >= self.update_time)
 
-            map_data = self._processor.process(self.paths)
-            self._map = self._processor.postprocess(self._map, map_data)
+    def _collect_paths(self) -> Tuple[List['Path'], List['Path']]:
+        '''Remove the expired points and collect copies of the paths of the update,
+        so they can be processed while points are added
 
-            if self._debug_server:
-                self._debug_server.latest_map = self.generated_map
+        Returns:
+            (List[Path], List[Path]): the paths to process (the changed ones if online)
+                and the expired paths
+        '''
+
+        LOGGER.debug('Update')
+
+        self.last_update = self.clock()
+
+        if self.time_window is not None:
+            LOGGER.debug('Update paths')
+            self._update_paths()
+
+        LOGGER.debug(f'len(paths)={len(self.paths)}')
+
+        paths = self._changed_paths if self.online else self._paths
+        paths = [path.copy() for path in paths.values()]
+        expired_paths = list(self._expired_paths.values())
+
+        self._changed_paths.clear()
+        self._expired_paths.clear()
+
+        return (paths, expired_paths)
+
+    def _process(self, paths: List['Path'], expired_paths: List['Path']):
+        if self.online:
+            map_data = self._processor.update(paths, expired_paths)
+        else:
+            map_data = self._processor.process(paths)
+
+        self._map = self._processor.postprocess(self._map, map_data)
+
+        if self._debug_server:
+            self._debug_server.latest_map = self.generated_map
+
+    def _run_worker(self):
+        while True:
+            self._update_requested.wait()
+
+            if self._stop_event.is_set():
+                break
+
+            self._update_requested.clear()
+
+            if not self.is_update_due():
+                # the event time only advances with the next point, which requests the update again
+                if not self.event_time:
+                    self._update_requested.set()
+                    self._stop_event.wait(self.update_time - self.elapsed_time())
+                continue
+
+            with self.paths_lock:
+                self._apply_buffer()
+                paths, expired_paths = self._collect_paths()
+
+            try:
+                self._process(paths, expired_paths)
+            except Exception:
+                LOGGER.exception('Update failed')
 
     @property
     def generated_map(self):
         wrapped_map = WrappedMap(self._map)
         return wrapped_map.to_json()
 
-    def elapsed_time(self):
-        now = datetime.utcnow()
-        elapsed = (now - self.last_update).total_seconds()
-        return elapsed
+    def elapsed_time(self) -> float:
+        return self.clock() - self.last_update
 
     def open(self):
         if self._debug_server:
             self._debug_server.start()
 
+        if self.background and self._worker is None:
+            self._stop_event.clear()
+            self._worker = Thread(target=self._run_worker)
+            self._worker.daemon = True
+            self._worker.start()
+
     def close(self):
+        if self._worker is not None:
+            self._stop_event.set()
+            self._update_requested.set()
+            self._worker.join()
+            self._worker = None
+
+        # the writes buffered after the last lock holder
+        with self.paths_lock:
+            self._apply_buffer()
+
         if self._debug_server:
             self._debug_server.stop()
 
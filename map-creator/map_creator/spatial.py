@@ -0,0 +1,84 @@
+'''Spatial index of coordinates for radius queries.'''
+
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from . import haversine
+
+# relative margin of the cell sizes and the query radius against rounding errors
+MARGIN = 1e-9
+
+
+class GridIndex:
+    '''Grid of latitude/longitude cells that are at least as large as the query radius,
+    so the coordinates within the radius of a query are in its cell or in the neighbouring ones.
+    Cells are not wrapped around the antimeridian.
+    '''
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, radius: float):
+        '''Create a GridIndex instance
+
+        Args:
+            lats (np.ndarray): the latitudes of the indexed coordinates
+            lons (np.ndarray): the longitudes of the indexed coordinates
+            radius (float): the largest query radius (in kilometers)
+        '''
+
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.radius = radius
+
+        # the distance of two coordinates is at least R * dlat, and at least
+        # 2R * asin(cos(lat) * sin(dlon / 2)) where lat is the larger absolute latitude
+        angle = radius / haversine.R
+        self._cell_lat = math.degrees(angle) * (1 + MARGIN)
+
+        max_lat = float(np.abs(self.lats).max()) if len(self.lats) else 0
+        ratio = math.sin(angle / 2) / max(math.cos(math.radians(max_lat)), 1e-12)
+        if ratio < 1:
+            self._cell_lon = math.degrees(2 * math.asin(ratio)) * (1 + MARGIN)
+        else:
+            self._cell_lon = 360.0
+
+        self._cells = defaultdict(list)
+        for i, cell in enumerate(zip(*self._cell_of(self.lats, self.lons))):
+            self._cells[cell].append(i)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _cell_of(self, lats: np.ndarray, lons: np.ndarray) -> (list, list):
+        return (np.floor(lats / self._cell_lat).astype(int).tolist(),
+                np.floor(lons / self._cell_lon).astype(int).tolist())
+
+    def query(self, lat: float, lon: float, radius: float = None) -> np.ndarray:
+        '''Find the indexed coordinates within the radius of a coordinate
+
+        Args:
+            lat (float): latitude of the coordinate
+            lon (float): longitude of the coordinate
+            radius (float): the radius (in kilometers), at most the radius of the index
+
+        Returns:
+            np.ndarray: the indices of the coordinates in ascending order
+        '''
+
+        if radius is None:
+            radius = self.radius
+
+        if radius > self.radius:
+            raise ValueError(f'radius must not be greater than {self.radius}')
+
+        (cell_lat, ), (cell_lon, ) = self._cell_of(np.array([lat]), np.array([lon]))
+
+        candidates = []
+        for i in (cell_lat - 1, cell_lat, cell_lat + 1):
+            for j in (cell_lon - 1, cell_lon, cell_lon + 1):
+                candidates.extend(self._cells.get((i, j), ()))
+
+        candidates = np.sort(np.array(candidates, dtype=int))
+        distances = haversine.one_to_many(lat, lon, self.lats[candidates], self.lons[candidates])
+
+        return candidates[distances <= radius * (1 + MARGIN)]
@@ -0,0 +1,86 @@
+'''Reader of the binary columnar trace format written by the feeder.
+
+The file starts with a header: the magic bytes, the number of records and the
+offset of the trailer. The records have a fixed width: the step index, the code
+of the vehicle id (both uint32), the latitude and the longitude (both float64),
+little-endian. The trailer is JSON with the ids of the codes and the timestamps
+of the steps.
+'''
+
+import json
+from typing import Iterator, Tuple
+
+import numpy as np
+
+MAGIC = b'MCTRACE1'
+HEADER = np.dtype([('magic', 'S8'), ('count', '<u8'), ('trailer', '<u8')])
+RECORD = np.dtype([('step', '<u4'), ('id', '<u4'), ('latitude', '<f8'), ('longitude', '<f8')])
+
+
+def is_binary(path: str) -> bool:
+    '''Check if the file is a binary trace
+
+    Args:
+        path (str): the path of the file
+
+    Returns:
+        bool: whether the file starts with the magic bytes
+    '''
+
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class BinaryTrace:
+    '''The records of a binary trace memory-mapped, the steps are views of them'''
+
+    def __init__(self, path: str):
+        '''Create a BinaryTrace instance
+
+        Args:
+            path (str): the path of the trace
+        '''
+
+        header = np.fromfile(path, dtype=HEADER, count=1)[0]
+
+        if header['magic'] != MAGIC:
+            raise ValueError(f'not a binary trace: {path}')
+
+        count = int(header['count'])
+
+        if count > 0:
+            # a plain view of the map, indexing the memmap subclass is slow
+            self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.itemsize,
+                                     shape=(count, )).view(np.ndarray)
+        else:
+            self.records = np.empty(0, dtype=RECORD)
+
+        with open(path, 'rb') as f:
+            f.seek(int(header['trailer']))
+            trailer = json.loads(f.read().decode())
+
+        self.ids = np.array(trailer['ids'], dtype=str)
+        self.timestamps = trailer['timestamps']
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def steps(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+        '''Iterate over the steps of the trace
+
+        Returns:
+            Iterator[(np.ndarray, np.ndarray, np.ndarray, float)]: the ids, latitudes and longitudes
+                of the records of a step, and the timestamp of the step (None if it is unknown)
+        '''
+
+        if len(self.records) == 0:
+            return
+
+        steps = self.records['step']
+        bounds = [0] + (np.flatnonzero(np.diff(steps)) + 1).tolist() + [len(steps)]
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            records = self.records[start:end]
+            timestamp = self.timestamps[int(steps[start])]
+
+            yield (self.ids[records['id']], records['latitude'], records['longitude'], timestamp)
@@ -1,6 +1,31 @@
 from typing import Callable, List, Tuple
 
-from .model import Coordinate, Egress, Ingress, Path, Point
+import numpy as np
+
+from . import haversine
+from .model import Coordinate, Egress, Ingress, Path, Point, bearing, coordinate_arrays
+
+
+def closest_index(target: 'Point', points: List['Point']) -> int:
+    '''Find the index of the point in the input points that is closest to the target
+
+    Args:
+        target (Point): the target point
+        points (List[Point]): the input points
+
+    Returns:
+        int: the index of the point that is closest to the target
+    '''
+
+    if not points:
+        return None
+
+    lats, lons = coordinate_arrays(points)
+    distances = haversine.one_to_many(target.position.latitude,
+                                      target.position.longitude,
+                                      lats, lons)
+
+    return int(np.argmin(distances))
 
 
 def closest_point(target: 'Point', points: List['Point']):
@@ -14,16 +39,18 @@ def closest_point(target: 'Point', points: List['Point']):
         Point: the point that is closest to the target
     '''
 
-    closest = None
-    min_distance = None
+    index = closest_index(target, points)
+
+    return points[index] if index is not None else None
+
 
-    for point in points:
-        distance = target.position.distance(point.position)
-        if min_distance is None or distance < min_distance:
-            min_distance = distance
-            closest = point
+def _add_columns(path: 'Path', points: 'PointArray', indices):
+    '''Add the selected points of a PointArray to the path without creating Point objects'''
 
-    return closest
+    latitudes = points.latitudes[indices]
+
+    if len(latitudes):
+        path.add_coordinates(points.id_, latitudes, points.longitudes[indices], points.timestamps[indices])
 
 
 def split_path(splitter: 'Point', path: 'Path') -> Tuple['Ingress', 'Egress']:
@@ -38,20 +65,23 @@ def split_path(splitter: 'Point', path: 'Path') -> Tuple['Ingress', 'Egress']:
         (Ingress, Egress): the ingress and egress part of the path
     '''
 
-    ingress = Ingress()
-    egress = Egress()
-    reached_split = False
+    ingress = Ingress(columnar=path.columnar)
+    egress = Egress(columnar=path.columnar)
 
-    split_point = closest_point(splitter, path.points)
+    split_index = closest_index(splitter, path.points)
 
-    for point in path.points:
-        if reached_split:
-            egress.add_point(point)
-        else:
-            ingress.add_point(point)
+    if path.columnar:
+        if split_index is not None:
+            _add_columns(ingress, path.points, slice(None, split_index + 1))
+            _add_columns(egress, path.points, slice(split_index + 1, None))
 
-        if not reached_split and point == split_point:
-            reached_split = True
+        return (ingress, egress)
+
+    for i, point in enumerate(path.points):
+        if i <= split_index:
+            ingress.add_point(point)
+        else:
+            egress.add_point(point)
 
     return (ingress, egress)
 
@@ -72,7 +102,31 @@ def find_key_points(path: 'Path') -> 'Path':
 
     max_diff_heading = 4
 
-    out_path = Path()
+    if path.columnar:
+        lats = path.points.latitudes.tolist()
+        lons = path.points.longitudes.tolist()
+        headings = path.points.headings.tolist()
+
+        # the list version below compares with the headings it sets while adding the points to the out path,
+        # the first point heads to 0 and every key point to the bearing from the previous key point
+        indices = [0]
+        heading = 0
+
+        for i in range(1, len(headings) - 1):
+            if abs(headings[i] - heading) > max_diff_heading:
+                heading = bearing(lats[indices[-1]], lons[indices[-1]], lats[i], lons[i])
+                indices.append(i)
+            else:
+                heading = headings[i]
+
+        indices.append(len(headings) - 1)
+
+        out_path = Path(columnar=True)
+        _add_columns(out_path, path.points, indices)
+
+        return out_path
+
+    out_path = Path(columnar=path.columnar)
     out_path.add_point(path.points[0])
 
     for i in range(1, len(path.points) - 1):
@@ -140,19 +194,9 @@ def combine_paths(paths: List['Path']) -> 'Path':
     return combined
 
 
-def condense(path: 'Path', number_of_points: int = 50) -> 'Path':
-    if len(path.points) < 2 or len(path.points) >= number_of_points:
-        return path
-
-    distances = [path.points[i].position.distance(path.points[i + 1].position)
-                 for i in range(len(path.points) - 1)]
-
-    length = sum(distances)
+def _segment_points(distances: List[float], length: float, number_of_points: int) -> List[int]:
+    '''Distribute new points between the segments of a path proportionally to their lengths'''
 
-    if length == 0:
-        return path
-
-    number_of_points = number_of_points - len(path.points)
     number_of_points_per_segment = [distance / length * number_of_points
                                     for distance in distances]
 
@@ -166,28 +210,101 @@ def condense(path: 'Path', number_of_points: int = 50) -> 'Path':
         index = floating_parts.index(max(floating_parts))
         number_of_points_per_segment[index] = number_of_points_per_segment[index] + 1
 
-    out_path = Path()
+    return number_of_points_per_segment
+
+
+def _condense(path: 'Path', number_of_points: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+    '''The arrays of condense_arrays and whether the path was condensed'''
+
+    lats, lons = coordinate_arrays(path.points)
+
+    if path.columnar:
+        headings = path.points.headings
+    else:
+        headings = np.fromiter((point.heading for point in path.points), dtype=float, count=len(path.points))
+
+    if len(path.points) < 2 or len(path.points) >= number_of_points:
+        return (lats, lons, headings, False)
+
+    distances = haversine.consecutive(lats, lons).tolist()
+
+    length = sum(distances)
+
+    if length == 0:
+        return (lats, lons, headings, False)
+
+    number_of_points_per_segment = _segment_points(distances, length,
+                                                   number_of_points - len(path.points))
+
+    out_lats = []
+    out_lons = []
 
     for i, n_points in enumerate(number_of_points_per_segment):
         if n_points == 0:
             continue
 
-        last_point = path.points[i]
+        position = Coordinate(float(lats[i]), float(lons[i]))
         step = distances[i] / n_points
-        heading = last_point.heading
+        heading = float(headings[i])
 
-        out_path.add_point(last_point)
+        out_lats.append(position.latitude)
+        out_lons.append(position.longitude)
 
         for _ in range(n_points):
-            new_point = Point(
-                path.id_, last_point.position.create_at(step, heading))
-            out_path.add_point(new_point)
-            last_point = new_point
+            position = position.create_at(step, heading)
+            out_lats.append(position.latitude)
+            out_lons.append(position.longitude)
 
-    out_path.add_point(path.points[-1])
+    out_lats.append(float(lats[-1]))
+    out_lons.append(float(lons[-1]))
+
+    # every point heads to the next one, the last one keeps the heading of the last segment
+    out_headings = [bearing(out_lats[k], out_lons[k], out_lats[k + 1], out_lons[k + 1])
+                    for k in range(len(out_lats) - 1)]
+    out_headings.append(out_headings[-1])
+
+    return (np.array(out_lats), np.array(out_lons), np.array(out_headings), True)
+
+
+def condense(path: 'Path', number_of_points: int = 50) -> 'Path':
+    '''Add points to the segments of the path proportionally to their lengths
+
+    Args:
+        path (Path): the path
+        number_of_points (int): the number of points of the condensed path
+
+    Returns:
+        Path: the condensed path, the path itself if it is not condensed
+    '''
+
+    lats, lons, _, is_condensed = _condense(path, number_of_points)
+
+    if not is_condensed:
+        return path
+
+    out_path = Path(columnar=path.columnar)
+    out_path.add_coordinates(path.id_, lats, lons)
 
     return out_path
 
+
+def condense_arrays(path: 'Path', number_of_points: int = 50) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Get the points of the condensed path (see condense) as arrays
+    without creating the path and its points
+
+    Args:
+        path (Path): the path
+        number_of_points (int): the number of points of the condensed path
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): the latitudes, longitudes and headings of the points
+    '''
+
+    lats, lons, headings, _ = _condense(path, number_of_points)
+
+    return (lats, lons, headings)
+
+
 # def adjust(path_1: 'Path', path_2: 'Path') -> Tuple['Path', 'Path']:
 #     closest_points = None
 #     min_distance = 100000
@@ -297,8 +414,9 @@ def condense(path: 'Path', number_of_points: int = 50) -> 'Path':
 #     return (out_path_1, out_path_2)
 
 
-def compare_paths(path_1: 'Path', path_2: 'Path', dist_func: Callable[['Path', 'Path'], float]) -> float:
+def compare_paths(path_1: 'Path', path_2: 'Path', dist_func: Callable[['Path', 'Path'], float],
+                  threshold: float = None) -> float:
     # key_points_1 = find_key_points(path_1)
     # key_points_2 = find_key_points(path_2)
     # return dist_func(key_points_1, key_points_2)
-    return dist_func(path_1, path_2)
+    return dist_func(path_1, path_2, threshold=threshold)
@@ -1,9 +1,33 @@
 import logging
+from threading import Event
 from unittest import TestCase
 
+from map_creator.model import Coordinate
+
 class NoLoggingTestCase(TestCase):
     def setUp(self):
         logging.disable(logging.CRITICAL)
 
     def tearDown(self):
-        logging.disable(logging.NOTSET)
\ No newline at end of file
+        logging.disable(logging.NOTSET)
+
+
+class MockProcessor:
+    '''Processor of an RSU that records the paths of the updates'''
+
+    def __init__(self, ref_point: Coordinate = Coordinate(0, 0), range_: float = 1):
+        self._ref_point = ref_point
+        self._range = range_
+        self.updates = []
+        self.processed = Event()
+
+    def process(self, paths):
+        self.updates.append(paths)
+        self.processed.set()
+
+    def update(self, paths, expired_paths):
+        self.updates.append((paths, expired_paths))
+        self.processed.set()
+
+    def postprocess(self, aggregated_map, latest_map):
+        return latest_map
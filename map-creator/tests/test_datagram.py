@@ -0,0 +1,51 @@
+import math
+import struct
+
+import numpy as np
+
+from map_creator import datagram
+
+from tests import NoLoggingTestCase
+
+
+class DatagramTest(NoLoggingTestCase):
+    def pack(self, records, sequence=7):
+        header = struct.pack('<4sBIH', datagram.MAGIC, datagram.BINARY, sequence, len(records))
+        values = b''.join(struct.pack('<ddd', lat, lon, ts) for _, lat, lon, ts in records)
+        ids = '\n'.join(id_ for id_, _, _, _ in records).encode()
+        return header + values + ids
+
+    def test_unpack(self):
+        data = self.pack([('a', 47.47, 19.05, 1.0)])
+
+        self.assertTrue(datagram.is_packed(data))
+        self.assertFalse(datagram.is_packed(b'["a, 47.47, 19.05"]'))
+
+        encoding, sequence, count, _ = datagram.unpack(data)
+
+        self.assertEqual(encoding, datagram.BINARY)
+        self.assertEqual(sequence, 7)
+        self.assertEqual(count, 1)
+
+    def test_decode_records(self):
+        data = self.pack([('a', 47.47, 19.05, 1.0), ('veh.2', 47.48, 19.06, 1.5)])
+        _, _, count, records = datagram.unpack(data)
+
+        ids, lats, lons, timestamps = datagram.decode_records(records, count)
+
+        self.assertEqual(ids, ['a', 'veh.2'])
+        np.testing.assert_array_equal(lats, [47.47, 47.48])
+        np.testing.assert_array_equal(lons, [19.05, 19.06])
+        np.testing.assert_array_equal(timestamps, [1.0, 1.5])
+
+    def test_decode_records_without_timestamps(self):
+        data = self.pack([('a', 47.47, 19.05, 1.0), ('b', 47.48, 19.06, math.nan)])
+        _, _, count, records = datagram.unpack(data)
+
+        np.testing.assert_array_equal(datagram.decode_records(records, count)[3], [1.0, math.nan])
+
+        data = self.pack([('a', 47.47, 19.05, math.nan)])
+        _, _, count, records = datagram.unpack(data)
+
+        self.assertIsNone(datagram.decode_records(records, count)[3])
+        self.assertEqual(datagram.decode_records(b'', 0)[0], [])
@@ -1,7 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from tests import NoLoggingTestCase
 from map_creator.algorithm.dbscan import DBSCAN
 from map_creator.distance import dtw
 from map_creator.model import Coordinate, Path, Point
+from map_creator.parallel import DistanceService
 
 
 class DBSCANTest(NoLoggingTestCase):
@@ -73,3 +76,84 @@ class DBSCANTest(NoLoggingTestCase):
         path_6.add_point(Point(6, Coordinate(50.07059, 19.90427)))
 
         self.algorithm.process([path_1, path_2, path_3, path_4, path_5, path_6])
+
+    def test_range_query(self):
+        paths = []
+        for i in range(12):
+            path = Path()
+            for j in range(5):
+                path.add_point(Point(i, Coordinate(50.069 + 0.0004 * j + 0.0001 * (i % 3),
+                                                   19.903 + 0.002 * (i // 3) + 0.0002 * j)))
+            paths.append(path)
+        paths.append(Path())
+
+        self.algorithm.min_pts = 2
+        self.algorithm.reset()
+        matrix = self.algorithm.distance_matrix(paths, sparse=True)
+        self.algorithm.predict(paths)
+
+        # only the paths with nearby endpoints are compared
+        self.assertLess(len(matrix._condensed), len(paths) * (len(paths) - 1) // 2)
+        self.assertEqual(len(self.algorithm._neighbours), len(paths))
+
+        for i, path in enumerate(paths):
+            expected = [k for k, path_2 in enumerate(paths) if dtw(path, path_2) <= self.algorithm.eps]
+            self.assertEqual(self.algorithm._range_query(i, paths), expected)
+
+    def test_predict_equal_paths(self):
+        paths = []
+        for i in range(3):
+            path = Path()
+            for j in range(4):
+                path.add_point(Point(i, Coordinate(50.069 + 0.0004 * j, 19.903 + 0.0002 * j)))
+            paths.append(path)
+
+        self.algorithm.min_pts = 2
+        self.algorithm.reset()
+        self.algorithm.predict(paths)
+
+        # equal paths are still tracked one by one
+        self.assertTrue(all(i in self.algorithm._range_query(i, paths) for i in range(len(paths))))
+        self.assertEqual([id(path) for path in self.algorithm.clusters[0]], [id(path) for path in paths])
+        self.assertEqual(self.algorithm.clustered, {0, 1, 2})
+
+    def test_prefetch(self):
+        paths = []
+        for i in range(4):
+            path = Path()
+            for j in range(4):
+                path.add_point(Point(i, Coordinate(50.069 + 0.0004 * j + 0.0001 * i, 19.903 + 0.0002 * j)))
+            paths.append(path)
+
+        calls = []
+
+        def dist_func(path_1, path_2, threshold=None):
+            calls.append((id(path_1), id(path_2)))
+            return dtw(path_1, path_2, threshold=threshold)
+
+        self.algorithm.dist_func = dist_func
+        self.algorithm.min_pts = 2
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.algorithm.distance_service = DistanceService(executor, 2, pack_paths=False)
+            self.algorithm.reset()
+            self.algorithm.distance_matrix(paths, sparse=True)
+            self.algorithm.predict(paths)
+
+        # the distance of a path to itself is never calculated
+        self.assertEqual(len(calls), 6)
+        self.assertTrue(all(id_1 != id_2 for id_1, id_2 in calls))
+        self.assertTrue(all(i in self.algorithm._range_query(i, paths) for i in range(len(paths))))
+
+    def test_distance_matrix(self):
+        paths = [Path(), Path()]
+        matrix = self.algorithm.distance_matrix(paths, sparse=True)
+
+        self.assertIs(self.algorithm.distance_matrix(paths[:1]), matrix)
+
+        # only the current matrix is kept
+        other = self.algorithm.distance_matrix([Path()])
+
+        self.assertIsNot(other, matrix)
+        self.assertIs(self.algorithm.distance_matrix(paths), self.algorithm._distance_matrix)
+        self.assertIsNot(self.algorithm._distance_matrix, matrix)
@@ -1,21 +1,146 @@
+import functools
+from unittest import mock
+
 from tests import NoLoggingTestCase
 
-from map_creator.distance import dtw
+from map_creator import INFINITY, haversine
+from map_creator.distance import Band, band_limits, dtw, euclidean, get_distance_function, lb_dtw, lb_euclidean, \
+    lb_keogh, lb_kim
 from map_creator.model import Coordinate, Path, Point
 
 
 class DistanceTest(NoLoggingTestCase):
-    def test_dtw(self):
-        path_1 = Path()
-        path_1.add_point(Point(1, Coordinate(47.47176, 19.05178)))
-        path_1.add_point(Point(1, Coordinate(47.47180, 19.05163)))
-        path_1.add_point(Point(1, Coordinate(47.47181, 19.05146)))
+    def setUp(self):
+        self.path_1 = Path()
+        self.path_1.add_point(Point(1, Coordinate(47.47176, 19.05178)))
+        self.path_1.add_point(Point(1, Coordinate(47.47180, 19.05163)))
+        self.path_1.add_point(Point(1, Coordinate(47.47181, 19.05146)))
 
-        path_2 = Path()
-        path_2.add_point(Point(2, Coordinate(47.47209, 19.05159)))
-        path_2.add_point(Point(2, Coordinate(47.47198, 19.05153)))
-        path_2.add_point(Point(2, Coordinate(47.47184, 19.05146)))
+        self.path_2 = Path()
+        self.path_2.add_point(Point(2, Coordinate(47.47209, 19.05159)))
+        self.path_2.add_point(Point(2, Coordinate(47.47198, 19.05153)))
+        self.path_2.add_point(Point(2, Coordinate(47.47184, 19.05146)))
 
-        dtw_dist = dtw(path_1, path_2)
+        self.path_3 = Path()
+        self.path_3.add_point(Point(3, Coordinate(47.47190, 19.05170)))
+        self.path_3.add_point(Point(3, Coordinate(47.47195, 19.05165)))
+        self.path_3.add_point(Point(3, Coordinate(47.47192, 19.05158)))
+        self.path_3.add_point(Point(3, Coordinate(47.47188, 19.05150)))
+        self.path_3.add_point(Point(3, Coordinate(47.47183, 19.05141)))
+        self.path_3.add_point(Point(3, Coordinate(47.47179, 19.05130)))
+        self.path_3.add_point(Point(3, Coordinate(47.47170, 19.05121)))
+
+    def test_dtw(self):
+        dtw_dist = dtw(self.path_1, self.path_2)
 
         self.assertAlmostEqual(dtw_dist, 0.0641, 4)
+
+    def test_dtw_empty(self):
+        self.assertEqual(dtw(Path(), Path()), 0)
+        self.assertEqual(dtw(self.path_1, Path()), INFINITY)
+
+    def test_dtw_threshold(self):
+        dtw_dist = dtw(self.path_1, self.path_2)
+
+        self.assertEqual(dtw(self.path_1, self.path_2, threshold=dtw_dist), dtw_dist)
+        self.assertEqual(dtw(self.path_1, self.path_2, threshold=0.03), INFINITY)
+
+    def test_dtw_sakoe_chiba(self):
+        full = dtw(self.path_1, self.path_3)
+
+        self.assertAlmostEqual(dtw(self.path_1, self.path_3, band=Band.SAKOE_CHIBA, window=7), full, 9)
+        self.assertGreaterEqual(dtw(self.path_1, self.path_3, band=Band.SAKOE_CHIBA, window=0), full)
+
+        diagonal = sum(p1.position.distance(p2.position)
+                       for p1, p2 in zip(self.path_1.points, self.path_2.points))
+
+        self.assertAlmostEqual(dtw(self.path_1, self.path_2, band=Band.SAKOE_CHIBA, window=0), diagonal, 9)
+
+    def test_dtw_itakura(self):
+        full = dtw(self.path_3, self.path_1)
+        banded = dtw(self.path_3, self.path_1, band=Band.ITAKURA, slope=2)
+
+        self.assertLess(banded, INFINITY)
+        self.assertGreaterEqual(banded, full)
+
+    def test_band_limits(self):
+        for band in Band:
+            for n, m in [(1, 1), (1, 5), (5, 1), (3, 10), (10, 3), (7, 7)]:
+                lower, upper = band_limits(n, m, band)
+
+                self.assertEqual(lower[0], 0)
+                self.assertEqual(upper[-1], m)
+
+                for i in range(1, n):
+                    self.assertLess(lower[i], upper[i])
+                    self.assertLessEqual(lower[i], upper[i - 1])
+
+    def test_lower_bounds(self):
+        for path_1, path_2 in [(self.path_1, self.path_2), (self.path_1, self.path_3), (self.path_3, self.path_2)]:
+            full = dtw(path_1, path_2)
+
+            self.assertLessEqual(lb_kim(path_1, path_2), full)
+            self.assertLessEqual(lb_keogh(path_1, path_2), full)
+            self.assertLessEqual(lb_keogh(path_2, path_1), full)
+            self.assertLessEqual(lb_dtw(path_1, path_2), full)
+
+            for band, kwargs in [(Band.SAKOE_CHIBA, {'window': 1}), (Band.ITAKURA, {'slope': 2})]:
+                self.assertLessEqual(lb_dtw(path_1, path_2, band, **kwargs),
+                                     dtw(path_1, path_2, band=band, **kwargs))
+
+            self.assertLessEqual(lb_euclidean(path_1, path_2), euclidean(path_1, path_2))
+
+        self.assertEqual(lb_dtw(self.path_1, Path()), 0)
+        self.assertEqual(lb_euclidean(self.path_1, Path()), 0)
+
+    def test_lower_bound_pruning(self):
+        far = Path()
+        far.add_point(Point(4, Coordinate(47.48176, 19.05178)))
+        far.add_point(Point(4, Coordinate(47.48181, 19.05146)))
+
+        self.assertGreater(lb_kim(self.path_1, far), 1)
+        self.assertEqual(dtw(self.path_1, far, threshold=1), INFINITY)
+        self.assertEqual(euclidean(self.path_1, far, threshold=1), INFINITY)
+        self.assertLess(euclidean(self.path_1, far, threshold=5), INFINITY)
+
+    def test_euclidean_gap_pruning(self):
+        path_1 = Path(columnar=True)
+        path_2 = Path(columnar=True)
+        for i in range(10):
+            path_1.add_point(Point(1, Coordinate(47.47 + 0.0001 * i, 19.05)))
+            path_2.add_point(Point(2, Coordinate(47.481 - 0.0001 * i, 19.05)))
+
+        # the first points are closer than the threshold, the gap of the boxes prunes the pair
+        threshold = 1.5
+        self.assertLess(Coordinate(47.47, 19.05).distance(Coordinate(47.481, 19.05)), threshold)
+        self.assertGreater(lb_euclidean(path_1, path_2), threshold)
+
+        with mock.patch('map_creator.distance.haversine.pairwise', wraps=haversine.pairwise) as pairwise:
+            self.assertEqual(euclidean(path_1, path_2, threshold=threshold), INFINITY)
+
+        self.assertEqual(pairwise.call_count, 0)
+        self.assertGreater(euclidean(path_1, path_2), threshold)
+
+    def test_euclidean(self):
+        dist = euclidean(self.path_1, self.path_2)
+
+        expected = sum(p1.position.distance(p2.position) ** 2
+                       for p1, p2 in zip(self.path_1.points, self.path_2.points)) ** 0.5
+
+        self.assertAlmostEqual(dist, expected, 9)
+        self.assertEqual(euclidean(self.path_1, Path()), INFINITY)
+
+    def test_get_distance_function(self):
+        self.assertIs(get_distance_function('dtw'), dtw)
+        self.assertIs(get_distance_function({'type': 'euclidean'}), euclidean)
+
+        dist_func = get_distance_function({'type': 'dtw', 'band': 'sakoe_chiba', 'window': 2})
+
+        self.assertIsInstance(dist_func, functools.partial)
+        self.assertEqual(dist_func.keywords, {'band': Band.SAKOE_CHIBA, 'window': 2})
+
+        with self.assertRaises(ValueError):
+            get_distance_function({'type': 'dtw', 'band': 'sakoe_chiba'})
+
+        with self.assertRaises(RuntimeError):
+            get_distance_function('unknown')
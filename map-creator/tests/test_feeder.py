@@ -0,0 +1,241 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+
+from map_creator.feeder import REORDER_WINDOW, Feeder, FileFeeder, UdpFeeder
+from map_creator.model import Coordinate
+from map_creator.rsu import Rsu
+
+from tests import MockProcessor, NoLoggingTestCase
+
+REF_POINT = Coordinate(47.4761, 19.0532)
+
+
+class FeederTest(NoLoggingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.processor = MockProcessor(REF_POINT, 0.25)
+
+    def write_trace(self, lines):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(''.join(f'{line}\n' for line in lines))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def event_time_rsu(self):
+        return Rsu(processor=self.processor,
+                   update_time=None,
+                   time_window=None,
+                   event_time=True)
+
+    def test_decode_lines(self):
+        feeder = Feeder(None)
+
+        ids, lats, lons, timestamps = feeder.decode_lines(['a, 47.1, 19.1, 1.0\n', '\n', 'b, 47.2, 19.2, 2.0\n'])
+
+        self.assertEqual(ids, ['a', 'b'])
+        np.testing.assert_array_equal(lats, [47.1, 47.2])
+        np.testing.assert_array_equal(lons, [19.1, 19.2])
+        np.testing.assert_array_equal(timestamps, [1.0, 2.0])
+
+        self.assertIsNone(feeder.decode_lines(['a, 47.1, 19.1', 'b, 47.2, 19.2'])[3])
+
+    def test_decode_mixed_lines(self):
+        feeder = Feeder(None)
+
+        # the lines without timestamp keep the timestamps of the others
+        ids, lats, _, timestamps = feeder.decode_lines(['a, 47.1, 19.1, 1.0', 'b, 47.2, 19.2', 'c, 47.3, 19.3, 3.0'])
+
+        self.assertEqual(ids, ['a', 'b', 'c'])
+        np.testing.assert_array_equal(lats, [47.1, 47.2, 47.3])
+        np.testing.assert_array_equal(timestamps, [1.0, np.nan, 3.0])
+
+        rsu = self.event_time_rsu()
+        Feeder(rsu).feed_batch(ids, np.full(3, 47.4761), np.full(3, 19.0532), timestamps)
+
+        self.assertEqual(rsu.paths_by_id['a'].points.timestamps.tolist(), [1.0])
+        self.assertEqual(rsu.paths_by_id['b'].points.timestamps.tolist(), [3.0])
+        self.assertEqual(rsu.paths_by_id['c'].points.timestamps.tolist(), [3.0])
+
+    def test_feed_batch_order(self):
+        rsu = self.event_time_rsu()
+        ids = ['veh2', 'veh0', 'veh2', 'far', 'veh1', 'veh0']
+        lats = np.array([47.4761, 47.4762, 47.4763, 48.0, 47.4764, 47.4765])
+
+        Feeder(rsu).feed_batch(ids, lats, np.full(6, 19.0532), np.arange(6, dtype=float))
+
+        # the paths are written in the order of their first points, the points in their order
+        self.assertEqual(list(rsu.paths_by_id), ['veh2', 'veh0', 'veh1'])
+        self.assertEqual(rsu.paths_by_id['veh0'].points.latitudes.tolist(), [47.4762, 47.4765])
+        self.assertEqual(rsu.paths_by_id['veh2'].points.timestamps.tolist(), [0.0, 2.0])
+        self.assertEqual(len(self.processor.updates), 1)
+
+    def test_feed_batches(self):
+        lines = [f'veh{i}, 47.476{i}, 19.053{i}, {step}.0'
+                 for step, vehicles in enumerate((3, 3, 2)) for i in range(vehicles)]
+        rsu = self.event_time_rsu()
+
+        # the chunks end in the middle of the steps
+        FileFeeder(rsu, self.write_trace(lines), replay=True, chunk_size=40).open()
+
+        # an update after every step with all of its points
+        self.assertEqual([sum(len(path.points) for path in paths) for paths in self.processor.updates],
+                         [3, 6, 8])
+        self.assertEqual(rsu.clock(), 2)
+
+    def test_pace(self):
+        lines = [f'veh0, 47.4761, 19.0532, {timestamp}' for timestamp in (10.0, 11.0, 12.0)]
+        rsu = self.event_time_rsu()
+
+        with mock.patch('map_creator.feeder.time.monotonic', return_value=0.0), \
+                mock.patch('map_creator.feeder.time.sleep') as sleep:
+            FileFeeder(rsu, self.write_trace(lines), replay=True, speed=2).open()
+
+        # the steps are replayed twice as fast as their timestamps
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(len(self.processor.updates), 3)
+
+    def test_wall_clock(self):
+        rsu = Rsu(processor=self.processor,
+                  update_time=None,
+                  time_window=120)
+        feeder = Feeder(rsu)
+
+        # the simulation seconds of the items do not expire the points by the wall clock
+        feeder.feed_one('veh0, 47.4761, 19.0532, 3.0')
+        feeder.feed_one('veh0, 47.4762, 19.0533, 4.0')
+
+        self.assertEqual([len(paths) for paths in self.processor.updates], [1, 1])
+        self.assertEqual(len(rsu.paths_by_id['veh0'].points), 2)
+
+        feeder.feed_batch(['veh0', 'veh1'], np.array([47.4763, 47.4761]), np.array([19.0534, 19.0532]),
+                          np.array([5.0, 5.0]))
+
+        self.assertEqual(len(rsu.paths), 2)
+        self.assertEqual(rsu.paths_by_id['veh0'].points.timestamps.tolist()[-1], 5.0)
+
+    def udp_feeder(self, **kwargs):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        self.addCleanup(server.close)
+
+        # a free port for the feeder
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        feeder = UdpFeeder(self.event_time_rsu(), '127.0.0.1', port, '127.0.0.1', server.getsockname()[1], **kwargs)
+
+        return (feeder, server)
+
+    def close_unopened(self, feeder):
+        for resource in (feeder.selector, feeder._wakeup_reader, feeder._wakeup_writer, feeder.sock):
+            self.addCleanup(resource.close)
+
+    def test_udp_receive(self):
+        feeder, server = self.udp_feeder()
+
+        # the datagrams wait in the socket until the receiver wakes up
+        for i in range(3):
+            server.sendto(json.dumps([f'veh{i}, 47.476{i}, 19.053{i}, 1.0']).encode(), feeder.sock.getsockname())
+
+        feeder.open()
+
+        self.assertEqual(server.recvfrom(64)[0], b'connect')
+        self.assertTrue(self.processor.processed.wait(5))
+
+        # all of them are drained and fed as one batch
+        self.assertEqual(len(self.processor.updates), 1)
+        self.assertEqual(len(self.processor.updates[0]), 3)
+
+        # close wakes up the receiver sleeping in the selector
+        closer = threading.Thread(target=feeder.close)
+        closer.start()
+        closer.join(5)
+
+        self.assertFalse(closer.is_alive())
+        self.assertFalse(feeder.client_thread.is_alive())
+        self.assertFalse(feeder.is_open())
+        self.assertEqual(server.recvfrom(64)[0], b'disconnect')
+
+    def test_udp_max_datagrams(self):
+        feeder, server = self.udp_feeder(max_datagrams=2)
+        self.close_unopened(feeder)
+
+        for i in range(3):
+            server.sendto(json.dumps([f'veh{i}, 47.476{i}, 19.053{i}, {i}.0']).encode(), feeder.sock.getsockname())
+
+        with mock.patch.object(feeder, 'feed') as feed:
+            self.assertTrue(feeder.selector.select(5))
+            feeder.receive()
+            feeder.receive()
+            feeder.receive()
+
+        self.assertEqual([len(call.args) for call in feed.call_args_list], [2, 1])
+
+    def test_check_sequence(self):
+        feeder, _ = self.udp_feeder()
+        self.close_unopened(feeder)
+
+        feeder.check_sequence(0)
+        feeder.check_sequence(1)
+
+        # a gap counts the missing datagrams as lost
+        feeder.check_sequence(4)
+
+        self.assertEqual(feeder.lost_datagrams, 2)
+        self.assertEqual(feeder.sequence, 5)
+
+        # a duplicate is ignored
+        feeder.check_sequence(4)
+
+        self.assertEqual(feeder.lost_datagrams, 2)
+        self.assertEqual(feeder.sequence, 5)
+
+        # a lost datagram arriving late is not lost, and it does not move the sequence back
+        feeder.check_sequence(3)
+
+        self.assertEqual(feeder.lost_datagrams, 1)
+
+        feeder.check_sequence(3)
+        feeder.check_sequence(5)
+
+        self.assertEqual(feeder.lost_datagrams, 1)
+        self.assertEqual(feeder.sequence, 6)
+
+        # a late datagram is found at the end of the reorder window
+        feeder.check_sequence(6 + REORDER_WINDOW)
+
+        self.assertEqual(feeder.lost_datagrams, 1 + REORDER_WINDOW)
+
+        feeder.check_sequence(7)
+
+        self.assertEqual(feeder.lost_datagrams, REORDER_WINDOW)
+        self.assertEqual(feeder.sequence, 7 + REORDER_WINDOW)
+
+        # the sequence wraps around
+        lost_datagrams = feeder.lost_datagrams
+        feeder.sequence = 0xffffffff
+        feeder.check_sequence(0xffffffff)
+        feeder.check_sequence(1)
+
+        self.assertEqual(feeder.lost_datagrams, lost_datagrams + 1)
+        self.assertEqual(feeder.sequence, 2)
+
+        feeder.check_sequence(0)
+
+        self.assertEqual(feeder.lost_datagrams, lost_datagrams)
+
+        # a sequence far behind is a restarted sender, not a loss
+        feeder.sequence = 1000
+        feeder.check_sequence(0)
+
+        self.assertEqual(feeder.lost_datagrams, lost_datagrams)
+        self.assertEqual(feeder.sequence, 1)
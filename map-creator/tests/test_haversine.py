@@ -0,0 +1,57 @@
+import numpy as np
+
+from map_creator import haversine
+from map_creator.model import Coordinate
+
+from tests import NoLoggingTestCase
+
+
+class HaversineTest(NoLoggingTestCase):
+    def setUp(self):
+        self.coordinates = [
+            Coordinate(47.47085, 19.05291),
+            Coordinate(47.47312, 19.06369),
+            Coordinate(53.404, -2.966),
+            Coordinate(53.462, -2.250)
+        ]
+        self.lats = np.array([c.latitude for c in self.coordinates])
+        self.lons = np.array([c.longitude for c in self.coordinates])
+
+    def test_distance(self):
+        threshold = 0.001   # 0.001 km = 1 m
+        self.assertLessEqual(abs(haversine.distance(47.47085, 19.05291, 47.47312, 19.06369) - 0.84866),
+                             threshold)
+
+    def test_one_to_many(self):
+        distances = haversine.one_to_many(self.lats[0], self.lons[0], self.lats, self.lons)
+
+        for c, distance in zip(self.coordinates, distances):
+            self.assertAlmostEqual(distance, self.coordinates[0].distance(c), 9)
+
+    def test_many_to_many(self):
+        distances = haversine.many_to_many(self.lats[:2], self.lons[:2], self.lats, self.lons)
+
+        self.assertEqual(distances.shape, (2, 4))
+
+        for i, c1 in enumerate(self.coordinates[:2]):
+            for j, c2 in enumerate(self.coordinates):
+                self.assertAlmostEqual(distances[i, j], c1.distance(c2), 9)
+
+    def test_consecutive(self):
+        distances = haversine.consecutive(self.lats, self.lons)
+
+        self.assertEqual(len(distances), 3)
+
+        for i, distance in enumerate(distances):
+            self.assertAlmostEqual(distance, self.coordinates[i].distance(self.coordinates[i + 1]), 9)
+
+        self.assertEqual(len(haversine.consecutive(self.lats[:1], self.lons[:1])), 0)
+
+    def test_centroid(self):
+        centroid_1 = haversine.centroid(self.lats[:2], self.lons[:2])
+        centroid_2 = haversine.centroid(self.lats[2:], self.lons[2:])
+
+        average = haversine.many_to_many(self.lats[:2], self.lons[:2], self.lats[2:], self.lons[2:]).mean()
+
+        self.assertLessEqual(haversine.R * np.linalg.norm(centroid_1 - centroid_2), average)
+        self.assertTrue(np.isnan(haversine.centroid(self.lats[:0], self.lons[:0])).all())
@@ -1,6 +1,8 @@
+import numpy as np
+
 from tests import NoLoggingTestCase
 
-from map_creator.algorithm.hierarchical import DistanceMeasure, Hierarchical, Strategy
+from map_creator.algorithm.hierarchical import DistanceMeasure, Hierarchical, Strategy, agglomerate
 from map_creator.distance import dtw
 from map_creator.model import Coordinate, Path, Point
 
@@ -80,10 +82,66 @@ class TestHierarchical(NoLoggingTestCase):
         for i in range(0, len(history)):
             self.assertEqual(len(history[i]), len(self.paths) - i)
 
+    def test_bottom_up_merges(self):
+        for measure in DistanceMeasure:
+            self.algorithm._distance_measure = measure
+            tree = self.algorithm.cluster_bottom_up(self.paths)
+
+            self.assertEqual(tree.linkage.shape, (len(self.paths) - 1, 4))
+            self.assertEqual(tree.linkage[-1, 3], len(self.paths))
+
+            # every merge joins the closest clusters of the previous cut
+            for i in range(len(self.paths) - 1):
+                clusters = tree[i]
+                distances = [self.algorithm.calculate_distance(c1, c2)
+                             for c1 in clusters for c2 in clusters if c1 is not c2]
+                self.assertAlmostEqual(tree.linkage[i, 2], min(distances), 9)
+                self.assertAlmostEqual(tree.scores[i], self.algorithm.clusters_distance(clusters), 9)
+
+    def test_agglomerate(self):
+        distances = np.array([[0, 1, 4, 5],
+                              [1, 0, 3, 6],
+                              [4, 3, 0, 2],
+                              [5, 6, 2, 0]], dtype=float)
+
+        linkage, scores = agglomerate(distances, DistanceMeasure.SINGLE_LINKAGE)
+        np.testing.assert_array_equal(linkage, [[0, 1, 1, 2], [2, 3, 2, 2], [4, 5, 3, 4]])
+        np.testing.assert_array_equal(scores, [42, 20, 6, 0])
+
+        linkage, _ = agglomerate(distances, DistanceMeasure.COMPLETE_LINKAGE)
+        np.testing.assert_array_equal(linkage[:, 2], [1, 2, 6])
+
+        linkage, _ = agglomerate(distances, DistanceMeasure.AVERAGE_LINKAGE)
+        np.testing.assert_array_equal(linkage[:, 2], [1, 2, 4.5])
+
     def test_top_down(self):
-        # TODO
-        self.algorithm._process(self.paths)
-        pass
+        self.algorithm._strategy = Strategy.TOP_DOWN
+
+        for measure in DistanceMeasure:
+            self.algorithm._distance_measure = measure
+            tree = self.algorithm.cluster_top_down(self.paths)
+
+            for i in range(len(self.paths)):
+                self.assertEqual(len(tree[i]), len(self.paths) - i)
+                self.assertAlmostEqual(tree.scores[i], self.algorithm.clusters_distance(tree[i]), 9)
+
+            self.assertEqual(len(self.algorithm._process(self.paths)), 1)
+
+    def test_top_down_split_distance(self):
+        self.algorithm._strategy = Strategy.TOP_DOWN
+        self.algorithm._split_distance = 0.5
+        tree = self.algorithm.cluster_top_down(self.paths)
+
+        # the cuts inside the tight clusters are not scored
+        first = int(np.argmax(np.isfinite(tree.scores)))
+        self.assertGreater(first, 0)
+
+        for cluster in tree[first]:
+            for path_1 in cluster:
+                for path_2 in cluster:
+                    self.assertLessEqual(dtw(path_1, path_2), 0.5)
+
+        self.assertEqual(len(self.algorithm._process(self.paths)), 1)
 
     def test_single_linkage(self):
         dist = self.algorithm.single_linkage(
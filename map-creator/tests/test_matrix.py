@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from map_creator import INFINITY
+from map_creator.distance import dtw
+from map_creator.matrix import DistanceMatrix
+from map_creator.model import Coordinate, Path, Point
+from map_creator.parallel import DistanceService
+
+from tests import NoLoggingTestCase
+
+
+class DistanceMatrixTest(NoLoggingTestCase):
+    def setUp(self):
+        self.paths = []
+
+        for i in range(5):
+            path = Path()
+            for j in range(4):
+                path.add_point(Point(i, Coordinate(47.47 + 0.001 * j, 19.05 + 0.0005 * i * i)))
+            self.paths.append(path)
+
+        self.calls = []
+
+        def dist_func(path_1, path_2, threshold=None):
+            self.calls.append((path_1, path_2, threshold))
+            return dtw(path_1, path_2, threshold=threshold)
+
+        self.dist_func = dist_func
+
+    def test_get(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func)
+
+        for i in range(len(self.paths)):
+            for j in range(len(self.paths)):
+                self.assertAlmostEqual(matrix.get(i, j), dtw(self.paths[i], self.paths[j]), 12)
+
+        self.assertAlmostEqual(matrix.get(1, 3), matrix.get(3, 1), 12)
+        self.assertEqual(matrix.get(2, 2), 0)
+        self.assertEqual(len(self.calls), 10)
+
+    def test_distance(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func)
+
+        self.assertIn(self.paths[2], matrix)
+        self.assertNotIn(Path(), matrix)
+        self.assertEqual(matrix.distance(self.paths[0], self.paths[4]),
+                         matrix.get(4, 0))
+        self.assertEqual(len(self.calls), 1)
+
+        with self.assertRaises(KeyError):
+            matrix.distance(self.paths[0], Path())
+
+    def test_threshold(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func)
+        distance = dtw(self.paths[0], self.paths[4])
+
+        self.assertEqual(matrix.get(0, 4, threshold=distance / 4), INFINITY)
+        self.assertEqual(matrix.get(0, 4, threshold=distance / 2), INFINITY)
+        self.assertEqual(len(self.calls), 2)
+
+        # the remembered lower bound is enough for a smaller threshold
+        self.assertEqual(matrix.get(0, 4, threshold=distance / 3), INFINITY)
+        self.assertEqual(len(self.calls), 2)
+
+        self.assertAlmostEqual(matrix.get(0, 4, threshold=distance * 2), distance, 12)
+        self.assertAlmostEqual(matrix.get(0, 4), distance, 12)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_compute(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func)
+        matrix.get(0, 1)
+        matrix.compute([0, 1, 2])
+
+        # the diagonal is not calculated
+        self.assertEqual(len(self.calls), 3)
+
+        square = matrix.to_square([2, 0, 1])
+
+        self.assertEqual(square.shape, (3, 3))
+        self.assertEqual(len(self.calls), 3)
+        self.assertAlmostEqual(square[0, 1], dtw(self.paths[2], self.paths[0]), 12)
+        self.assertAlmostEqual(square[2, 1], square[1, 2], 12)
+        self.assertEqual(square[1, 1], 0)
+
+    def test_service(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            square = matrix.to_square(service=DistanceService(executor, 2, pack_paths=False))
+
+        self.assertEqual(len(self.calls), 10)
+
+        for i in range(len(self.paths)):
+            for j in range(len(self.paths)):
+                self.assertAlmostEqual(square[i, j], dtw(self.paths[i], self.paths[j]), 12)
+
+    def test_sparse(self):
+        matrix = DistanceMatrix(self.paths, self.dist_func, sparse=True)
+
+        self.assertAlmostEqual(matrix.get(3, 1), dtw(self.paths[1], self.paths[3]), 12)
+        self.assertEqual(len(matrix._condensed), 1)
+
+        square = matrix.to_square([0, 1, 3])
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertAlmostEqual(square[1, 2], matrix.get(1, 3), 12)
+        self.assertEqual(len(matrix._condensed), 3)
@@ -1,6 +1,7 @@
 import json
 
-from map_creator.model import Coordinate, Egress, Ingress, Map, ModelJSONEncoder, ModelJSONDecoder, Path, Point
+from map_creator.model import Coordinate, Egress, Ingress, Map, ModelJSONEncoder, ModelJSONDecoder, Path, Point, \
+    PointArray
 from tests import NoLoggingTestCase
 
 
@@ -162,6 +163,121 @@ class PathTest(NoLoggingTestCase):
         self.assertEqual(p, expected)
 
 
+class PointArrayTest(NoLoggingTestCase):
+    def test_append(self):
+        points = PointArray(capacity=1)
+
+        for i in range(100):
+            points.append(Point(1, Coordinate(i, i + 1)))
+
+        self.assertEqual(len(points), 100)
+        self.assertEqual(points.latitudes.tolist(), [float(i) for i in range(100)])
+        self.assertEqual(points.longitudes.tolist(), [float(i + 1) for i in range(100)])
+        self.assertEqual(points[-1], Point(1, Coordinate(99, 100)))
+        self.assertEqual(points[-1].id_, 1)
+
+    def test_view(self):
+        point = Point(1, Coordinate(10, 20))
+        point.heading = 45
+
+        points = PointArray([point, ])
+        view = points[0]
+
+        self.assertIsNot(view, point)
+        self.assertEqual(view, point)
+        self.assertEqual(view.timestamp, point.timestamp)
+
+        view.heading = 90
+
+        self.assertEqual(points[0].heading, 45)
+
+    def test_delete(self):
+        points = PointArray([Point(1, Coordinate(i, i)) for i in range(5)])
+
+        del points[0]
+        del points[-1]
+
+        self.assertEqual(points.latitudes.tolist(), [1, 2, 3])
+
+        del points[:2]
+
+        self.assertEqual(points.latitudes.tolist(), [3])
+
+        points.clear()
+
+        self.assertEqual(len(points), 0)
+        self.assertEqual(list(points), [])
+
+    def test_remove_first(self):
+        points = PointArray([Point(1, Coordinate(i, i)) for i in range(8)], capacity=8)
+        data = points._data
+
+        points.remove_first(6)
+
+        # only the start is advanced
+        self.assertIs(points._data, data)
+        self.assertEqual(points.latitudes.tolist(), [6, 7])
+        self.assertEqual(points[0].position, Coordinate(6, 6))
+
+        # the arrays are compacted instead of grown when they run out of space
+        points.append(Point(1, Coordinate(8, 8)))
+
+        self.assertIs(points._data, data)
+        self.assertEqual(points._start, 0)
+        self.assertEqual(points.latitudes.tolist(), [6, 7, 8])
+
+        points.insert(1, Point(1, Coordinate(9, 9)))
+        del points[:1]
+
+        self.assertEqual([point.position.latitude for point in points], [9, 7, 8])
+
+
+class ColumnarPathTest(NoLoggingTestCase):
+    def test_add_point(self):
+        path = Path()
+        columnar_path = Path(columnar=True)
+
+        for lat, lon in [(46.99988, 7.69637), (46.99901, 7.69794), (46.99846, 7.69907)]:
+            path.add_point(Point(1, Coordinate(lat, lon)))
+            columnar_path.add_point(Point(1, Coordinate(lat, lon)))
+
+        columnar_path.add_point(Point(2, Coordinate(42, 32)))
+
+        self.assertTrue(columnar_path.columnar)
+        self.assertEqual(columnar_path.id_, 1)
+        self.assertEqual(columnar_path, path)
+        self.assertEqual(columnar_path.points.headings.tolist(),
+                         [point.heading for point in path.points])
+
+    def test_add_coordinates(self):
+        coordinates = [(46.99988, 7.69637), (46.99901, 7.69794), (46.99846, 7.69907), (46.99811, 7.69985)]
+
+        path = Path()
+        columnar_path = Path(columnar=True)
+
+        for lat, lon in coordinates:
+            path.add_point(Point(1, Coordinate(lat, lon)))
+
+        columnar_path.add_coordinates(1, [46.99988], [7.69637], [10])
+        columnar_path.add_coordinates(1, [lat for lat, _ in coordinates[1:]], [lon for _, lon in coordinates[1:]],
+                                      [11, 12, 13])
+        columnar_path.add_coordinates(2, [42], [32])
+
+        self.assertEqual(columnar_path, path)
+        self.assertEqual(columnar_path.points.headings.tolist(),
+                         [point.heading for point in path.points])
+        self.assertEqual(columnar_path.points.timestamps.tolist(), [10, 11, 12, 13])
+
+    def test_to_json(self):
+        path = Path()
+        path.add_point(Point(1, Coordinate(10.5, 20.5)))
+
+        columnar_path = Path(columnar=True)
+        columnar_path.add_point(Point(1, Coordinate(10.5, 20.5)))
+
+        self.assertEqual(columnar_path.to_json()['points'], path.to_json()['points'])
+
+
 class EgressTest(NoLoggingTestCase):
     def test_to_json(self):
         expected = r'{"mc_model": "Egress", "id": 1, "points": ['\
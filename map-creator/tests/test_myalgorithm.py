@@ -317,3 +317,48 @@ class MyAlgorithmTest(NoLoggingTestCase):
             map_data.ingresses[1].egresses[0].points[0].position.longitude, path3.points[3].position.longitude)
         self.assertLessEqual(abs(
             map_data.ingresses[1].egresses[0].points[0].heading, path3.points[3].heading), threshold)
+
+    def test_online(self):
+        self.algorithm._ref_point = Point(None, Coordinate(47.47735, 19.05358))
+
+        def create_path(coordinates):
+            path = Path()
+            for latitude, longitude in coordinates:
+                path.add_point(Point(1, Coordinate(latitude, longitude)))
+            return path
+
+        paths = [
+            create_path([(47.47743, 19.05443), (47.47739, 19.05405), (47.47736, 19.05363),
+                         (47.47737, 19.05353), (47.47752, 19.05277)]),
+            create_path([(47.47745, 19.05482), (47.47743, 19.05453), (47.47739, 19.05409),
+                         (47.47736, 19.05370), (47.47725, 19.05357), (47.47661, 19.05339)]),
+            create_path([(47.47784, 19.05364), (47.47774, 19.05363), (47.47740, 19.05359),
+                         (47.47734, 19.05355), (47.47676, 19.05340)])
+        ]
+
+        for i, path in enumerate(paths):
+            self.algorithm.insert(i, path)
+
+        online_map = self.algorithm.snapshot()
+        batch_map = self.algorithm.process(paths)
+
+        self.assertEqual(len(online_map.ingresses), 2)
+        self.assertEqual([len(ingress.egresses) for ingress in online_map.ingresses],
+                         [len(ingress.egresses) for ingress in batch_map.ingresses])
+        self.assertEqual(online_map.ingresses[0].points, paths[0].points[:3])
+
+        # the other member of the expired leader leads a new cluster
+        self.algorithm.expire(0)
+
+        online_map = self.algorithm.snapshot()
+
+        self.assertEqual(len(online_map.ingresses), 2)
+        self.assertEqual(online_map.ingresses[0].points, paths[2].points[:4])
+        self.assertEqual(online_map.ingresses[1].points, paths[1].points[:4])
+        self.assertEqual(len(online_map.ingresses[1].egresses), 1)
+
+        self.algorithm.expire(0)
+        self.algorithm.expire(1)
+        self.algorithm.insert(2, paths[2])
+
+        self.assertEqual(len(self.algorithm.snapshot().ingresses), 1)
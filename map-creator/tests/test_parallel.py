@@ -0,0 +1,54 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from map_creator.distance import dtw
+from map_creator.model import Coordinate, Path, Point
+from map_creator.parallel import DistanceService, Factory, pack, unpack
+
+from tests import NoLoggingTestCase
+
+
+class ParallelTest(NoLoggingTestCase):
+    def setUp(self):
+        self.paths = []
+
+        for i in range(7):
+            path = Path(columnar=i % 2 == 0)
+            for j in range(3 + i % 3):
+                path.add_point(Point(i, Coordinate(47.47 + 0.001 * j, 19.05 + 0.0004 * i * j)))
+            self.paths.append(path)
+
+        self.paths.append(Path())
+
+        self.pairs = [(i, j) for i in range(len(self.paths)) for j in range(i, len(self.paths))]
+        self.expected = [dtw(self.paths[i], self.paths[j]) for i, j in self.pairs]
+
+    def test_pack(self):
+        columns, offsets = pack(self.paths)
+
+        self.assertEqual(columns.shape, (4, sum(len(path.points) for path in self.paths)))
+
+        for path, unpacked in zip(self.paths, unpack(columns, offsets, [path.id_ for path in self.paths])):
+            self.assertTrue(unpacked.columnar)
+            self.assertEqual(path.to_json()['points'], unpacked.to_json()['points'])
+
+    def test_thread_pool(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = DistanceService(executor, 2, pack_paths=False)
+            np.testing.assert_array_equal(service.distances(dtw, self.paths, self.pairs), self.expected)
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            service = DistanceService(executor, 2)
+            np.testing.assert_array_equal(service.distances(dtw, self.paths, self.pairs), self.expected)
+            self.assertEqual(len(service.distances(dtw, self.paths, [])), 0)
+
+    def test_factory(self):
+        service = Factory.create({'type': 'thread', 'workers': 3})
+        self.assertEqual(service.workers, 3)
+        self.assertFalse(service.pack_paths)
+        service.close()
+
+        with self.assertRaises(ValueError):
+            Factory.create({'type': 'gpu'})
@@ -1,5 +1,9 @@
+import random
+from unittest import mock
+
+from map_creator import model, utils
 from map_creator.distance import dtw
-from map_creator.model import Coordinate, Egress, Ingress, Map, Path, Point
+from map_creator.model import Coordinate, Egress, Ingress, Map, Path, Point, PointArray
 from map_creator.processor import Processor
 
 from tests import NoLoggingTestCase
@@ -38,6 +42,53 @@ class ProcessorTest(NoLoggingTestCase):
             Point(1, Coordinate(44.51001, 7.24264))
         ])
 
+    def columnar_path(self):
+        path = Path(columnar=True)
+        # a turning path with its first and last points out of range
+        path.add_coordinates(1,
+                             [44.51030] + [44.50990 + 0.00002 * i for i in range(6)] + [44.51002] * 5 + [44.51001],
+                             [7.24272] + [7.24272] * 6 + [7.24274 + 0.00002 * i for i in range(5)] + [7.24400])
+        return path
+
+    def test_preprocess_columnar(self):
+        path = self.columnar_path()
+
+        with mock.patch.object(PointArray, '_point', side_effect=AssertionError('a point was created')), \
+                mock.patch.object(model, 'generate_uuid', wraps=model.generate_uuid) as generate_uuid:
+            paths = self.processor.preprocess([path])
+            ingress, egress = utils.split_path(Point(None, self.processor._ref_point), paths[0])
+
+        # only the splitter and the paths are created
+        self.assertEqual(generate_uuid.call_count, 4)
+
+        self.assertTrue(paths[0].columnar)
+        self.assertEqual(path.points.latitudes.tolist(), [44.50990 + 0.00002 * i for i in range(6)] + [44.51002] * 5)
+        self.assertEqual(len(ingress.points) + len(egress.points), len(paths[0].points))
+        self.assertTrue(len(paths[0].points) < len(path.points))
+
+    def test_preprocess_columnar_equals_list(self):
+        rnd = random.Random(1)
+        list_paths = []
+        columnar_paths = []
+
+        for i in range(20):
+            lats = [44.50995 + 0.00001 * k + rnd.uniform(0, 0.00001) for k in range(30)]
+            lons = [7.24262 + 0.00001 * k * rnd.choice((0, 1)) for k in range(30)]
+
+            for paths, columnar in ((list_paths, False), (columnar_paths, True)):
+                path = Path(columnar=columnar)
+                path.add_coordinates(i, lats, lons, list(range(30)))
+                paths.append(path)
+
+        list_paths = self.processor.preprocess(list_paths)
+        columnar_paths = self.processor.preprocess(columnar_paths)
+
+        self.assertEqual(len(columnar_paths), len(list_paths))
+
+        for list_path, columnar_path in zip(list_paths, columnar_paths):
+            self.assertEqual(columnar_path.id_, list_path.id_)
+            self.assertEqual(columnar_path.points.columns.tolist(), PointArray(list_path.points).columns.tolist())
+
     def test_postprocess(self):
         ref_point = Coordinate(47.48024, 19.03635)
 
@@ -4,7 +4,7 @@ from map_creator.model import Coordinate, Path, Point
 from map_creator.processor import Processor
 from map_creator.rsu import Rsu
 
-from tests import NoLoggingTestCase
+from tests import MockProcessor, NoLoggingTestCase
 
 
 class RsuTest(NoLoggingTestCase):
@@ -27,11 +27,12 @@ class RsuTest(NoLoggingTestCase):
 
         self.assertEqual(len(rsu.paths), 1)
         self.assertEqual(len(rsu.paths[0].points), 2)
+        self.assertIs(rsu.paths_by_id[1], path)
 
         time.sleep(0.1)
 
         point_3 = Point(1, Coordinate(13, 13))
-        rsu.add_point(0, point_3)
+        rsu.add_point(1, point_3)
 
         time.sleep(0.1)
 
@@ -46,3 +47,184 @@ class RsuTest(NoLoggingTestCase):
         rsu._update_paths()
 
         self.assertEqual(len(rsu.paths), 0)
+        self.assertEqual(rsu.paths_by_id, {})
+
+    def test_online_update(self):
+        processor = MockProcessor()
+        rsu = Rsu(processor=processor,
+                  update_time=None,
+                  time_window=0.1,
+                  online=True)
+
+        path_1 = Path()
+        path_1.add_point(Point(1, Coordinate(11, 11)))
+        path_2 = Path()
+        path_2.add_point(Point(2, Coordinate(12, 12)))
+
+        rsu.add_path(path_1)
+        rsu.add_path(path_2)
+        rsu.update()
+
+        self.assertEqual(processor.updates[-1], ([path_1, path_2], []))
+
+        time.sleep(0.1)
+
+        rsu.add_point(2, Point(2, Coordinate(13, 13)))
+        rsu.update()
+
+        self.assertEqual(processor.updates[-1], ([path_2], [path_1]))
+
+        rsu.update()
+
+        self.assertEqual(processor.updates[-1], ([], []))
+
+    def test_background_update(self):
+        processor = MockProcessor()
+        rsu = Rsu(processor=processor,
+                  update_time=None,
+                  time_window=None,
+                  background=True)
+
+        path = Path(columnar=True)
+        path.add_point(Point(1, Coordinate(11, 11)))
+
+        rsu.open()
+
+        try:
+            rsu.add_path(path)
+            rsu.update()
+
+            self.assertTrue(processor.processed.wait(5))
+        finally:
+            rsu.close()
+
+        # the worker processed a copy of the path
+        paths = processor.updates[-1]
+        self.assertEqual(len(paths), 1)
+        self.assertIsNot(paths[0], path)
+        self.assertEqual(paths[0].uuid, path.uuid)
+
+        path.add_point(Point(1, Coordinate(12, 12)))
+
+        self.assertEqual(len(paths[0].points), 1)
+
+    def test_buffered_writes(self):
+        processor = Processor(algorithm=None,
+                              ref_point=Coordinate(0, 0),
+                              range_=1)
+        rsu = Rsu(processor=processor,
+                  time_window=None)
+
+        path = Path()
+        path.add_point(Point(1, Coordinate(11, 11)))
+        path.add_point(Point(1, Coordinate(12, 12)))
+
+        with rsu.paths_lock:
+            rsu.add_path(path)
+            rsu.add_point(1, Point(1, Coordinate(13, 13)))
+            rsu.add_point(2, Point(2, Coordinate(14, 14)))
+
+        self.assertEqual(rsu.paths, [])
+        self.assertEqual(rsu.buffered_points, 4)
+        self.assertEqual(rsu.applied_points, 0)
+
+        # the next write applies the buffered ones first
+        rsu.add_point(2, Point(2, Coordinate(15, 15)))
+
+        self.assertEqual(rsu.buffered_points, 4)
+        self.assertEqual(rsu.applied_points, 5)
+        self.assertEqual(len(rsu.paths), 2)
+        self.assertEqual(len(rsu.paths_by_id[1].points), 3)
+        self.assertEqual(len(rsu.paths_by_id[2].points), 2)
+
+    def test_trailing_writes(self):
+        processor = Processor(algorithm=None,
+                              ref_point=Coordinate(0, 0),
+                              range_=1)
+        rsu = Rsu(processor=processor,
+                  time_window=10)
+
+        # the last write lands while an update holds the lock
+        with rsu.paths_lock:
+            rsu.add_point(1, Point(1, Coordinate(11, 11)))
+            rsu._update_paths()
+
+        self.assertEqual(rsu.applied_points, 1)
+
+        with rsu.paths_lock:
+            rsu.add_point(1, Point(1, Coordinate(12, 12)))
+
+        rsu.close()
+
+        self.assertEqual(rsu.applied_points, 2)
+        self.assertEqual(len(rsu.paths_by_id[1].points), 2)
+
+    def test_expiry(self):
+        processor = Processor(algorithm=None,
+                              ref_point=Coordinate(0, 0),
+                              range_=1)
+        rsu = Rsu(processor=processor,
+                  time_window=10)
+
+        now = [0.0]
+        rsu.clock = lambda: now[0]
+
+        for i in range(3):
+            rsu.add_point(1, Point(1, Coordinate(11, 11 + i)))
+            rsu.add_point(2, Point(2, Coordinate(12, 12 + i)))
+            now[0] += 5
+
+        rsu.add_point(1, Point(1, Coordinate(11, 14)))
+
+        # the points at 0 and 5 are older than the window at 15.5
+        now[0] = 15.5
+        rsu._update_paths()
+
+        self.assertEqual(len(rsu.paths_by_id[1].points), 2)
+        self.assertEqual(rsu.paths_by_id[1].points[0].position, Coordinate(11, 13))
+        self.assertEqual(len(rsu.paths_by_id[2].points), 1)
+
+        now[0] = 20.5
+        rsu._update_paths()
+
+        self.assertEqual(list(rsu.paths_by_id), [1])
+        self.assertEqual(len(rsu.paths[0].points), 1)
+
+    def test_event_time(self):
+        processor = MockProcessor()
+        rsu = Rsu(processor=processor,
+                  update_time=4,
+                  time_window=10,
+                  event_time=True)
+
+        for timestamp in range(0, 30, 2):
+            rsu.add_point(1, Point(1, Coordinate(11, 11 + timestamp / 100)), timestamp)
+            rsu.update()
+
+        # updates at 4, 8, ..., 28 with the points of the last 10 seconds
+        self.assertEqual([[len(path.points) for path in paths] for paths in processor.updates],
+                         [[3], [5], [6], [6], [6], [6], [6]])
+        self.assertEqual(rsu.clock(), 28)
+
+    def test_add_points(self):
+        processor = Processor(algorithm=None,
+                              ref_point=Coordinate(0, 0),
+                              range_=1)
+        rsu = Rsu(processor=processor,
+                  time_window=10,
+                  event_time=True)
+
+        rsu.add_point(1, Point(1, Coordinate(11, 11)), 0)
+        rsu.add_points(1, [11, 11], [12, 13], [5, 6])
+        rsu.add_points(2, [12], [12], [8])
+
+        self.assertEqual(rsu.applied_points, 4)
+        self.assertEqual(len(rsu.paths_by_id[1].points), 3)
+        self.assertEqual(rsu.paths_by_id[2].points.timestamps.tolist(), [8])
+        self.assertEqual(rsu.clock(), 8)
+
+        rsu.add_points(2, [12], [13], [15.5])
+        rsu._update_paths()
+
+        self.assertEqual(len(rsu.paths_by_id[1].points), 1)
+        self.assertEqual(len(rsu.paths_by_id[2].points), 2)
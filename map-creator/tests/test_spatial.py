@@ -0,0 +1,35 @@
+import numpy as np
+
+from map_creator import haversine
+from map_creator.spatial import GridIndex
+
+from tests import NoLoggingTestCase
+
+
+class GridIndexTest(NoLoggingTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.lats = 47.47 + rng.uniform(-0.01, 0.01, 500)
+        self.lons = 19.05 + rng.uniform(-0.01, 0.01, 500)
+
+    def test_query(self):
+        index = GridIndex(self.lats, self.lons, 0.1)
+
+        for i in range(0, 500, 25):
+            distances = haversine.one_to_many(self.lats[i], self.lons[i], self.lats, self.lons)
+
+            for radius in (0.1, 0.05):
+                expected = np.flatnonzero(distances <= radius)
+                np.testing.assert_array_equal(index.query(self.lats[i], self.lons[i], radius), expected)
+
+    def test_radius(self):
+        index = GridIndex(self.lats, self.lons, 0.1)
+
+        with self.assertRaises(ValueError):
+            index.query(47.47, 19.05, 0.2)
+
+    def test_empty(self):
+        index = GridIndex([], [], 0.1)
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(len(index.query(47.47, 19.05)), 0)
@@ -0,0 +1,51 @@
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from map_creator.trace import MAGIC, BinaryTrace, is_binary
+
+from tests import NoLoggingTestCase
+
+
+class BinaryTraceTest(NoLoggingTestCase):
+    def setUp(self):
+        self.records = [(0, 0, 47.47, 19.05), (0, 1, 47.471, 19.051),
+                        (2, 1, 47.472, 19.052), (2, 0, 47.473, 19.053), (2, 2, 47.474, 19.054)]
+
+        body = b''.join(struct.pack('<IIdd', *record) for record in self.records)
+        trailer = json.dumps({'ids': ['a', 'b', 'c'], 'timestamps': [0.0, 1.0, 2.0]}).encode()
+
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(struct.pack('<8sQQ', MAGIC, len(self.records), 24 + len(body)))
+            f.write(body)
+            f.write(trailer)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_is_binary(self):
+        self.assertTrue(is_binary(self.path))
+
+        with open(self.path, 'wb') as f:
+            f.write(b'1, 47.47, 19.05, 0.0\n')
+
+        self.assertFalse(is_binary(self.path))
+
+    def test_steps(self):
+        trace = BinaryTrace(self.path)
+        steps = list(trace.steps())
+
+        self.assertEqual(len(trace), 5)
+        self.assertEqual(len(steps), 2)
+
+        ids, lats, lons, timestamp = steps[1]
+
+        self.assertEqual(ids.tolist(), ['b', 'a', 'c'])
+        np.testing.assert_array_equal(lats, [47.472, 47.473, 47.474])
+        np.testing.assert_array_equal(lons, [19.052, 19.053, 19.054])
+        self.assertEqual(timestamp, 2.0)
+        self.assertEqual(steps[0][3], 0.0)
@@ -1,6 +1,6 @@
 from tests import NoLoggingTestCase
-from map_creator.model import Coordinate, Path, Point
-from map_creator.utils import closest_point, combine_paths, condense, find_key_points
+from map_creator.model import Coordinate, Path, Point, PointArray
+from map_creator.utils import closest_point, combine_paths, condense, condense_arrays, find_key_points
 
 
 class UtilsTest(NoLoggingTestCase):
@@ -54,7 +54,55 @@ class UtilsTest(NoLoggingTestCase):
         key_points_path = find_key_points(path)
         key_points_condensed = find_key_points(condensed)
 
-        self.assertTrue(all(key_point in key_points_condensed for key_point in key_points_path))
+        # the condensed path has new points at the positions of the points of the path
+        positions_condensed = [key_point.position for key_point in key_points_condensed.points]
+        self.assertTrue(all(key_point.position in positions_condensed for key_point in key_points_path.points))
+
+    def test_condense_arrays(self):
+        for columnar in (False, True):
+            path = Path(columnar=columnar)
+
+            path.add_point(Point(1, Coordinate(47.56463, 19.04890)))
+            path.add_point(Point(1, Coordinate(47.56615, 19.04938)))
+            path.add_point(Point(1, Coordinate(47.56685, 19.04945)))
+            path.add_point(Point(1, Coordinate(47.56774, 19.04914)))
+
+            lats, lons, headings = condense_arrays(path, 50)
+            condensed = condense(path, 50)
+
+            self.assertEqual(len(lats), 50)
+            self.assertEqual(condensed.columnar, columnar)
+
+            for i, point in enumerate(condensed.points):
+                self.assertAlmostEqual(lats[i], point.position.latitude, 12)
+                self.assertAlmostEqual(lons[i], point.position.longitude, 12)
+                self.assertAlmostEqual(headings[i], point.heading, 9)
+
+            # a path with enough points is not condensed
+            self.assertIs(condense(path, 4), path)
+            self.assertEqual(condense_arrays(path, 4)[0].tolist(), [point.position.latitude for point in path.points])
+
+    def test_find_key_points_columnar(self):
+        path = Path()
+
+        path.add_point(Point(1, Coordinate(47.56463, 19.04890)))
+        path.add_point(Point(1, Coordinate(47.56615, 19.04938)))
+        path.add_point(Point(1, Coordinate(47.56685, 19.04945)))
+        path.add_point(Point(1, Coordinate(47.56774, 19.04914)))
+        path.add_point(Point(1, Coordinate(47.56870, 19.04847)))
+        path.add_point(Point(1, Coordinate(47.56877, 19.04852)))
+        path.add_point(Point(1, Coordinate(47.56885, 19.04856)))
+
+        columnar_path = path.copy()
+        columnar_path.points = PointArray(path.points)
+
+        # the list version compares with the headings it sets on the points of the path
+        key_points = find_key_points(path)
+        columnar_key_points = find_key_points(columnar_path)
+
+        self.assertTrue(columnar_key_points.columnar)
+        self.assertEqual(len(key_points.points), 6)
+        self.assertEqual(list(columnar_key_points.points), key_points.points)
 
     def test_closest_point(self):
         target = Point(None, Coordinate(47.49816, 19.04051))